@@ -1,20 +1,37 @@
+import time as _time
+_run_t0 = _time.perf_counter()   # first thing in the script, so imports are profiled too
+
 import streamlit as st
-import google.generativeai as genai
-try:
-    from groq import Groq as GroqClient
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
-try:
-    from openai import OpenAI as OpenAIClient
-    OPENAI_SDK_AVAILABLE = True
-except ImportError:
-    OPENAI_SDK_AVAILABLE = False
-from PIL import Image
-import os
-import json
+import streamlit.components.v1 as components
 from datetime import datetime
-import re
+
+# All diagnosis, provider, cache and costing logic lives in the Streamlit-free
+# plant_doctor package; this file is only the UI on top of it.
+from plant_doctor import startup as _startup
+from plant_doctor.assistant import stream_farmer_bot_response, translate_report
+from plant_doctor.catalog import catalog_version
+from plant_doctor.config import GROQ_TEXT_MODELS, VISION_MODEL_CHAIN
+from plant_doctor.imaging import (
+    benchmark_enhancement,
+    crop_to_leaf,
+    enhance_image_for_analysis,
+    load_image_for_vision,
+    prepare_image_payload,
+    resize_image,
+)
+from plant_doctor.manuals import MANUAL_LANGUAGES, manual_html
+from plant_doctor.parsing import validate_json_result
+from plant_doctor.pipeline import diagnose_events, ttfuc_stats
+from plant_doctor.prompts import PLANT_COMMON_DISEASES, prompt_memo_stats
+from plant_doctor.providers import get_async_openrouter_client, get_secret, prompt_cache_stats
+from plant_doctor.quota import is_quota_err, quota_status, rate_limit_stats
+from plant_doctor.rotation import MARKET_FOCUS, REGIONS, SOIL_TYPES, generate_crop_rotation_plan
+from plant_doctor.theme import inline_theme_html, theme_asset_ready, theme_loader_html, theme_payload_bytes
+from plant_doctor.treatments import calculate_loss_percentage, get_treatment_info, normalize_treatment_name
+from plant_doctor.triage import LOCAL_MODEL_PATH, local_triage, local_triage_to_result
+
+_run_profile = _startup.RunProfile(_run_t0)
+_run_profile.mark("imports")
 
 st.set_page_config(
     page_title="🌿 AI Plant Doctor - Smart Edition",
@@ -23,1469 +40,32 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-# ============ TREATMENT COSTS & QUANTITIES DATABASE ============
-# ============ TREATMENT COSTS & QUANTITIES DATABASE ============
-
-TREATMENT_COSTS = {
-    "organic": {
-        "Cow Urine Extract": {
-            "cost": 80,   # locally prepared / very low-cost input
-            "quantity": "2-3 liters per 100 plants",
-            "dilution": "1:5 with water",
-        },
-        "Sulfur Dust": {
-            "cost": 120,
-            "quantity": "500g per 100 plants",
-            "dilution": "Direct dust - 5-10g per plant",
-        },
-        "Sulfur Powder": {
-            "cost": 150,
-            "quantity": "200g per 100 plants",
-            "dilution": "3% suspension - 20ml per plant",
-        },
-        "Lime Sulfur": {
-            "cost": 180,
-            "quantity": "1 liter per 100 plants",
-            "dilution": "1:10 with water",
-        },
-        "Neem Oil Spray": {
-            # ~₹340–550 per liter retail; 500 ml ≈ ₹170–275
-            "cost": 250,
-            "quantity": "500ml per 100 plants",
-            "dilution": "3% solution - 5ml per liter",
-        },
-        "Bordeaux Mixture": {
-            "cost": 250,
-            "quantity": "300g per 100 plants",
-            "dilution": "1% solution - 10g per liter",
-        },
-        "Karanja Oil": {
-            "cost": 220,
-            "quantity": "400ml per 100 plants",
-            "dilution": "2.5% solution - 2.5ml per liter",
-        },
-        "Copper Fungicide (Organic)": {
-            "cost": 280,
-            "quantity": "250g per 100 plants",
-            "dilution": "0.5% solution - 5g per liter",
-        },
-        "Potassium Bicarbonate": {
-            "cost": 300,
-            "quantity": "150g per 100 plants",
-            "dilution": "1% solution - 10g per liter",
-        },
-        "Bacillus subtilis": {
-            "cost": 350,
-            "quantity": "100g per 100 plants",
-            "dilution": "0.1% solution - 1g per liter",
-        },
-        "Azadirachtin": {
-            "cost": 380,
-            "quantity": "200ml per 100 plants",
-            "dilution": "0.3% solution - 3ml per liter",
-        },
-        "Trichoderma": {
-            "cost": 400,
-            "quantity": "500g per 100 plants",
-            "dilution": "0.5% solution - 5g per liter",
-        },
-        # Spinosad is a bio‑insecticide; market price for 100 ml is ~₹1,900–2,000
-        "Spinosad": {
-            "cost": 2000,
-            "quantity": "100ml per 100 plants",
-            "dilution": "0.02% solution - 0.2ml per liter",
-        },
-        # Added: seaweed extract as a common organic biostimulant
-        "Seaweed Extract": {
-            # 500 ml pack ≈ ₹500–530; assuming ~250 ml per 100 plants
-            "cost": 260,
-            "quantity": "250ml per 100 plants",
-            "dilution": "0.3% solution - 3ml per liter",
-        },
-    },
-    "chemical": {
-        # Bavistin / Carbendazim 50% WP: 100 g ≈ ₹90–140
-        "Carbendazim (Bavistin)": {
-            "cost": 120,
-            "quantity": "100g per 100 plants",
-            "dilution": "0.1% solution - 1g per liter",
-        },
-        # Indofil M-45 (Mancozeb 75% WP): 100 g ≈ ₹75; 500 g ≈ ₹279
-        "Mancozeb (Indofil)": {
-            "cost": 120,
-            "quantity": "150g per 100 plants",
-            "dilution": "0.2% solution - 2g per liter",
-        },
-        "Copper Oxychloride": {
-            "cost": 150,
-            "quantity": "200g per 100 plants",
-            "dilution": "0.25% solution - 2.5g per liter",
-        },
-        "Profenofos (Meothrin)": {
-            "cost": 200,
-            "quantity": "100ml per 100 plants",
-            "dilution": "0.05% solution - 0.5ml per liter",
-        },
-        "Chlorothalonil": {
-            "cost": 220,
-            "quantity": "120g per 100 plants",
-            "dilution": "0.15% solution - 1.5g per liter",
-        },
-        "Deltamethrin (Decis)": {
-            "cost": 220,
-            "quantity": "50ml per 100 plants",
-            "dilution": "0.005% solution - 0.05ml per liter",
-        },
-        # Confidor (Imidacloprid 17.8% SL): 100 ml ≈ ₹300–380
-        "Imidacloprid (Confidor)": {
-            "cost": 350,
-            "quantity": "80ml per 100 plants",
-            "dilution": "0.008% solution - 0.08ml per liter",
-        },
-        "Fluconazole (Contaf)": {
-            "cost": 350,
-            "quantity": "150ml per 100 plants",
-            "dilution": "0.06% solution - 0.6ml per liter",
-        },
-        "Tebuconazole (Folicur)": {
-            "cost": 320,
-            "quantity": "120ml per 100 plants",
-            "dilution": "0.05% solution - 0.5ml per liter",
-        },
-        "Thiamethoxam (Actara)": {
-            "cost": 290,
-            "quantity": "100g per 100 plants",
-            "dilution": "0.04% solution - 0.4g per liter",
-        },
-        # Amistar / Amistar Top: 100 ml ≈ ₹560–700
-        "Azoxystrobin (Amistar)": {
-            "cost": 650,
-            "quantity": "80ml per 100 plants",
-            "dilution": "0.02% solution - 0.2ml per liter",
-        },
-        "Hexaconazole (Contaf Plus)": {
-            "cost": 350,
-            "quantity": "100ml per 100 plants",
-            "dilution": "0.04% solution - 0.4ml per liter",
-        },
-        "Phosphorous Acid": {
-            "cost": 250,
-            "quantity": "200ml per 100 plants",
-            "dilution": "0.3% solution - 3ml per liter",
-        },
-        # Added: Ridomil Gold (Metalaxyl + Mancozeb)
-        "Metalaxyl + Mancozeb (Ridomil Gold)": {
-            # 100 g pack ≈ ₹180–190
-            "cost": 190,
-            "quantity": "100g per 100 plants",
-            "dilution": "0.25% solution - 2.5g per liter",
-        },
-        # Added: Tilt (Propiconazole 25% EC)
-        "Propiconazole (Tilt)": {
-            # 100 ml ≈ ₹190; 250 ml ≈ ₹390
-            "cost": 190,
-            "quantity": "100ml per 100 plants",
-            "dilution": "0.1% solution - 1ml per liter",
-        },
-    },
-}
-
-# ============ CROP ROTATION DATABASE ============
-CROP_ROTATION_DATA = {
-    "Tomato": {
-        "rotations": ["Beans", "Cabbage", "Cucumber"],
-        "info": {
-            "Tomato": "High-value solanaceae crop. Susceptible to early/late blight, fusarium wilt, and bacterial diseases. Benefits from crop rotation of 3+ years.",
-            "Beans": "Nitrogen-fixing legume. Improves soil nitrogen content. Breaks disease cycle for tomato. Compatible with tomato crop rotation.",
-            "Cabbage": "Brassica family. Helps control tomato diseases. Requires different nutrient profile. Good rotation choice.",
-            "Cucumber": "Cucurbitaceae family. No common diseases with tomato. Light feeder after beans. Completes rotation cycle.",
-        },
-    },
-    "Rose": {
-        "rotations": ["Marigold", "Chrysanthemum", "Herbs"],
-        "info": {
-            "Rose": "Ornamental crop. Susceptible to black spot, powdery mildew, rose rosette virus. Needs disease break.",
-            "Marigold": "Natural pest repellent. Flowers attract beneficial insects. Cleanses soil. Excellent companion.",
-            "Chrysanthemum": "Different pest/disease profile. Breaks rose pathogen cycle. Similar care requirements.",
-            "Herbs": "Basil, rosemary improve soil health. Aromatics confuse rose pests. Reduces chemical inputs.",
-        },
-    },
-    "Apple": {
-        "rotations": ["Legume Cover Crops", "Grasses", "Berries"],
-        "info": {
-            "Apple": "Long-term perennial crop. Susceptible to apple scab, fire blight, rust. Needs 4-5 year rotation minimum.",
-            "Legume Cover Crops": "Nitrogen fixation. Soil improvement. Breaks pathogen cycle. Reduces input costs.",
-            "Grasses": "Erosion control. Soil structure improvement. Natural pest predator habitat. Beneficial insects.",
-            "Berries": "Different root depth. Utilize different nutrients. Continues income during apple off-year.",
-        },
-    },
-    "Lettuce": {
-        "rotations": ["Spinach", "Broccoli", "Cauliflower"],
-        "info": {
-            "Lettuce": "Cool-season leafy crop. Susceptible to downy mildew, tip burn, mosaic virus. Quick 60-70 day cycle.",
-            "Spinach": "Similar family (Amaranthaceae). Resistant to lettuce diseases. Tolerates cold. Soil enrichment.",
-            "Broccoli": "Brassica family. Different pest profile. Breaks disease cycle. Heavy feeder needs composting.",
-            "Cauliflower": "Brassica family. Follows spinach. Light-sensitive. Completes 3-crop cycle for lettuce disease control.",
-        },
-    },
-    "Grape": {
-        "rotations": ["Legume Cover Crops", "Cereals", "Vegetables"],
-        "info": {
-            "Grape": "Perennial vine crop. Powdery mildew, downy mildew, phylloxera major concerns. 5+ year rotation needed.",
-            "Legume Cover Crops": "Nitrogen replenishment. Soil structure restoration. Disease vector elimination.",
-            "Cereals": "Wheat/maize. Different nutrient uptake. Soil consolidation. Nematode cycle break.",
-            "Vegetables": "Diverse crops reduce soil depletion. Polyculture benefits. Re-establishes soil microbiology.",
-        },
-    },
-    "Pepper": {
-        "rotations": ["Onion", "Garlic", "Spinach"],
-        "info": {
-            "Pepper": "Solanaceae crop. Anthracnose, bacterial wilt, phytophthora major issues. 3-year rotation essential.",
-            "Onion": "Allium family. Different disease profile. Fungicide applications reduced. Breaks solanaceae cycle.",
-            "Garlic": "Allium family. Natural pest deterrent. Soil antimicrobial properties. Autumn/winter crop.",
-            "Spinach": "Cool-season crop. No common pepper diseases. Nitrogen-fixing partners. Spring/fall compatible.",
-        },
-    },
-    "Cucumber": {
-        "rotations": ["Maize", "Okra", "Legumes"],
-        "info": {
-            "Cucumber": "Cucurbitaceae family. Powdery mildew, downy mildew, beetle damage. 2-3 year rotation suggested.",
-            "Maize": "Tall crop provides shade break. Different root system. Utilizes soil nitrogen. Strong market demand.",
-            "Okra": "Malvaceae family. No overlapping pests. Nitrogen-fixing tendency. Heat-tolerant summer crop.",
-            "Legumes": "Nitrogen restoration. Disease-free break for cucumber. Pea/bean varieties available for season.",
-        },
-    },
-    "Strawberry": {
-        "rotations": ["Garlic", "Onion", "Leafy Greens"],
-        "info": {
-            "Strawberry": "Low-growing perennial. Leaf scorch, powdery mildew, red stele root rot issues. 3-year bed rotation.",
-            "Garlic": "Deep-rooted. Antimicrobial soil activity. Plant autumn, harvest spring. Excellent succession crop.",
-            "Onion": "Bulb crop. Disease-free break. Allergenic properties deter strawberry pests. Rotation crop.",
-            "Leafy Greens": "Spinach/lettuce. Quick cycle. Utilizes residual nutrients. Spring/fall timing options.",
-        },
-    },
-    "Corn": {
-        "rotations": ["Soybean", "Pulses", "Oilseeds"],
-        "info": {
-            "Corn": "Heavy nitrogen feeder. Leaf blotch, rust, corn borer, fumonisin concerns. 3+ year rotation critical.",
-            "Soybean": "Nitrogen-fixing legume. Reduces fertilizer needs 40-50%. Breaks corn pest cycle naturally.",
-            "Pulses": "Chickpea/lentil. Additional nitrogen fixation. High market value. Diverse pest profile than corn.",
-            "Oilseeds": "Sunflower/safflower. Soil structure improvement. Different nutrient uptake. Income diversification.",
-        },
-    },
-    "Potato": {
-        "rotations": ["Peas", "Mustard", "Cereals"],
-        "info": {
-            "Potato": "Solanaceae crop. Late blight, early blight, nematodes persistent issue. 4-year rotation required.",
-            "Peas": "Nitrogen-fixing legume. Cold-season crop. Breaks potato pathogen cycle. Soil health restoration.",
-            "Mustard": "Oil crop. Biofumigation properties. Natural nematode control. Green manure if plowed.",
-            "Cereals": "Wheat/barley. Different root depth. Soil consolidation. Completes disease-break rotation cycle.",
-        },
-    },
-}
-
-REGIONS = ["North India", "South India", "East India", "West India", "Central India"]
-SOIL_TYPES = ["Black Soil", "Red Soil", "Laterite Soil", "Alluvial Soil", "Clay Soil"]
-MARKET_FOCUS = ["Stable essentials", "High-value cash crops", "Low input / low risk"]
-
 # ============ GLOBAL STYLES ============
-st.markdown(
-    """
-<style>
-/* ─── Google Fonts ─── */
-@import url('https://fonts.googleapis.com/css2?family=Playfair+Display:wght@600;700;900&family=Plus+Jakarta+Sans:wght@300;400;500;600;700;800&display=swap');
-
-/* ─── Keyframe Animations ─── */
-@keyframes pulseGlow {
-  0%, 100% { box-shadow: 0 0 18px rgba(58,220,110,0.18), 0 0 40px rgba(58,173,94,0.10); }
-  50%       { box-shadow: 0 0 32px rgba(58,220,110,0.38), 0 0 70px rgba(58,173,94,0.22); }
-}
-@keyframes orbitGlow {
-  0%   { transform: translateX(-50%) scale(1);   opacity: 0.55; }
-  50%  { transform: translateX(-50%) scale(1.18); opacity: 0.85; }
-  100% { transform: translateX(-50%) scale(1);   opacity: 0.55; }
-}
-@keyframes scanLine {
-  0%   { transform: translateY(-100%); opacity: 0; }
-  10%  { opacity: 0.35; }
-  90%  { opacity: 0.35; }
-  100% { transform: translateY(100%);  opacity: 0; }
-}
-@keyframes fadeSlideUp {
-  from { opacity: 0; transform: translateY(14px); }
-  to   { opacity: 1; transform: translateY(0); }
-}
-@keyframes borderPulse {
-  0%, 100% { border-color: rgba(74,163,84,0.28); }
-  50%       { border-color: rgba(74,220,110,0.70); }
-}
-@keyframes shimmer {
-  0%   { background-position: -200% center; }
-  100% { background-position:  200% center; }
-}
-@keyframes dotDrift {
-  0%, 100% { background-position: 0px 0px; }
-  50%       { background-position: 14px 14px; }
-}
-@keyframes badgePop {
-  0%   { transform: scale(0.92); opacity: 0; }
-  70%  { transform: scale(1.04); }
-  100% { transform: scale(1);    opacity: 1; }
-}
-
-/* ─── CSS Variables ─── */
-:root {
-  --bg-base:       #04090605;
-  --bg-surface:    #080f0a;
-  --bg-card:       #0c1610;
-  --bg-raised:     #121e15;
-  --border-dim:    rgba(74, 200, 95, 0.15);
-  --border-mid:    rgba(74, 200, 95, 0.32);
-  --border-bright: rgba(74, 200, 95, 0.72);
-  --green-main:    #2ecc6e;
-  --green-light:   #55f08a;
-  --green-dark:    #1a8048;
-  --green-glow:    rgba(46, 204, 110, 0.28);
-  --green-glow2:   rgba(46, 204, 110, 0.08);
-  --gold:          #f0c040;
-  --gold-dim:      rgba(240, 192, 64, 0.15);
-  --gold-glow:     rgba(240, 192, 64, 0.35);
-  --text-primary:  #ecf5ee;
-  --text-secondary:#8fbf9a;
-  --text-muted:    #3f5c47;
-  --red-accent:    #f05c5c;
-  --blue-accent:   #5ca8f0;
-  --amber:         #f0b040;
-  --purple-accent: #b07cf0;
-  --shadow-green:  0 8px 36px rgba(46,204,110,0.22);
-  --shadow-deep:   0 20px 60px rgba(0,0,0,0.75);
-  --radius-sm:     8px;
-  --radius-md:     14px;
-  --radius-lg:     22px;
-  --radius-xl:     30px;
-}
-
-/* ─── Base Reset ─── */
-*, *::before, *::after { box-sizing: border-box; }
-
-html, body,
-.stApp,
-[data-testid="stAppViewContainer"],
-[data-testid="stHeader"],
-[data-testid="block-container"] {
-  background: radial-gradient(ellipse at 20% 0%, #051409 0%, #020804 60%) !important;
-  font-family: 'Plus Jakarta Sans', sans-serif;
-}
-
-p, span, div, label {
-  color: var(--text-primary);
-  font-family: 'Plus Jakarta Sans', sans-serif;
-  font-size: 0.97rem;
-  line-height: 1.65;
-}
-
-/* ─── Scrollbar ─── */
-::-webkit-scrollbar { width: 5px; height: 5px; }
-::-webkit-scrollbar-track { background: var(--bg-base); }
-::-webkit-scrollbar-thumb {
-  background: linear-gradient(180deg, var(--green-main), var(--green-dark));
-  border-radius: 10px;
-}
-::-webkit-scrollbar-thumb:hover { background: var(--green-light); }
-
-/* ─── Sidebar ─── */
-[data-testid="stSidebar"] {
-  background: linear-gradient(180deg, #080f0a 0%, #040807 100%) !important;
-  border-right: 1px solid var(--border-dim) !important;
-  box-shadow: 4px 0 30px rgba(0,0,0,0.5) !important;
-}
-[data-testid="stSidebar"] * { color: var(--text-secondary) !important; }
-[data-testid="stSidebar"] h1,
-[data-testid="stSidebar"] h2,
-[data-testid="stSidebar"] h3 { color: var(--text-primary) !important; }
-
-/* ─── Main Header ─── */
-.header-container {
-  position: relative;
-  overflow: hidden;
-  background: linear-gradient(160deg, #0b2212 0%, #071410 50%, #030d06 100%);
-  padding: 60px 40px 52px;
-  border-radius: var(--radius-xl);
-  margin-bottom: 30px;
-  border: 1px solid var(--border-mid);
-  box-shadow:
-    0 0 0 1px rgba(46,204,110,0.08) inset,
-    0 0 100px rgba(46,204,110,0.12),
-    var(--shadow-deep);
-  animation: pulseGlow 5s ease-in-out infinite;
-}
-/* animated dot-grid overlay */
-.header-container::before {
-  content: '';
-  position: absolute;
-  inset: 0;
-  background-image: radial-gradient(rgba(46,204,110,0.14) 1px, transparent 1px);
-  background-size: 26px 26px;
-  pointer-events: none;
-  animation: dotDrift 8s ease-in-out infinite;
-}
-/* ambient glow orb */
-.header-container::after {
-  content: '';
-  position: absolute;
-  top: -100px; left: 50%;
-  transform: translateX(-50%);
-  width: 600px; height: 320px;
-  background: radial-gradient(ellipse, rgba(46,204,110,0.28) 0%, transparent 68%);
-  pointer-events: none;
-  animation: orbitGlow 6s ease-in-out infinite;
-}
-
-/* scan-line streak across header */
-.header-container .scan-line {
-  position: absolute;
-  left: 0; right: 0;
-  height: 2px;
-  background: linear-gradient(90deg, transparent, rgba(46,204,110,0.4), transparent);
-  animation: scanLine 7s linear infinite;
-  pointer-events: none;
-}
-
-.header-badge {
-  display: inline-block;
-  background: linear-gradient(135deg, var(--gold-dim), rgba(240,192,64,0.08));
-  border: 1px solid rgba(240,192,64,0.55);
-  color: var(--gold);
-  font-size: 0.68rem;
-  font-weight: 800;
-  letter-spacing: 0.22em;
-  text-transform: uppercase;
-  padding: 6px 18px;
-  border-radius: 100px;
-  margin-bottom: 22px;
-  box-shadow: 0 0 18px var(--gold-glow);
-  animation: badgePop 0.6s ease forwards;
-}
-.header-title {
-  font-family: 'Playfair Display', Georgia, serif;
-  font-size: 3.4rem;
-  font-weight: 900;
-  color: #ffffff;
-  text-align: center;
-  letter-spacing: -0.02em;
-  line-height: 1.05;
-  margin-bottom: 16px;
-  text-shadow:
-    0 0 40px rgba(46,204,110,0.55),
-    0 2px 20px rgba(0,0,0,0.6);
-  background: linear-gradient(180deg, #ffffff 60%, rgba(255,255,255,0.7) 100%);
-  -webkit-background-clip: text;
-  -webkit-text-fill-color: transparent;
-  background-clip: text;
-}
-.header-title .hl {
-  background: linear-gradient(135deg, var(--green-light) 0%, #a8ffca 100%);
-  -webkit-background-clip: text;
-  -webkit-text-fill-color: transparent;
-  background-clip: text;
-}
-.header-subtitle {
-  font-family: 'Plus Jakarta Sans', sans-serif;
-  font-size: 1.08rem;
-  color: var(--text-secondary);
-  text-align: center;
-  font-weight: 400;
-  max-width: 580px;
-  margin: 0 auto;
-  opacity: 0.88;
-}
-
-/* ─── Feature Pills ─── */
-.feature-card {
-  background: linear-gradient(135deg, var(--bg-card) 0%, #0e1c12 100%);
-  border: 1px solid var(--border-dim);
-  color: var(--text-secondary);
-  padding: 14px 18px;
-  border-radius: var(--radius-md);
-  text-align: center;
-  font-family: 'Plus Jakarta Sans', sans-serif;
-  font-weight: 700;
-  font-size: 0.88rem;
-  letter-spacing: 0.03em;
-  transition: all 0.25s cubic-bezier(0.34, 1.56, 0.64, 1);
-  cursor: default;
-}
-.feature-card:hover {
-  background: linear-gradient(135deg, #1a2e1e 0%, #142219 100%);
-  border-color: var(--border-bright);
-  color: var(--green-light);
-  transform: translateY(-5px) scale(1.02);
-  box-shadow: 0 10px 30px var(--green-glow), 0 0 0 1px rgba(46,204,110,0.15) inset;
-}
-
-/* ─── Upload & Result Containers ─── */
-.upload-container {
-  background: var(--bg-card);
-  padding: 30px 28px;
-  border-radius: var(--radius-lg);
-  border: 1.5px dashed var(--border-mid);
-  box-shadow: var(--shadow-deep);
-  margin: 18px 0;
-  transition: border-color 0.3s ease, box-shadow 0.3s ease;
-  animation: fadeSlideUp 0.5s ease forwards;
-}
-.upload-container:hover {
-  border-color: var(--green-main);
-  box-shadow: 0 0 0 4px rgba(46,204,110,0.06), var(--shadow-deep);
-}
-.result-container {
-  background: var(--bg-card);
-  border-radius: var(--radius-lg);
-  padding: 30px;
-  box-shadow: var(--shadow-deep);
-  margin: 20px 0;
-  border: 1px solid var(--border-dim);
-  animation: fadeSlideUp 0.4s ease forwards;
-}
-
-/* ─── Disease Hero Card ─── */
-.disease-header {
-  position: relative;
-  overflow: hidden;
-  background: linear-gradient(135deg, #0a2010 0%, #0d2918 50%, #122e1c 100%);
-  border: 1px solid rgba(46,204,110,0.38);
-  color: white;
-  padding: 32px 30px;
-  border-radius: var(--radius-lg);
-  margin-bottom: 24px;
-  box-shadow: 0 4px 40px rgba(46,204,110,0.20), var(--shadow-deep);
-  animation: borderPulse 3.5s ease-in-out infinite;
-}
-.disease-header::before {
-  content: '';
-  position: absolute;
-  top: -50px; right: -50px;
-  width: 260px; height: 260px;
-  background: radial-gradient(circle, rgba(46,204,110,0.22) 0%, transparent 65%);
-  border-radius: 50%;
-  animation: orbitGlow 5s ease-in-out infinite;
-}
-.disease-header::after {
-  content: '';
-  position: absolute;
-  bottom: -30px; left: -30px;
-  width: 180px; height: 180px;
-  background: radial-gradient(circle, rgba(240,192,64,0.10) 0%, transparent 65%);
-  border-radius: 50%;
-}
-.disease-name {
-  font-family: 'Playfair Display', Georgia, serif;
-  font-size: 2.5rem;
-  font-weight: 900;
-  margin-bottom: 18px;
-  letter-spacing: -0.02em;
-  background: linear-gradient(135deg, #ffffff 0%, rgba(200,255,220,0.9) 100%);
-  -webkit-background-clip: text;
-  -webkit-text-fill-color: transparent;
-  background-clip: text;
-  text-shadow: none;
-}
-.disease-meta { font-size: 0.93rem; display: flex; gap: 10px; flex-wrap: wrap; }
-
-/* ─── Info Sections ─── */
-.info-section {
-  background: linear-gradient(135deg, var(--bg-card) 0%, #0e1c12 100%);
-  border-left: 3px solid var(--green-main);
-  padding: 18px 22px;
-  border-radius: var(--radius-md);
-  margin: 14px 0;
-  border: 1px solid var(--border-dim);
-  border-left-width: 3px;
-  border-left-color: var(--green-main);
-  transition: border-color 0.25s ease, transform 0.25s ease, box-shadow 0.25s ease;
-  animation: fadeSlideUp 0.4s ease forwards;
-}
-.info-section:hover {
-  border-left-color: var(--green-light);
-  transform: translateX(3px);
-  box-shadow: -4px 0 20px rgba(46,204,110,0.12);
-}
-.info-title {
-  font-family: 'Plus Jakarta Sans', sans-serif;
-  font-size: 0.70rem;
-  font-weight: 800;
-  color: var(--green-main);
-  margin-bottom: 12px;
-  letter-spacing: 0.18em;
-  text-transform: uppercase;
-  display: flex;
-  align-items: center;
-  gap: 8px;
-}
-
-/* ─── Cost Info ─── */
-.cost-info {
-  background: linear-gradient(135deg, rgba(46,204,110,0.07) 0%, rgba(46,204,110,0.03) 100%);
-  border-left: 3px solid var(--green-main);
-  padding: 11px 16px;
-  border-radius: var(--radius-sm);
-  margin: 10px 0;
-  font-size: 0.93rem;
-  color: var(--text-secondary);
-  font-weight: 500;
-  border: 1px solid rgba(46,204,110,0.12);
-  border-left-width: 3px;
-  border-left-color: var(--green-main);
-}
-
-/* ─── Treatment Items ─── */
-.treatment-item {
-  background: linear-gradient(135deg, var(--bg-raised) 0%, #111a14 100%);
-  border: 1px solid var(--border-dim);
-  border-left: 3px solid var(--green-main);
-  padding: 16px 18px;
-  border-radius: var(--radius-md);
-  margin: 10px 0;
-  transition: background 0.25s ease, border-color 0.25s ease, transform 0.25s ease, box-shadow 0.25s ease;
-}
-.treatment-item:hover {
-  background: linear-gradient(135deg, #1a2f1e 0%, #162819 100%);
-  border-color: var(--border-mid);
-  border-left-color: var(--green-light);
-  transform: translateX(4px);
-  box-shadow: 0 6px 24px rgba(46,204,110,0.12);
-}
-.treatment-name {
-  font-family: 'Plus Jakarta Sans', sans-serif;
-  font-weight: 800;
-  color: var(--text-primary);
-  margin-bottom: 6px;
-  font-size: 0.97rem;
-}
-.treatment-quantity { color: var(--green-light); font-weight: 600; margin: 4px 0; font-size: 0.88rem; }
-.treatment-dilution { color: var(--amber); font-size: 0.85rem; margin: 4px 0; font-weight: 500; }
-
-/* ─── Severity Badges ─── */
-.severity-badge {
-  display: inline-flex;
-  align-items: center;
-  padding: 6px 16px;
-  border-radius: 100px;
-  font-weight: 800;
-  font-size: 0.73rem;
-  letter-spacing: 0.12em;
-  text-transform: uppercase;
-  font-family: 'Plus Jakarta Sans', sans-serif;
-  animation: badgePop 0.5s ease forwards;
-}
-.severity-healthy  {
-  background: rgba(46,204,110,0.14);
-  color: var(--green-light);
-  border: 1px solid rgba(46,204,110,0.5);
-  box-shadow: 0 0 14px rgba(46,204,110,0.18);
-}
-.severity-mild     {
-  background: rgba(92,168,240,0.14);
-  color: #7ec8f8;
-  border: 1px solid rgba(92,168,240,0.45);
-  box-shadow: 0 0 14px rgba(92,168,240,0.14);
-}
-.severity-moderate {
-  background: rgba(240,176,64,0.14);
-  color: #f8d06e;
-  border: 1px solid rgba(240,176,64,0.45);
-  box-shadow: 0 0 14px rgba(240,176,64,0.14);
-}
-.severity-severe   {
-  background: rgba(240,92,92,0.14);
-  color: #f89090;
-  border: 1px solid rgba(240,92,92,0.45);
-  box-shadow: 0 0 14px rgba(240,92,92,0.14);
-}
-
-/* ─── Type Badges ─── */
-.type-badge {
-  display: inline-flex;
-  align-items: center;
-  padding: 5px 14px;
-  border-radius: 100px;
-  font-weight: 800;
-  font-size: 0.70rem;
-  letter-spacing: 0.12em;
-  text-transform: uppercase;
-  margin: 3px 4px 3px 0;
-  font-family: 'Plus Jakarta Sans', sans-serif;
-  transition: transform 0.2s ease, box-shadow 0.2s ease;
-}
-.type-badge:hover { transform: scale(1.05); }
-.type-fungal    { background: rgba(176,123,240,0.14); color: #d0a8ff; border: 1px solid rgba(176,123,240,0.40); box-shadow: 0 0 10px rgba(176,123,240,0.10); }
-.type-bacterial { background: rgba(92,168,240,0.14);  color: #9ac8ff; border: 1px solid rgba(92,168,240,0.40);  box-shadow: 0 0 10px rgba(92,168,240,0.10); }
-.type-viral     { background: rgba(240,92,92,0.14);   color: #ff9898; border: 1px solid rgba(240,92,92,0.40);   box-shadow: 0 0 10px rgba(240,92,92,0.10); }
-.type-pest      { background: rgba(240,176,64,0.14);  color: #ffd07a; border: 1px solid rgba(240,176,64,0.40);  box-shadow: 0 0 10px rgba(240,176,64,0.10); }
-.type-nutrient,
-.type-healthy   { background: rgba(46,204,110,0.14);  color: #7af0a0; border: 1px solid rgba(46,204,110,0.40);  box-shadow: 0 0 10px rgba(46,204,110,0.10); }
-
-/* ─── Alert Boxes ─── */
-.warning-box {
-  background: linear-gradient(135deg, rgba(240,176,64,0.08) 0%, rgba(240,176,64,0.04) 100%);
-  border: 1px solid rgba(240,176,64,0.38);
-  border-left: 4px solid var(--amber);
-  border-radius: var(--radius-md);
-  padding: 16px 22px;
-  margin: 14px 0;
-  color: #ffd07a;
-  font-size: 0.95rem;
-  box-shadow: 0 4px 20px rgba(240,176,64,0.08);
-  animation: fadeSlideUp 0.4s ease forwards;
-}
-.success-box {
-  background: linear-gradient(135deg, rgba(46,204,110,0.08) 0%, rgba(46,204,110,0.04) 100%);
-  border: 1px solid rgba(46,204,110,0.38);
-  border-left: 4px solid var(--green-main);
-  border-radius: var(--radius-md);
-  padding: 16px 22px;
-  margin: 14px 0;
-  color: #7af0a0;
-  font-size: 0.95rem;
-  box-shadow: 0 4px 20px rgba(46,204,110,0.08);
-  animation: fadeSlideUp 0.4s ease forwards;
-}
-.error-box {
-  background: linear-gradient(135deg, rgba(240,92,92,0.08) 0%, rgba(240,92,92,0.04) 100%);
-  border: 1px solid rgba(240,92,92,0.38);
-  border-left: 4px solid var(--red-accent);
-  border-radius: var(--radius-md);
-  padding: 16px 22px;
-  margin: 14px 0;
-  color: #ff9898;
-  font-size: 0.95rem;
-  box-shadow: 0 4px 20px rgba(240,92,92,0.08);
-  animation: fadeSlideUp 0.4s ease forwards;
-}
-
-/* ─── Debug Box ─── */
-.debug-box {
-  background: #020504;
-  border: 1px solid var(--border-dim);
-  border-radius: var(--radius-md);
-  padding: 14px;
-  margin: 10px 0;
-  font-family: 'JetBrains Mono', 'Courier New', monospace;
-  font-size: 0.82rem;
-  max-height: 380px;
-  overflow-y: auto;
-  color: var(--text-muted);
-  white-space: pre-wrap;
-}
-
-/* ─── Buttons ─── */
-.stButton > button {
-  background: linear-gradient(135deg, #1a7a40 0%, #11542b 100%) !important;
-  color: #e0f5e8 !important;
-  border: 1px solid rgba(46,204,110,0.55) !important;
-  padding: 12px 30px !important;
-  font-weight: 800 !important;
-  font-size: 0.90rem !important;
-  border-radius: 12px !important;
-  box-shadow:
-    0 4px 24px rgba(46,204,110,0.30),
-    0 0 0 0 rgba(46,204,110,0) !important;
-  transition: all 0.25s cubic-bezier(0.34, 1.56, 0.64, 1) !important;
-  font-family: 'Plus Jakarta Sans', sans-serif !important;
-  letter-spacing: 0.06em !important;
-  text-transform: uppercase !important;
-  position: relative !important;
-  overflow: hidden !important;
-}
-.stButton > button::after {
-  content: '';
-  position: absolute;
-  inset: 0;
-  background: linear-gradient(135deg, rgba(255,255,255,0.06) 0%, transparent 60%);
-  pointer-events: none;
-}
-.stButton > button:hover {
-  transform: translateY(-3px) scale(1.02) !important;
-  box-shadow:
-    0 10px 38px rgba(46,204,110,0.50),
-    0 0 0 2px rgba(46,204,110,0.25) !important;
-  background: linear-gradient(135deg, #22a050 0%, #177038 100%) !important;
-  border-color: var(--green-light) !important;
-}
-.stButton > button:active {
-  transform: translateY(-1px) scale(0.99) !important;
-}
-
-/* ─── Image Container ─── */
-.image-container {
-  border-radius: var(--radius-md);
-  overflow: hidden;
-  box-shadow: var(--shadow-deep), 0 0 0 1px var(--border-dim);
-  transition: box-shadow 0.3s ease;
-}
-.image-container:hover {
-  box-shadow: var(--shadow-deep), 0 0 0 1px var(--border-mid), 0 0 30px var(--green-glow);
-}
-
-/* ─── Tips Card ─── */
-.tips-card {
-  background: linear-gradient(135deg, var(--bg-card) 0%, #0f1c12 100%);
-  border: 1px solid var(--border-dim);
-  border-top: 2px solid var(--gold);
-  border-radius: var(--radius-md);
-  padding: 18px 22px;
-  margin: 10px 0;
-  box-shadow: 0 0 20px var(--gold-dim);
-  transition: box-shadow 0.3s ease;
-}
-.tips-card:hover { box-shadow: 0 0 30px rgba(240,192,64,0.15); }
-.tips-card-title {
-  font-family: 'Plus Jakarta Sans', sans-serif;
-  font-weight: 800;
-  color: var(--gold);
-  margin-bottom: 8px;
-  font-size: 0.73rem;
-  letter-spacing: 0.16em;
-  text-transform: uppercase;
-  text-shadow: 0 0 12px var(--gold-glow);
-}
-
-/* ─── Metric Containers ─── */
-[data-testid="metric-container"] {
-  background: linear-gradient(135deg, var(--bg-card) 0%, #0e1c12 100%) !important;
-  border: 1px solid var(--border-dim) !important;
-  border-radius: var(--radius-md) !important;
-  padding: 16px !important;
-  transition: border-color 0.25s ease, box-shadow 0.25s ease !important;
-}
-[data-testid="metric-container"]:hover {
-  border-color: var(--border-mid) !important;
-  box-shadow: var(--shadow-green) !important;
-}
-[data-testid="stExpander"] {
-  background: var(--bg-card) !important;
-  border: 1px solid var(--border-dim) !important;
-  border-radius: var(--radius-md) !important;
-  transition: border-color 0.25s ease !important;
-}
-[data-testid="stExpander"]:hover {
-  border-color: var(--border-mid) !important;
-}
-.streamlit-expanderHeader {
-  color: var(--text-secondary) !important;
-  font-family: 'Plus Jakarta Sans', sans-serif !important;
-  font-size: 0.95rem !important;
-  font-weight: 600 !important;
-}
-
-/* ─── Inputs ─── */
-input, textarea, select {
-  background: var(--bg-card) !important;
-  border: 1px solid var(--border-dim) !important;
-  color: var(--text-primary) !important;
-  font-size: 0.95rem !important;
-  border-radius: var(--radius-sm) !important;
-  font-family: 'Plus Jakarta Sans', sans-serif !important;
-  transition: border-color 0.25s ease, box-shadow 0.25s ease !important;
-}
-input:focus, textarea:focus, select:focus {
-  border-color: var(--green-main) !important;
-  box-shadow: 0 0 0 3px rgba(46,204,110,0.16) !important;
-}
-
-/* ─── Headings ─── */
-h2, h3, h4 {
-  font-family: 'Playfair Display', Georgia, serif !important;
-  color: var(--text-primary) !important;
-  font-size: 1.3rem !important;
-  letter-spacing: 0.01em !important;
-}
-
-/* ─── Stat Boxes ─── */
-.stat-box {
-  background: linear-gradient(135deg, var(--bg-card) 0%, #0f1e13 100%);
-  border: 1px solid var(--border-dim);
-  border-top: 2px solid var(--green-main);
-  border-radius: var(--radius-md);
-  padding: 24px 20px;
-  margin: 10px 0;
-  text-align: center;
-  transition: border-color 0.25s ease, box-shadow 0.25s ease, transform 0.25s cubic-bezier(0.34, 1.56, 0.64, 1);
-  animation: fadeSlideUp 0.4s ease forwards;
-}
-.stat-box:hover {
-  border-color: var(--border-bright);
-  box-shadow: var(--shadow-green), 0 0 0 1px rgba(46,204,110,0.12) inset;
-  transform: translateY(-4px);
-}
-.stat-value {
-  font-family: 'Playfair Display', Georgia, serif;
-  font-size: 2.1rem;
-  font-weight: 700;
-  color: var(--green-main);
-  margin: 8px 0;
-  letter-spacing: -0.03em;
-  text-shadow: 0 0 20px rgba(46,204,110,0.35);
-  background: linear-gradient(135deg, var(--green-main) 0%, var(--green-light) 100%);
-  -webkit-background-clip: text;
-  -webkit-text-fill-color: transparent;
-  background-clip: text;
-}
-.stat-label {
-  font-size: 0.66rem;
-  color: var(--text-muted);
-  font-weight: 800;
-  text-transform: uppercase;
-  letter-spacing: 0.16em;
-}
-
-/* ─── Page Headers (sub-pages) ─── */
-.page-header {
-  background: linear-gradient(160deg, #0a2010 0%, #061208 100%);
-  padding: 34px 30px;
-  border-radius: var(--radius-xl);
-  margin-bottom: 26px;
-  box-shadow: var(--shadow-deep), 0 0 60px rgba(46,204,110,0.08);
-  border: 1px solid var(--border-mid);
-  animation: pulseGlow 5s ease-in-out infinite;
-}
-.page-title {
-  font-family: 'Playfair Display', Georgia, serif;
-  font-size: 2.5rem;
-  font-weight: 900;
-  background: linear-gradient(135deg, #ffffff 0%, rgba(200,255,218,0.85) 100%);
-  -webkit-background-clip: text;
-  -webkit-text-fill-color: transparent;
-  background-clip: text;
-  text-align: center;
-  letter-spacing: -0.02em;
-}
-.page-subtitle {
-  font-size: 1rem;
-  color: var(--text-secondary);
-  text-align: center;
-  margin-top: 10px;
-  font-weight: 400;
-}
-
-/* ─── Rotation Cards ─── */
-.rotation-card {
-  background: linear-gradient(135deg, var(--bg-card) 0%, #0f1e13 100%);
-  border: 1px solid var(--border-dim);
-  border-radius: var(--radius-lg);
-  padding: 24px 22px;
-  margin: 14px 0;
-  transition: border-color 0.25s ease, transform 0.25s cubic-bezier(0.34, 1.56, 0.64, 1), box-shadow 0.25s ease;
-  animation: fadeSlideUp 0.4s ease forwards;
-}
-.rotation-card:hover {
-  border-color: var(--border-bright);
-  transform: translateY(-4px);
-  box-shadow: var(--shadow-green), 0 0 0 1px rgba(46,204,110,0.10) inset;
-}
-.rotation-year {
-  font-family: 'Plus Jakarta Sans', sans-serif;
-  font-size: 0.66rem;
-  font-weight: 900;
-  color: var(--gold);
-  margin-bottom: 10px;
-  letter-spacing: 0.22em;
-  text-transform: uppercase;
-  text-shadow: 0 0 12px var(--gold-glow);
-}
-.crop-name {
-  font-family: 'Playfair Display', Georgia, serif;
-  font-size: 1.45rem;
-  font-weight: 700;
-  color: var(--text-primary);
-  margin: 8px 0;
-}
-.crop-description {
-  font-size: 0.88rem;
-  color: var(--text-secondary);
-  margin-top: 8px;
-  line-height: 1.70;
-}
-
-/* ─── KisanAI Chatbot ─── */
-.chatbot-container {
-  background: var(--bg-card);
-  border: 1px solid var(--border-dim);
-  border-radius: var(--radius-lg);
-  padding: 18px;
-  margin: 16px 0;
-  max-height: 480px;
-  overflow-y: auto;
-  box-shadow: var(--shadow-deep);
-}
-.chat-message {
-  background: linear-gradient(135deg, var(--bg-raised) 0%, #131f16 100%);
-  border-left: 3px solid var(--green-main);
-  padding: 14px 18px;
-  margin: 8px 0;
-  border-radius: 0 var(--radius-sm) var(--radius-sm) 0;
-  font-size: 0.92rem;
-  color: var(--text-primary);
-  transition: background 0.25s ease, border-left-color 0.25s ease;
-  animation: fadeSlideUp 0.3s ease forwards;
-}
-.chat-message:hover {
-  background: linear-gradient(135deg, #1a2f1e 0%, #162819 100%);
-  border-left-color: var(--green-light);
-}
-
-/* ─── Kisan Response ─── */
-.kisan-response-box {
-  background: linear-gradient(135deg, rgba(46,204,110,0.07) 0%, var(--bg-card) 60%, #0c1610 100%);
-  border: 1px solid var(--border-mid);
-  border-left: 4px solid var(--green-main);
-  border-radius: var(--radius-lg);
-  padding: 28px;
-  margin: 20px 0;
-  font-size: 1.02rem;
-  line-height: 1.88;
-  color: var(--text-primary);
-  font-weight: 400;
-  box-shadow: 0 4px 30px rgba(46,204,110,0.08);
-  animation: fadeSlideUp 0.45s ease forwards;
-}
-</style>
-""",
-    unsafe_allow_html=True,
-)
+# plant_doctor/data/theme.css, minified to static/theme.min.css. With static
+# serving on, reruns send only a small loader and the browser caches the sheet.
+if st.get_option("server.enableStaticServing") and theme_asset_ready():
+    _theme_html = theme_loader_html(st.get_option("server.baseUrlPath"))
+    components.html(_theme_html, height=0)
+else:
+    _theme_html = inline_theme_html()
+    st.markdown(_theme_html, unsafe_allow_html=True)
+_run_profile.mark("page config + CSS")
 
 
 # ============ MULTI-MODEL CONFIG ============
-# ─── Gemini vision chain (same API key, separate quota pools) ──────────────
-# Free limits: 2.5 Flash ~250 RPD → 1.5 Flash 1500 RPD → 1.5 Flash-8B 1500 RPD
-VISION_MODEL_CHAIN = [
-    "gemini-2.5-flash",       # PRIMARY  — best quality (250 RPD)
-    "gemini-1.5-flash",       # FALLBACK — higher quota (1500 RPD)
-    "gemini-1.5-flash-8b",    # LAST RESORT — lightest (1500 RPD)
-]
-
-# ─── OpenRouter vision fallback (completely free via openrouter.ai) ────────
-OPENROUTER_VISION_MODEL = "qwen/qwen-2.5-vl-7b-instruct:free"
-OPENROUTER_TEXT_MODEL   = "meta-llama/llama-3.3-70b-instruct:free"
-
-# ─── Text-only chain (chatbot, crop rotation, translation) ────────────────
-# Groq: 14,400 free RPD  |  OpenRouter: unlimited free tier
-GROQ_TEXT_MODELS = [
-    "llama-3.1-8b-instant",     # 14,400 RPD free — very fast
-    "llama-3.3-70b-versatile",  # 1,000  RPD free — highest quality
-]
-
-try:
-    genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-except Exception:
+# Only the key is checked here; the Gemini SDK is imported and configured on
+# the first vision/text call (see plant_doctor.providers).
+if not get_secret("GEMINI_API_KEY"):
     st.error("GEMINI_API_KEY not found in environment variables!")
     st.stop()
 
-# ─── Optional clients (won't crash if keys missing) ────────────────────────
-def _get_secret(name: str) -> str:
-    """
-    Bulletproof secret reader — works on Streamlit Cloud AND local dev.
-    Strategy:
-      1. st.secrets[name]         — direct key lookup (most reliable on Cloud)
-      2. st.secrets.get(name, "") — fallback for older Streamlit
-      3. os.environ.get(name, "") — local .env / shell exports
-    """
-    # Method 1: direct bracket access (handles [section] nesting too)
-    try:
-        if hasattr(st, "secrets") and name in st.secrets:
-            val = st.secrets[name]
-            if val:
-                return str(val).strip()
-    except Exception:
-        pass
-    # Method 2: .get() method
-    try:
-        if hasattr(st, "secrets"):
-            val = st.secrets.get(name, "")
-            if val:
-                return str(val).strip()
-    except Exception:
-        pass
-    # Method 3: environment variable
-    val = os.environ.get(name, "")
-    return val.strip() if val else ""
-
-# ── Lazy client initialisation via @st.cache_resource ────────────
-# Using cache_resource ensures this runs AFTER Streamlit fully boots,
-# so st.secrets is 100% accessible (unlike bare module-level code).
-
-@st.cache_resource(show_spinner=False)
-def _get_groq_client():
-    """Return an authenticated Groq client, or None if unavailable."""
-    if not GROQ_AVAILABLE:
-        return None
-    key = _get_secret("GROQ_API_KEY")
-    if not key:
-        return None
-    try:
-        return GroqClient(api_key=key)
-    except Exception:
-        return None
-
-@st.cache_resource(show_spinner=False)
-def _get_openrouter_client():
-    """Return an authenticated OpenRouter client, or None if unavailable."""
-    if not OPENAI_SDK_AVAILABLE:
-        return None
-    key = _get_secret("OPENROUTER_API_KEY")
-    if not key:
-        return None
-    try:
-        return OpenAIClient(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=key,
-        )
-    except Exception:
-        return None
-
-# These are resolved after Streamlit is fully loaded (first sidebar render)
-_groq_client       = _get_groq_client()
-_openrouter_client = _get_openrouter_client()
-
-# ─── Response cache (avoid re-calling API for same image+plant) ──────────────
-import hashlib as _hashlib
-_RESPONSE_CACHE: dict = {}   # { cache_key: (result_dict, raw_text) }
-_CACHE_MAX = 50              # keep last 50 results in memory
-
-def _make_cache_key(parts: list, plant_type: str) -> str:
-    hasher = _hashlib.md5()
-    hasher.update(plant_type.encode())
-    for p in parts:
-        if isinstance(p, str):
-            hasher.update(p[:200].encode())
-        else:
-            try:
-                import io as _io
-                buf = _io.BytesIO()
-                p.save(buf, format="PNG")
-                hasher.update(buf.getvalue()[:4096])
-            except Exception:
-                pass
-    return hasher.hexdigest()
-
-def _cache_get(key: str):
-    return _RESPONSE_CACHE.get(key)
-
-def _cache_set(key: str, value):
-    if len(_RESPONSE_CACHE) >= _CACHE_MAX:
-        oldest = next(iter(_RESPONSE_CACHE))
-        del _RESPONSE_CACHE[oldest]
-    _RESPONSE_CACHE[key] = value
-
-def _is_quota_err(e):
-    s = str(e).lower()
-    return any(x in s for x in ["429", "quota", "rate limit", "resource_exhausted",
-                                  "too many", "overloaded", "capacity"])
-
-def _retry_generate(model_id: str, parts: list, max_retries: int = 3):
-    """Single model call with exponential back-off on transient/quota errors."""
-    import time as _time
-    last_err = None
-    for attempt in range(max_retries):
-        try:
-            m = genai.GenerativeModel(model_id)
-            resp = m.generate_content(parts)
-            text = getattr(resp, "text", "") or ""
-            if text.strip():
-                return text
-            raise ValueError("Empty response from model")
-        except Exception as e:
-            last_err = e
-            is_quota = _is_quota_err(e)
-            is_transient = any(x in str(e).lower() for x in
-                               ["500", "503", "internal", "unavailable", "timeout",
-                                "deadline", "empty", "connection"])
-            if (is_quota or is_transient) and attempt < max_retries - 1:
-                wait = 2 ** attempt          # 1s → 2s → 4s
-                _time.sleep(wait)
-                continue
-            break
-    raise last_err
-
-def gemini_vision_with_fallback(parts: list, prefer_pro: bool = False):
-    """
-    Ultra-stable vision call:
-      1. Gemini 2.5 Flash  (primary, best quality)
-      2. Gemini 1.5 Flash  (fallback, higher quota)
-      3. Gemini 1.5 Flash-8B (last-resort Gemini)
-      4. OpenRouter Qwen2.5-VL (free, no key required beyond OR key)
-    Each model gets up to 3 auto-retries with exponential back-off.
-    """
-    chain = VISION_MODEL_CHAIN.copy()
-    if prefer_pro:
-        chain = ["gemini-2.5-pro"] + chain
-
-    last_err = None
-    for model_id in chain:
-        try:
-            text = _retry_generate(model_id, parts, max_retries=3)
-            return text, model_id
-        except Exception as e:
-            last_err = e
-            if _is_quota_err(e):
-                continue          # quota hit → try next model immediately
-            # Non-quota hard error on primary → still try fallbacks
-            continue
-
-    # All Gemini models exhausted → OpenRouter Qwen vision (if enabled in sidebar)
-    _or_client_live = _openrouter_client or _get_openrouter_client()
-    _force_qwen = st.session_state.get("force_qwen_vision", False) if hasattr(st, "session_state") else False
-    _or_enabled = _force_qwen or st.session_state.get("use_openrouter_vision", True) if hasattr(st, "session_state") else True
-    if _or_client_live and _or_enabled:
-        try:
-            import base64 as _b64, io as _io
-            content_parts = []
-            for part in parts:
-                if isinstance(part, str):
-                    content_parts.append({"type": "text", "text": part})
-                else:
-                    buf = _io.BytesIO()
-                    part.save(buf, format="PNG")
-                    b64 = _b64.b64encode(buf.getvalue()).decode()
-                    content_parts.append({
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{b64}"}
-                    })
-            resp = _or_client_live.chat.completions.create(
-                model=OPENROUTER_VISION_MODEL,
-                messages=[{"role": "user", "content": content_parts}],
-                max_tokens=3000,
-                timeout=30,
-            )
-            text = resp.choices[0].message.content or ""
-            if text.strip():
-                return text, OPENROUTER_VISION_MODEL
-        except Exception as or_err:
-            last_err = or_err
-
-    raise RuntimeError(
-        "⏳ All vision models are temporarily at capacity. "
-        "Please wait ~60 seconds and try again. "
-        f"(Last error: {str(last_err)[:100]})"
-    )
 
-def gemini_text_with_fallback(prompt: str):
-    """
-    Ultra-stable text call:
-      1. Groq Llama-3.1-8B  (14,400 free RPD — fastest)
-      2. Groq Llama-3.3-70B (1,000  free RPD — best quality)
-      3. OpenRouter Llama-70B (free tier)
-      4. Gemini 2.5 Flash → 1.5 Flash → 1.5 Flash-8B
-    Each provider gets auto-retries with back-off.
-    """
-    import time as _time
-
-    # 1. Groq — fastest + highest free quota
-    # Re-resolve Groq client each call (handles post-boot secret loading)
-    _gc = _groq_client or _get_groq_client()
-    if _gc:
-        for gm in GROQ_TEXT_MODELS:
-            for attempt in range(3):
-                try:
-                    resp = _gc.chat.completions.create(
-                        model=gm,
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=2048,
-                        temperature=0.3,
-                        timeout=20,
-                    )
-                    text = (resp.choices[0].message.content or "").strip()
-                    if text:
-                        return text, f"Groq/{gm}"
-                except Exception as e:
-                    if _is_quota_err(e) and attempt < 2:
-                        _time.sleep(2 ** attempt)
-                        continue
-                    break
-
-    # 2. OpenRouter text
-    _or_text_live = _openrouter_client or _get_openrouter_client()
-    if _or_text_live:
-        for attempt in range(2):
-            try:
-                resp = _or_text_live.chat.completions.create(
-                    model=OPENROUTER_TEXT_MODEL,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=2048,
-                    timeout=25,
-                )
-                text = (resp.choices[0].message.content or "").strip()
-                if text:
-                    return text, "OpenRouter/Llama-70B"
-            except Exception as e:
-                if _is_quota_err(e) and attempt < 1:
-                    _time.sleep(2)
-                    continue
-                break
-
-    # 3. Gemini text fallback chain
-    for model_id in ["gemini-2.5-flash", "gemini-1.5-flash", "gemini-1.5-flash-8b"]:
-        try:
-            text = _retry_generate(model_id, [prompt], max_retries=3)
-            return text, model_id
-        except Exception as e:
-            if _is_quota_err(e):
-                continue
-            continue
-
-    raise RuntimeError(
-        "⏳ All text models are temporarily at capacity. Please wait a moment and try again."
-    )
+def _openrouter_vision_client():
+    """Async OpenRouter client if the Qwen vision fallback is enabled for this session."""
+    if st.session_state.get("force_qwen_vision", False) or st.session_state.get("use_openrouter_vision", True):
+        return get_async_openrouter_client()
+    return None
 
-EXPERT_PROMPT_TEMPLATE = """You are a world-class plant pathologist and image analyst with 40 years of field experience diagnosing diseases in {plant_type}.
-
-STEP 1 — IMAGE VALIDITY CHECK (do this FIRST, before any diagnosis):
-Carefully examine what is shown in the image(s).
-- If the image does NOT contain any plant, leaf, stem, root, or fruit at all (e.g. it shows a person, animal, object, sky, food on a plate, etc.):
-  → Set "is_plant_image": false, "disease_name": "Unable to diagnose", "confidence": 0, "severity": "healthy"
-- If the image contains a plant but it does NOT look like {plant_type}:
-  → Set "is_correct_plant": false, "disease_name": "Unable to diagnose — Image does not appear to be {plant_type}", "confidence": 0
-- If the image is too blurry, too dark, too distant, or otherwise unanalyzable:
-  → Set "image_quality": "Poor", "disease_name": "Unable to diagnose — Image quality too low for analysis", "confidence": 0
-- Only proceed to Step 2 if is_plant_image=true AND is_correct_plant=true AND image_quality is not "Poor"
-
-STEP 2 — DEEP DISEASE DIAGNOSIS (only if Step 1 passes):
-Analyze every visible detail with expert precision:
-• Lesion shape, color zones, margins (sharp vs. fuzzy), distribution pattern (scattered/zonal/systemic)
-• Necrosis, chlorosis, water-soaking, wilting, cankers, pustules, mold, powder, streaks
-• Insect frass, webbing, stippling, galleries, egg masses
-• Nutrient deficiency patterns (interveinal, tip, margin)
-• Compare findings against known {plant_type} disease profiles: {common_diseases}
-
-SEVERITY MUST BE DETERMINED FROM THE IMAGE VISUALLY — NOT FROM DISEASE NAME:
-- "healthy"  → No visible abnormalities, fully normal leaf/plant appearance
-- "mild"     → <20% leaf/plant area affected; small isolated spots or early lesions; plant mostly normal
-- "moderate" → 20–50% area affected; multiple lesions merging; visible wilting or discoloration across sections
-- "severe"   → >50% area affected; extensive necrosis/wilting/rot; plant structure visibly compromised
-
-ACCURACY RULES:
-1. RESPOND ONLY WITH VALID JSON — zero markdown, zero text outside the JSON
-2. If the plant looks fully healthy with no abnormalities → "disease_name": "Healthy Plant", "severity": "healthy"
-3. "Unable to diagnose" ONLY for invalid images or genuinely ambiguous cases after full analysis
-4. Confidence scale: 0-49 = ambiguous/invalid, 50-70 = probable, 71-89 = likely, 90-100 = certain
-5. Never hallucinate symptoms — only report what is actually visible in the image
-6. Severity is based on the VISIBLE DAMAGE in the image only — not on what the disease typically does
-7. If multiple diseases are equally possible, pick the most statistically common one for {plant_type} and list others in differential_diagnosis
-
-RESPOND WITH EXACTLY THIS JSON (all keys required, no extras):
-{{
-  "is_plant_image": true,
-  "is_correct_plant": true,
-  "plant_species": "{plant_type}",
-  "disease_name": "Exact disease name / Healthy Plant / Unable to diagnose",
-  "disease_type": "fungal/bacterial/viral/pest/nutrient/environmental/healthy",
-  "severity": "healthy/mild/moderate/severe — based ONLY on visible image damage percentage",
-  "confidence": 85,
-  "confidence_reason": "Exact visual evidence that drives this confidence level for {plant_type}",
-  "image_quality": "Excellent/Good/Fair/Poor — brief reason",
-  "symptoms": ["Specific visible symptom 1 with location", "Symptom 2", "Symptom 3 if present"],
-  "differential_diagnosis": [
-    "Most likely: Disease A — key matching visual features",
-    "Possible: Disease B — why considered but less likely",
-    "Ruled out: Disease C — why this does NOT match"
-  ],
-  "probable_causes": ["Primary pathogen/cause with reasoning", "Contributing environmental factor", "Secondary cause if any"],
-  "immediate_action": ["Urgent action 1 specific to {plant_type}", "Action 2", "Action 3"],
-  "organic_treatments": ["Organic product 1 with dosage/rate for {plant_type}", "Organic product 2"],
-  "chemical_treatments": ["Chemical 1 with exact dilution rate for {plant_type}", "Chemical 2 with dilution"],
-  "prevention_long_term": ["Prevention strategy 1 for {plant_type}", "Prevention strategy 2", "Resistant variety if known"],
-  "plant_specific_notes": "Critical management notes unique to {plant_type}",
-  "similar_conditions": "Other {plant_type} diseases easily confused with this diagnosis"
-}}"""
-
-PLANT_ID_PROMPT_TEMPLATE = """You are a world-class botanist and plant taxonomist with expertise in identifying plant species from images.
-
-YOUR TASK: Identify the exact plant species shown in this image with the highest possible accuracy.
-
-IDENTIFICATION RULES:
-1. Examine leaf shape, venation pattern, leaf margins, texture, color, stem structure, fruit/flower if visible
-2. RESPOND ONLY WITH VALID JSON — no markdown, no explanations
-3. If the image is not a plant at all → set "is_plant_image": false
-4. If you can identify the plant with >70% confidence → provide the common name and scientific name
-5. If you cannot identify it confidently → say "Unknown Plant" but still describe what you see
-6. Never guess blindly — partial identification is better than a wrong one
-
-RESPOND WITH EXACTLY THIS JSON:
-{
-  "is_plant_image": true,
-  "common_name": "Tomato / Unknown Plant / Not a plant",
-  "scientific_name": "Solanum lycopersicum or Unknown",
-  "plant_family": "Solanaceae or Unknown",
-  "identification_confidence": 88,
-  "identification_reason": "Key visual features that led to this identification",
-  "visible_features": ["Feature 1 used for ID", "Feature 2", "Feature 3"],
-  "possible_alternatives": ["Other plant this could be", "Second alternative"],
-  "image_quality": "Excellent/Good/Fair/Poor — reason"
-}"""
-
-
-PLANT_COMMON_DISEASES = {
-    # ── Vegetables ──────────────────────────────────────────────────────────────
-    "Tomato": "Early blight (Alternaria solani), Late blight (Phytophthora infestans), Septoria leaf spot, Fusarium wilt, Bacterial wilt (Ralstonia), Powdery mildew, Gray mold (Botrytis), Leaf curl virus, Spider mites, Bacterial speck, Buckeye rot, Blossom end rot",
-    "Potato": "Late blight (Phytophthora infestans), Early blight (Alternaria solani), Verticillium wilt, Potato scab (Streptomyces), Rhizoctonia canker, Blackleg (Pectobacterium), Potato virus Y, Leafroll virus, Silver scurf, Fusarium dry rot",
-    "Pepper": "Anthracnose (Colletotrichum), Bacterial wilt, Phytophthora blight, Cercospora leaf spot, Pepper weevil, Powdery mildew, Leaf curl virus, Fusarium wilt, Bacterial leaf spot (Xanthomonas), Botrytis gray mold",
-    "Cucumber": "Powdery mildew, Downy mildew, Angular leaf spot (Pseudomonas), Anthracnose, Gummy stem blight, Cucumber mosaic virus, Fusarium crown rot, Phytophthora blight, Bacterial wilt (Erwinia), Cucumber beetles",
-    "Eggplant": "Verticillium wilt, Phomopsis blight, Cercospora leaf spot, Fusarium wilt, Little leaf disease (phytoplasma), Bacterial wilt, Phytophthora blight, Mites, Shoot and fruit borer",
-    "Lettuce": "Lettuce mosaic virus, Downy mildew, Septoria leaf spot, Bottom rot (Rhizoctonia), Tip burn, Big vein disease, Corky root, Powdery mildew, Sclerotinia drop, Bacterial leaf spot",
-    "Spinach": "Downy mildew (Peronospora), White rust (Albugo), Cercospora leaf spot, Anthracnose, Fusarium wilt, Spinach mosaic virus, Phytophthora crown rot, Damping off",
-    "Cabbage": "Black rot (Xanthomonas), Clubroot (Plasmodiophora), Downy mildew, Alternaria leaf spot, Sclerotinia stem rot, Fusarium yellows, Blackleg, Cabbage looper, Aphids, White mold",
-    "Onion": "Purple blotch (Alternaria porri), Downy mildew, Fusarium basal rot, Pink root, Botrytis neck rot, Bacterial soft rot, White rot (Sclerotium), Smut, Iris yellow spot virus, Stemphylium blight",
-    "Garlic": "White rot (Sclerotium cepivorum), Fusarium basal rot, Downy mildew, Rust (Puccinia), Botrytis neck rot, Purple blotch, Bacterial soft rot, Garlic mosaic virus, Stemphylium leaf blight",
-    "Carrot": "Alternaria leaf blight, Cercospora leaf blight, Aster yellows phytoplasma, Bacterial leaf blight (Xanthomonas), Cavity spot (Pythium), Carrot rust fly, Powdery mildew, Sclerotinia rot, Fusarium dry rot",
-    "Okra": "Yellow vein mosaic virus (YVMV), Fusarium wilt, Powdery mildew, Cercospora leaf spot, Root-knot nematode, Damping off, Alternaria leaf spot, Bacterial wilt, Shoot and fruit borer",
-    "Brinjal": "Phomopsis fruit and stem blight, Verticillium wilt, Bacterial wilt, Little leaf phytoplasma, Fusarium wilt, Cercospora leaf spot, Alternaria leaf spot, Shoot and fruit borer",
-    "Bitter Gourd": "Powdery mildew, Downy mildew, Mosaic virus (CMV), Alternaria leaf spot, Fusarium wilt, Anthracnose, Fruit fly, Gummy stem blight",
-    "Bottle Gourd": "Downy mildew, Powdery mildew, Mosaic virus, Alternaria leaf spot, Anthracnose, Fruit fly, Fusarium wilt, Angular leaf spot",
-    "Pumpkin": "Powdery mildew, Downy mildew, Phytophthora blight, Mosaic virus, Fusarium wilt, Anthracnose, Bacterial wilt, Gummy stem blight, Squash vine borer",
-    "Cauliflower": "Black rot, Downy mildew, Alternaria leaf spot, Clubroot, Sclerotinia stem rot, Fusarium yellows, Blackleg, Hollowstem, Ring spot virus",
-    # ── Fruits ──────────────────────────────────────────────────────────────────
-    "Tomato": "Early blight, Late blight, Septoria leaf spot, Fusarium wilt, Bacterial wilt, Powdery mildew, Gray mold, Leaf curl virus, Spider mites, Bacterial speck",
-    "Mango": "Powdery mildew (Oidium mangiferae), Anthracnose (Colletotrichum gloeosporioides), Bacterial canker (Xanthomonas), Mango malformation, Sooty mold, Phoma blight, Stem end rot, Gummosis, Mango hoppers, Red rust algae",
-    "Banana": "Panama wilt (Fusarium oxysporum), Black Sigatoka (Mycosphaerella fijiensis), Yellow Sigatoka, Bunchy top virus (BBTV), Bacterial wilt (Xanthomonas), Moko disease, Anthracnose, Cigar end rot, Banana weevil, Nematodes",
-    "Grape": "Powdery mildew (Uncinula necator), Downy mildew (Plasmopara viticola), Black rot (Guignardia), Botrytis gray mold, Anthracnose, Phomopsis cane and leaf spot, Pierce's disease, Fanleaf virus, Grape phylloxera, Crown gall",
-    "Apple": "Apple scab (Venturia inaequalis), Fire blight (Erwinia amylovora), Powdery mildew, Cedar apple rust, Sooty blotch, Flyspeck, Bitter rot, Brown rot, Collar rot, Apple mosaic virus",
-    "Strawberry": "Gray mold (Botrytis cinerea), Powdery mildew, Angular leaf spot, Leaf scorch, Leaf blight, Red stele root rot, Phytophthora crown rot, Verticillium wilt, Strawberry mosaic virus, Two-spotted spider mite",
-    "Citrus": "Citrus canker (Xanthomonas), Greening/HLB (Candidatus Liberibacter), Melanose (Diaporthe), Phytophthora gummosis, Alternaria brown spot, Citrus scab, Sooty mold, Tristeza virus (CTV), Citrus nematode, Anthracnose",
-    "Papaya": "Papaya ringspot virus (PRSV), Anthracnose (Colletotrichum), Phytophthora root rot, Powdery mildew, Black spot (Asperisporium), Bacterial canker, Damping off, Root-knot nematode, Papaya mealy bug",
-    "Guava": "Anthracnose, Fruit canker (Pestalotiopsis), Stylar end rot, Wilt (Fusarium), Algal leaf spot (Cephaleuros), Root-knot nematode, Red rust, Phytophthora blight",
-    "Pomegranate": "Cercospora leaf and fruit spot, Alternaria fruit rot, Bacterial blight (Xanthomonas), Anthracnose, Fruit cracking, Phomopsis blight, Heart rot (Aspergillus), Butterfly (Deudorix isocrates)",
-    "Litchi": "Anthracnose, Downy blight (Peronophythora), Leaf blight (Alternaria), Witch's broom (phytoplasma), Erinose mite, Bark eating caterpillar, Fruit borer",
-    "Coconut": "Lethal yellowing phytoplasma, Bud rot (Phytophthora), Leaf blight (Pestalotiopsis), Crown choke (Thielaviopsis), Red ring nematode, Rhinoceros beetle, Stem bleeding, Root wilt disease",
-    "Watermelon": "Anthracnose, Fusarium wilt, Gummy stem blight (Didymella), Downy mildew, Powdery mildew, Bacterial fruit blotch, Phytophthora fruit rot, Mosaic virus, Cercospora leaf spot",
-    "Melon": "Powdery mildew, Downy mildew, Anthracnose, Fusarium wilt, Gummy stem blight, Angular leaf spot, Cucumber mosaic virus, Phytophthora crown rot, Belly rot",
-    # ── Grains & Cereals ────────────────────────────────────────────────────────
-    "Wheat": "Stripe rust (Puccinia striiformis), Leaf rust (Puccinia triticina), Stem rust (Puccinia graminis), Powdery mildew, Septoria leaf blotch, Tan spot (Pyrenophora), Fusarium head blight, Karnal bunt, Loose smut, Wheat blast",
-    "Rice": "Blast (Magnaporthe oryzae), Brown spot (Bipolaris oryzae), Bacterial leaf blight (Xanthomonas), Sheath blight (Rhizoctonia solani), False smut (Ustilaginoidea), Narrow brown leaf spot, Tungro virus, Bacterial leaf streak, Bakanae (Gibberella), Stem rot",
-    "Corn": "Northern leaf blight (Exserohilum turcicum), Southern leaf blight (Bipolaris maydis), Gray leaf spot (Cercospora), Common rust (Puccinia sorghi), Southern rust, Stewart's bacterial wilt, Goss's wilt, Smut (Ustilago), Fusarium ear rot, Aflatoxin (Aspergillus)",
-    "Sorghum": "Grain mold (Fusarium/Curvularia), Anthracnose, Covered kernel smut, Downy mildew, Bacterial stripe, Sooty stripe, Rust, Charcoal rot, Ergot (Claviceps), Stem borer",
-    "Barley": "Powdery mildew, Scald (Rhynchosporium), Net blotch (Pyrenophora teres), Loose smut, Covered smut, Barley stripe mosaic virus, Leaf rust, Stem rust, Fusarium crown rot",
-    # ── Cash Crops & Others ─────────────────────────────────────────────────────
-    "Cotton": "Bacterial blight (Xanthomonas), Verticillium wilt, Fusarium wilt, Boll rot (Sclerotinia), Alternaria leaf spot, Gray mildew (Ramularia), Anthracnose, Angular leaf spot, Root rot (Phytophthora), Leaf curl virus",
-    "Sugarcane": "Red rot (Glomerella tucumanensis), Smut (Sporisorium scitamineum), Ratoon stunting disease, Grassy shoot (phytoplasma), Pineapple disease (Ceratocystis), Wilt, Pokkah boeng (Fusarium), Leaf scald (Xanthomonas), Ring spot, Top rot",
-    "Soybean": "Sudden death syndrome (Fusarium), Soybean rust (Phakopsora pachyrhizi), Phytophthora root rot, Bacterial pustule (Xanthomonas), Brown stem rot, Pod and stem blight, Downy mildew, Bean pod mottle virus, Charcoal rot, Frogeye leaf spot",
-    "Groundnut": "Tikka disease (Cercospora), Rust (Puccinia arachidis), Collar rot (Sclerotium), Stem rot (Sclerotium rolfsii), Bud necrosis virus (TSWV), Early leaf spot, Late leaf spot, Aflatoxin (Aspergillus flavus), Root-knot nematode, Crown rot",
-    "Sunflower": "Alternaria leaf spot and blight, Downy mildew (Plasmopara halstedii), Sclerotinia stem rot, Powdery mildew, Rust (Puccinia helianthi), Phoma black stem, Charcoal rot, Verticillium wilt, Apion stem weevil",
-    "Mustard": "Alternaria blight, White rust (Albugo candida), Sclerotinia stem rot, Downy mildew, Powdery mildew, Black rot, Phoma stem canker, Turnip mosaic virus, Aphids",
-    # ── Plantation Crops ───────────────────────────────────────────────────────
-    "Tea": "Blister blight (Exobasidium vexans), Red rust algae (Cephaleuros), Gray blight (Pestalotiopsis), Black rot, Charcoal stump rot (Ustulina), Die-back (Phomopsis), Thorny stem blight, Tea mosquito bug, Red spider mite, Looper caterpillar",
-    "Coffee": "Coffee leaf rust (Hemileia vastatrix), Coffee berry disease (Colletotrichum), Black rot (Phytophthora), Brown eye spot (Cercospora), Wilt (Gibberella), Leaf scorch (Cercospora coffeicola), Root-knot nematode, Mealy bug, White stem borer",
-    "Rubber": "Abnormal leaf fall (Phytophthora), Pink disease (Corticium salmonicolor), White root disease (Rigidoporus), Black stripe (Phytophthora), Colletotrichum leaf disease, Oidium leaf fall (powdery mildew), Brown bast, Corynespora leaf fall",
-    "Cardamom": "Capsule rot (Phytophthora), Katte (mosaic) virus, Azhukal (clump rot), Leaf blotch (Pestalotiopsis), Damping off, Root-knot nematode, Thrips, Shoot fly",
-    # ── Ornamentals ─────────────────────────────────────────────────────────────
-    "Rose": "Black spot (Diplocarpon rosae), Powdery mildew (Podosphaera), Rust (Phragmidium), Botrytis blight, Rose rosette virus, Downy mildew, Crown gall (Agrobacterium), Stem canker, Cercospora leaf spot, Rose slug sawfly, Aphids, Spider mites",
-    "Marigold": "Alternaria leaf spot, Powdery mildew, Phytophthora blight, Botrytis blight, Fusarium wilt, Damping off, Root-knot nematode, Leaf curl, Spotted wilt virus, Bud borer",
-    "Chrysanthemum": "Powdery mildew, Rust (Puccinia horiana), Botrytis blight, Verticillium wilt, Leafy gall (Rhodococcus), Chrysanthemum mosaic virus, Leaf miner, Aphids, Red spider mite",
-    "Jasmine": "Leaf spot (Cercospora), Leaf blight (Alternaria), Rust (Prospodium), Bud borer, Mites, Powdery mildew, Die back, Root-knot nematode",
-    # ── Trees ───────────────────────────────────────────────────────────────────
-    "Neem": "Leaf spot (Cercospora), Die back, Powdery mildew, Twig canker, Root rot, Leaf webber caterpillar, Scale insects",
-    "Eucalyptus": "Stem canker (Botryosphaeria), Leaf spot (Cylindrocladium), Pink disease (Corticium), Die back, Cyst nematode, Chrysomelid beetles",
-    "Bamboo": "Witches broom (Aciculosporium), Culm blight (Sarocladium), Leaf rust, Powdery mildew, Mealybug, Termites, Bamboo mite",
-}
 
 # ============ HELPER FUNCTIONS ============
 
@@ -1519,54 +99,18 @@ def get_severity_badge_class(severity):
     return "severity-moderate"
 
 
-def get_treatment_cost(treatment_type, treatment_name):
-    costs = TREATMENT_COSTS.get(treatment_type, {})
-    treatment_name_lower = treatment_name.lower()
-    for key, value in costs.items():
-        if key.lower() == treatment_name_lower:
-            return value["cost"] if isinstance(value, dict) else value
-    for key, value in costs.items():
-        if key.lower() in treatment_name_lower or treatment_name_lower in key.lower():
-            return value["cost"] if isinstance(value, dict) else value
-    return 300 if treatment_type == "organic" else 250
-
-
-def get_treatment_info(treatment_type, treatment_name):
-    costs = TREATMENT_COSTS.get(treatment_type, {})
-    for key, value in costs.items():
-        if key.lower() == treatment_name.lower():
-            if isinstance(value, dict):
-                return value
-            return {
-                "cost": value,
-                "quantity": "As per package",
-                "dilution": "Follow label instructions",
-            }
-    for key, value in costs.items():
-        if key.lower() in treatment_name.lower() or treatment_name.lower() in key.lower():
-            if isinstance(value, dict):
-                return value
-            return {
-                "cost": value,
-                "quantity": "As per package",
-                "dilution": "Follow label instructions",
-            }
-    return {
-        "cost": 300 if treatment_type == "organic" else 250,
-        "quantity": "As per package",
-        "dilution": "Follow label instructions",
-    }
-
-
-def normalize_treatment_name(raw_name: str) -> str:
-    if not isinstance(raw_name, str):
+def price_match_note(info: dict) -> str:
+    """Small suffix saying where a treatment price came from, unless it matched the catalogue exactly."""
+    match = info.get("match")
+    if match is None or match.quality in ("exact", "alias"):
         return ""
-    name = raw_name.strip()
-    if " - " in name:
-        name = name.split(" - ", 1)[0].strip()
-    if ":" in name:
-        name = name.split(":", 1)[0].strip()
-    return name
+    if match.quality == "default":
+        text = "estimate — not in price list"
+    elif match.quality == "fuzzy":
+        text = f"≈ priced as {match.key}, {match.score:.0%} match"
+    else:
+        text = f"priced as {match.key}"
+    return f' <span style="font-size:0.85rem; opacity:0.75;">({text})</span>'
 
 
 def render_treatment_selection_ui(
@@ -1674,7 +218,8 @@ def render_treatment_selection_ui(
         "base_plants": base_plants,
         "total_cost": total_cost,
         "quantity": quantity,
-        'total_plants': total_plants
+        'total_plants': total_plants,
+        "price_match": info["match"].quality,
     }
 
     st.markdown(
@@ -1682,7 +227,7 @@ def render_treatment_selection_ui(
         <div class="cost-info" style="margin-top: 10px;">
             Selected: <b>{selected_name}</b> ({treatment_type_choice})<br>
             Quantity guideline: {quantity}<br>
-            Estimated total treatment cost for {infected_plants} plants: <b>Rs {total_cost}</b><br>
+            Estimated total treatment cost for {infected_plants} plants: <b>Rs {total_cost}</b>{price_match_note(info)}<br>
             <span style="font-size:0.9rem; color:#b0c4ff;">
                 This is based on typical Indian retail prices and standard doses
                 for about 100 plants.
@@ -1790,7 +335,7 @@ def render_diagnosis_and_treatments(result: dict, plant_type: str, infected_coun
                     <div class="treatment-quantity">Quantity: {quantity}</div>
                     <div class="treatment-dilution">Dilution: {dilution}</div>
                     <div class="cost-info" style="margin-top: 8px; border-left: 5px solid #81c784;">
-                        Cost: Rs {cost}
+                        Cost: Rs {cost}{price_match_note(info)}
                     </div>
                 </div>
                 """,
@@ -1820,7 +365,7 @@ def render_diagnosis_and_treatments(result: dict, plant_type: str, infected_coun
                     <div class="treatment-quantity">Quantity: {quantity}</div>
                     <div class="treatment-dilution">Dilution: {dilution}</div>
                     <div class="cost-info" style="margin-top: 8px; border-left: 5px solid #64b5f6;">
-                        Cost: Rs {cost}
+                        Cost: Rs {cost}{price_match_note(info)}
                     </div>
                 </div>
                 """,
@@ -1867,229 +412,53 @@ def render_diagnosis_and_treatments(result: dict, plant_type: str, infected_coun
     )
 
     return organic_total_block, chemical_total_block
-def translate_report(report_text, language):
-    if language == "English":
-        return report_text
-    prompt = (
-        f"Translate this farm report to {language}. "
-        f"Keep all numbers, Rs symbols, % signs, and colons exactly as they are. "
-        f"Only translate the English words and labels:\n\n{report_text}"
-    )
-    try:
-        result, _ = gemini_text_with_fallback(prompt)
-        return result
-    except Exception as e:
-        if _is_quota_err(e):
-            return report_text + "\n\n⏳ Translation unavailable — all models at capacity. Try again shortly."
-        return report_text + f"\n\n❌ Translation failed: {str(e)[:80]}"
-        
-def calculate_loss_percentage(severity, infected_count, total_plants):
-    """
-    Calculates projected yield loss based on current infection + predicted spread.
-    This shows the farmer the true cost of DOING NOTHING.
-    """
-    if total_plants <= 0: return 0
-    
-    # 1. Base Severity (How much yield a sick plant loses)
-    loss_bands = {"healthy": 0.02, "mild": 0.20, "moderate": 0.45, "severe": 0.75}
-    base_loss = loss_bands.get(severity.lower(), 0.28)
-    
-    # 2. Current Infection Ratio
-    current_ratio = min(infected_count / total_plants, 1.0)
-    
-    # 3. The "Do Nothing" Spread Multiplier 
-    spread_multipliers = {
-        "healthy": 1.0,   
-        "mild": 2.5,      
-        "moderate": 5.0,  
-        "severe": 8.5     
-    }
-    spread_factor = spread_multipliers.get(severity.lower(), 5.0)
-    
-    # Projected ratio of farm infected if no action is taken
-    projected_ratio = min(current_ratio * spread_factor, 1.0)
-    
-    return base_loss * projected_ratio * 100
-
-def resize_image(image, max_width=600, max_height=500):
-    image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-    return image
-
-
-def enhance_image_for_analysis(image):
-    from PIL import ImageEnhance
-
-    enhancer = ImageEnhance.Contrast(image)
-    image = enhancer.enhance(1.5)
-    enhancer = ImageEnhance.Brightness(image)
-    image = enhancer.enhance(1.1)
-    enhancer = ImageEnhance.Sharpness(image)
-    image = enhancer.enhance(1.5)
-    return image
-
-
-def _repair_json(s: str) -> str:
-    """Best-effort JSON repair: trailing commas, single quotes, unescaped newlines."""
-    # Remove trailing commas before } or ]
-    s = re.sub(r",\s*([}\]])", r"\1", s)
-    # Replace smart quotes
-    s = s.replace("\u201c", '"').replace("\u201d", '"').replace("\u2018", "'").replace("\u2019", "'")
-    # Fix unescaped literal newlines inside strings (heuristic)
-    s = re.sub(r'(?<!\\)\n(?=[^"]*")', ' ', s)
-    return s
-
-def extract_json_robust(response_text):
-    """
-    Safely extract a JSON object from the model response.
-    Handles: markdown fences, trailing commas, smart quotes,
-             partial JSON, and completely broken responses.
-    Returns a dict on success, or None on total failure.
-    """
-    if isinstance(response_text, list):
-        response_text = "\n".join(str(x) for x in response_text)
-    elif not isinstance(response_text, str):
-        response_text = str(response_text)
-
-    if not response_text or not response_text.strip():
-        return None
-
-    # 1) Direct parse
-    try:
-        return json.loads(response_text)
-    except Exception:
-        pass
-
-    cleaned = response_text
-
-    # 2) Strip ```json ... ``` or ``` ... ``` fences
-    for fence in ["```json", "```"]:
-        if fence in cleaned:
-            parts = cleaned.split(fence, 1)
-            if len(parts) > 1:
-                cleaned = parts[1]
-            if "```" in cleaned:
-                cleaned = cleaned.split("```", 1)[0]
-            break
-    cleaned = cleaned.strip()
-
-    # 3) Try cleaned version
-    try:
-        return json.loads(cleaned)
-    except Exception:
-        pass
-
-    # 4) Find first {...} block
-    match = re.search(r"\{[\s\S]*\}", cleaned or response_text)
-    if match:
-        candidate = match.group(0)
-        # 4a) direct parse of extracted block
-        try:
-            return json.loads(candidate)
-        except Exception:
-            pass
-        # 4b) repair + parse
-        try:
-            return json.loads(_repair_json(candidate))
-        except Exception:
-            pass
-        # 4c) greedy shrink — try progressively shorter closing
-        for end in range(len(candidate), max(len(candidate)-200, 0), -1):
-            try:
-                return json.loads(candidate[:end] + "}")
-            except Exception:
-                continue
-
-    # 5) Repair full cleaned string
-    try:
-        return json.loads(_repair_json(cleaned))
-    except Exception:
-        pass
-
-    # 6) Give up — return None so caller can show a friendly error
-    return None
 
-    # --- legacy continuation kept for structural parity ---
-    match = re.search(r"\{[\s\S]*\}", response_text)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except Exception:
-            pass
 
-    return None
-
-def validate_json_result(data):
-    required_fields = [
-        "disease_name",
-        "disease_type",
-        "severity",
-        "confidence",
-        "symptoms",
-        "probable_causes",
-    ]
-    if not isinstance(data, dict):
-        return False, "Response is not a dictionary"
-    missing = [f for f in required_fields if f not in data]
-    if missing:
-        return False, f"Missing fields: {', '.join(missing)}"
-    return True, "Valid"
-
-
-def generate_crop_rotation_plan(plant_type, region, soil_type, market_focus):
-    if plant_type in CROP_ROTATION_DATA:
-        return CROP_ROTATION_DATA[plant_type]
-    else:
-        return get_manual_rotation_plan(plant_type)
-
-
-def get_manual_rotation_plan(plant_name):
-    prompt = f"""You are an agricultural expert with deep knowledge of crop rotation and soil health. For the plant: {plant_name}
-Provide ONLY a valid JSON response in this exact format (no markdown, no explanations, no code blocks):
-{{"rotations": ["Crop1", "Crop2", "Crop3"], "info": {{"{plant_name}": "Detailed info about {plant_name}", "Crop1": "Why good after {plant_name}", "Crop2": "Why follows Crop1", "Crop3": "Why completes cycle"}}}}"""
-    try:
-        raw, _ = gemini_text_with_fallback(prompt)
-        result = extract_json_robust(raw)
-        if result and "rotations" in result and "info" in result:
-            return result
-    except Exception:
-        pass
-    return {
-        "rotations": ["Legumes or Pulses", "Cereals (Wheat/Maize)", "Oilseeds or Vegetables"],
-        "info": {
-            plant_name: "Primary crop. Requires disease break and soil replenishment.",
-            "Legumes or Pulses": "Nitrogen-fixing crops. Soil improvement and disease cycle break.",
-            "Cereals (Wheat/Maize)": "Different nutrient profile. Continues income generation.",
-            "Oilseeds or Vegetables": "Diverse crop selection. Completes rotation cycle.",
-        },
-    }
+def render_streaming_preview(placeholder, fields: dict):
+    """Partial diagnosis card, redrawn each time another streamed field completes."""
+    disease_name = fields.get("disease_name")
+    if not disease_name:
+        placeholder.info("🧬 Examining the leaf...")
+        return
+    badges = ""
+    if fields.get("severity"):
+        badges += f'<span class="severity-badge {get_severity_badge_class(fields["severity"])}">{fields["severity"].title()}</span>'
+    if fields.get("disease_type"):
+        badges += f'<span class="type-badge {get_type_badge_class(fields["disease_type"])}">{fields["disease_type"].title()}</span>'
+    body = ""
+    if "confidence" in fields:
+        body += f"<b>Confidence:</b> {fields['confidence']}%<br>"
+    for title, key in (("Symptoms", "symptoms"), ("Immediate Action", "immediate_action")):
+        if fields.get(key):
+            body += f"<b>{title}:</b><br>" + "".join(f"• {item}<br>" for item in fields[key])
+    placeholder.markdown(
+        f"""
+        <div class="disease-header">
+            <div class="disease-name">{disease_name}</div>
+            <div class="disease-meta">{badges}</div>
+        </div>
+        {f'<div class="info-section">{body}</div>' if body else ""}
+        """,
+        unsafe_allow_html=True,
+    )
 
 
-def get_farmer_bot_response(user_question, diagnosis_context=None):
-    context_text = ""
-    if diagnosis_context:
-        context_text = (
-            "Current Diagnosis:\n"
-            f"- Plant: {diagnosis_context.get('plant_type', 'Unknown')}\n"
-            f"- Disease: {diagnosis_context.get('disease_name', 'Unknown')}\n"
-            f"- Severity: {diagnosis_context.get('severity', 'Unknown')}\n"
-            f"- Confidence: {diagnosis_context.get('confidence', 'Unknown')}%\n"
-        )
-    prompt = (
-        "You are an expert agricultural advisor for farmers with deep expertise in crop management, "
-        "disease control, and sustainable farming practices.\n\n"
-        f"{context_text}\n"
-        f"Farmer question: {user_question}\n\n"
-        "Provide a comprehensive response (5-8 sentences) covering: "
-        "1. Direct answer 2. Practical, cost-effective solutions for Indian farming conditions "
-        "3. Seasonal timing and weather considerations 4. Resource availability and sourcing "
-        "5. Long-term sustainability recommendations.\n"
-        "Use clear, professional English. Focus on actionable solutions."
-    )
-    try:
-        answer, _ = gemini_text_with_fallback(prompt)
-        return answer
-    except Exception as e:
-        return f"⚠️ All AI models are temporarily unavailable. Please try again in a minute."
+def run_diagnosis(payloads: list, plant_type: str, prefer_pro: bool, or_client, progress, stream: bool):
+    """Run the pipeline's diagnosis with progress messages and, when streaming, a live preview; returns its dict."""
+    live = st.empty()
+    fields = {}
+    for event, data in diagnose_events(payloads, plant_type, prefer_pro, or_client, stream):
+        if event == "progress":
+            progress.info(data)
+        elif event == "fields":
+            fields.update(data)
+            render_streaming_preview(live, fields)
+        elif event == "reset":
+            fields = {}
+            live.info(f"↻ {data} stopped mid-answer — continuing with the next model...")
+        else:
+            live.empty()
+            return data
 
 
 # ============ MAIN UI HEADER ============
@@ -2129,6 +498,12 @@ if "show_tips" not in st.session_state:
     st.session_state.show_tips = True
 if "confidence_min" not in st.session_state:
     st.session_state.confidence_min = 65
+if "use_local_triage" not in st.session_state:
+    st.session_state.use_local_triage = True
+if "crop_to_leaf" not in st.session_state:
+    st.session_state.crop_to_leaf = True
+if "stream_diagnosis" not in st.session_state:
+    st.session_state.stream_diagnosis = True
 
 # ============ SIDEBAR ============
 with st.sidebar:
@@ -2160,6 +535,75 @@ with st.sidebar:
     st.session_state.show_tips = st.checkbox(
         "Show tips", value=st.session_state.get("show_tips", True)
     )
+    st.session_state.crop_to_leaf = st.checkbox(
+        "Crop to leaf", value=st.session_state.get("crop_to_leaf", True),
+        help="Trim soil, sky and hands before sending photos for diagnosis.",
+    )
+    st.session_state.stream_diagnosis = st.checkbox(
+        "Stream diagnosis", value=st.session_state.get("stream_diagnosis", True),
+        help="Show the disease name, severity and symptoms as soon as the AI writes them.",
+    )
+    if st.session_state.debug_mode:
+        with st.expander("📊 Model quota (today)"):
+            for _qm, _qused, _qlimit, _qopen in quota_status():
+                _qline = f"`{_qm}` — {max(_qlimit - _qused, 0):,} / {_qlimit:,} left"
+                if _qopen:
+                    _qline += f" · ⛔ skipped until {datetime.fromtimestamp(_qopen):%H:%M}"
+                st.markdown(_qline)
+            _rstats = rate_limit_stats()
+            if _rstats:
+                st.caption("Rate-limit queue wait (this process)")
+                for _rm, _rn, _ravg, _rmax in _rstats:
+                    st.markdown(f"`{_rm}` — {_rn} req · avg {_ravg:.2f}s · max {_rmax:.2f}s")
+            _tstats = ttfuc_stats()
+            if _tstats:
+                st.caption("Time to first useful content (disease name / first chat token shown)")
+                for _tm, _tn, _t50, _t90 in _tstats:
+                    st.markdown(f"`{_tm}` — {_tn} answers · p50 {_t50:.1f}s · p90 {_t90:.1f}s")
+            _pstats = prompt_cache_stats()
+            if _pstats:
+                st.caption("Input tokens per vision request (served from provider prompt cache)")
+                for _pm, _pn, _pavg, _pcached, _psaved in _pstats:
+                    st.markdown(f"`{_pm}` — {_pn} req · {_pavg:,.0f} in · {_pcached:,.0f} cached ({_psaved:.0%})")
+            _mhits, _mbuilds = prompt_memo_stats()
+            st.caption(f"Prompts built: {_mbuilds} · reused: {_mhits}")
+            st.caption(f"Reference catalogue version: {catalog_version()}")
+        with st.expander("🚀 Startup profile"):
+            _cold = _startup.COLD_START
+            if _cold is not None:
+                st.caption(f"Cold start (first run of this process): {_cold.total_ms:.0f} ms")
+                for _phase, _ms in _cold.phases:
+                    st.markdown(f"`{_phase}` — {_ms:.0f} ms")
+            _sdk_ms = _startup.sdk_import_times()
+            st.caption("Provider SDK imports (on first use)")
+            if _sdk_ms:
+                for _mod, _ms in _sdk_ms.items():
+                    st.markdown(f"`{_mod}` — {_ms:.0f} ms")
+            else:
+                st.markdown("None imported yet")
+            if _startup.LAST_RUN is not None:
+                st.caption(f"Last rerun: {_startup.LAST_RUN.total_ms:.0f} ms")
+            _theme = theme_payload_bytes(st.get_option("server.baseUrlPath"))
+            st.caption(
+                f"Theme CSS per rerun: {len(_theme_html.encode()):,} B "
+                f"(was {_theme['per_rerun_inline_source']:,} B inline) · "
+                f"stylesheet {_theme['stylesheet_once_gzip']:,} B gzip, once per browser"
+            )
+            _history = _startup.recent_cold_starts()
+            if len(_history) > 1:
+                st.caption("Recent cold starts (ms): " + " → ".join(f"{_ms:.0f}" for _ms in _history))
+        if st.button("⏱ Benchmark image enhancement", use_container_width=True):
+            _bench = benchmark_enhancement()
+            st.caption(
+                f"PIL 3-pass {_bench['pil_ms']:.1f} ms → fused {_bench['fused_ms']:.1f} ms "
+                f"(×{_bench['speedup']:.1f}, max diff {_bench['max_abs_diff']})"
+            )
+    if LOCAL_MODEL_PATH:
+        st.session_state.use_local_triage = st.checkbox(
+            "Local quick triage", value=st.session_state.get("use_local_triage", True),
+            help="Answer instantly from the on-device classifier when it is confident.",
+        )
+_run_profile.mark("sidebar")
 
 
 # ============ SESSION STATE DEFAULTS ============
@@ -2194,315 +638,11 @@ if page == "📖 User Manual":
     # Language selector
     _manual_lang = st.selectbox(
         "🌐 Select Language / भाषा चुनें",
-        ["English", "हिंदी (Hindi)", "ਪੰਜਾਬੀ (Punjabi)", "मराठी (Marathi)",
-         "தமிழ் (Tamil)", "తెలుగు (Telugu)", "ಕನ್ನಡ (Kannada)", "বাংলা (Bengali)", "ગુજરાતી (Gujarati)"],
+        list(MANUAL_LANGUAGES),
         key="manual_lang_select"
     )
 
-    _manual_css = """
-    <style>
-    .manual-card {
-        background: linear-gradient(135deg, #0c1610 0%, #0e1c12 100%);
-        border: 1px solid rgba(74,200,95,0.18);
-        border-radius: 16px;
-        padding: 28px 32px;
-        margin: 14px 0;
-        font-family: 'Noto Sans', 'Plus Jakarta Sans', Arial, sans-serif;
-        line-height: 1.85;
-    }
-    .manual-section-title {
-        font-size: 1.05rem;
-        font-weight: 800;
-        color: #2ecc6e;
-        letter-spacing: 0.04em;
-        margin-bottom: 10px;
-        margin-top: 4px;
-        border-bottom: 1px solid rgba(46,204,110,0.18);
-        padding-bottom: 6px;
-    }
-    .manual-step {
-        background: rgba(46,204,110,0.06);
-        border-left: 3px solid #2ecc6e;
-        border-radius: 0 8px 8px 0;
-        padding: 10px 16px;
-        margin: 8px 0;
-        color: #c8e6cc;
-        font-size: 0.97rem;
-    }
-    .manual-step b { color: #7af0a0; }
-    .manual-tip {
-        background: rgba(240,192,64,0.07);
-        border-left: 3px solid #f0c040;
-        border-radius: 0 8px 8px 0;
-        padding: 10px 16px;
-        margin: 8px 0;
-        color: #fde9a2;
-        font-size: 0.93rem;
-    }
-    .manual-warning {
-        background: rgba(240,92,92,0.07);
-        border-left: 3px solid #f05c5c;
-        border-radius: 0 8px 8px 0;
-        padding: 10px 16px;
-        margin: 8px 0;
-        color: #ffa0a0;
-        font-size: 0.93rem;
-    }
-    .manual-card p, .manual-card li { color: #c8e6cc; font-size: 0.97rem; }
-    .manual-lang-badge {
-        display: inline-block;
-        background: rgba(46,204,110,0.12);
-        border: 1px solid rgba(46,204,110,0.35);
-        border-radius: 20px;
-        padding: 3px 14px;
-        font-size: 0.75rem;
-        color: #7af0a0;
-        font-weight: 700;
-        margin-bottom: 16px;
-        letter-spacing: 0.08em;
-    }
-    </style>
-    """
-    st.markdown(_manual_css, unsafe_allow_html=True)
-
-    _manuals = {
-
-"English": """
-<div class='manual-card'>
-<div class='manual-lang-badge'>🇬🇧 ENGLISH</div>
-
-<div class='manual-section-title'>🌿 What is AI Plant Doctor?</div>
-<p>AI Plant Doctor is a free tool that looks at a photo of your plant and tells you what disease it has and how to treat it. No knowledge of computers or AI is needed.</p>
-
-<div class='manual-section-title'>📱 The 4 Pages — What Each Does</div>
-<div class='manual-step'><b>🌿 AI Plant Doctor</b> — Upload a photo of a sick plant. Select your plant type. Get the disease name, severity, and full treatment plan in seconds.</div>
-<div class='manual-step'><b>🤖 KisanAI Assistant</b> — Ask any farming question in plain words. Example: "What fertilizer for tomato?" or "How to stop aphids?"</div>
-<div class='manual-step'><b>🌱 Crop Rotation Advisor</b> — Enter your current crop and field size. Get a 3-year rotation plan to keep your soil healthy and increase yield.</div>
-<div class='manual-step'><b>💰 Cost Calculator & ROI</b> — After diagnosis, see the exact cost of treatment and how much money you can save by treating early.</div>
-
-<div class='manual-section-title'>📸 How to Diagnose a Plant — Step by Step</div>
-<div class='manual-step'><b>Step 1:</b> Take a close, clear photo of the sick leaf in good light (sunlight is best).</div>
-<div class='manual-step'><b>Step 2:</b> Click <b>"AI Plant Doctor"</b> in the left menu.</div>
-<div class='manual-step'><b>Step 3:</b> Click <b>"Browse files"</b> and upload your photo.</div>
-<div class='manual-step'><b>Step 4:</b> Select your plant name from the list (e.g. Tomato, Wheat, Rose).</div>
-<div class='manual-step'><b>Step 5:</b> Click <b>"Diagnose Plant"</b> — results appear in a few seconds.</div>
-<div class='manual-step'><b>Step 6:</b> Scroll down to see medicine names, dosage, and how to apply.</div>
-
-<div class='manual-tip'>💡 Always run AI Plant Doctor first — KisanAI and Cost Calculator use those results.</div>
-<div class='manual-warning'>⚠️ Read medicine labels before use. Consult a local agronomist for severe cases.</div>
-</div>
-""",
-
-"हिंदी (Hindi)": """
-<div class='manual-card'>
-<div class='manual-lang-badge'>🇮🇳 हिंदी</div>
-
-<div class='manual-section-title'>🌿 AI Plant Doctor क्या है?</div>
-<p>AI Plant Doctor एक मुफ़्त उपकरण है जो पौधे की फ़ोटो देखकर बीमारी और इलाज बताता है। कंप्यूटर या AI की कोई जानकारी ज़रूरी नहीं।</p>
-
-<div class='manual-section-title'>📱 चारों पेज — क्या काम करते हैं</div>
-<div class='manual-step'><b>🌿 AI Plant Doctor</b> — बीमार पौधे की फ़ोटो लगाएँ, पौधे का नाम चुनें, बीमारी और पूरा इलाज सेकंडों में पाएँ।</div>
-<div class='manual-step'><b>🤖 KisanAI Assistant</b> — खेती से जुड़ा कोई भी सवाल अपनी भाषा में पूछें। जैसे: "टमाटर में कौन सी खाद डालें?" या "कीड़े कैसे भगाएँ?"</div>
-<div class='manual-step'><b>🌱 Crop Rotation Advisor</b> — अपनी फसल और खेत का आकार डालें। 3 साल की फसल बदलाव योजना पाएँ जिससे मिट्टी अच्छी रहे।</div>
-<div class='manual-step'><b>💰 Cost Calculator & ROI</b> — इलाज की कुल लागत और समय पर इलाज करने से कितना पैसा बचेगा — सब देखें।</div>
-
-<div class='manual-section-title'>📸 पौधे की जाँच कैसे करें — कदम दर कदम</div>
-<div class='manual-step'><b>कदम 1:</b> बीमार पत्ते की धूप में पास से साफ़ फ़ोटो लें।</div>
-<div class='manual-step'><b>कदम 2:</b> बाईं तरफ़ <b>"AI Plant Doctor"</b> पर क्लिक करें।</div>
-<div class='manual-step'><b>कदम 3:</b> <b>"Browse files"</b> से फ़ोटो अपलोड करें।</div>
-<div class='manual-step'><b>कदम 4:</b> पौधे का नाम चुनें (जैसे टमाटर, गेहूँ, गुलाब)।</div>
-<div class='manual-step'><b>कदम 5:</b> <b>"Diagnose Plant"</b> दबाएँ — कुछ सेकंड में परिणाम आएगा।</div>
-<div class='manual-step'><b>कदम 6:</b> नीचे स्क्रॉल करें — दवाई, मात्रा, और तरीका सब मिलेगा।</div>
-
-<div class='manual-tip'>💡 पहले AI Plant Doctor चलाएँ — KisanAI और Cost Calculator उसी के नतीजे इस्तेमाल करते हैं।</div>
-<div class='manual-warning'>⚠️ दवाई इस्तेमाल से पहले लेबल पढ़ें। गंभीर मामलों में कृषि विशेषज्ञ से मिलें।</div>
-</div>
-""",
-
-"ਪੰਜਾਬੀ (Punjabi)": """
-<div class='manual-card'>
-<div class='manual-lang-badge'>🌾 ਪੰਜਾਬੀ</div>
-
-<div class='manual-section-title'>🌿 AI Plant Doctor ਕੀ ਹੈ?</div>
-<p>AI Plant Doctor ਇੱਕ ਮੁਫ਼ਤ ਸੰਦ ਹੈ ਜੋ ਪੌਦੇ ਦੀ ਫ਼ੋਟੋ ਦੇਖ ਕੇ ਬਿਮਾਰੀ ਅਤੇ ਇਲਾਜ ਦੱਸਦਾ ਹੈ। ਕੰਪਿਊਟਰ ਦੀ ਕੋਈ ਜਾਣਕਾਰੀ ਜ਼ਰੂਰੀ ਨਹੀਂ।</p>
-
-<div class='manual-section-title'>📱 ਚਾਰੇ ਪੇਜ — ਕੀ ਕੰਮ ਕਰਦੇ ਹਨ</div>
-<div class='manual-step'><b>🌿 AI Plant Doctor</b> — ਬਿਮਾਰ ਪੌਦੇ ਦੀ ਫ਼ੋਟੋ ਲਗਾਓ, ਪੌਦੇ ਦਾ ਨਾਮ ਚੁਣੋ, ਬਿਮਾਰੀ ਅਤੇ ਪੂਰਾ ਇਲਾਜ ਸਕਿੰਟਾਂ ਵਿੱਚ ਪਾਓ।</div>
-<div class='manual-step'><b>🤖 KisanAI Assistant</b> — ਖੇਤੀ ਦਾ ਕੋਈ ਵੀ ਸਵਾਲ ਆਪਣੀ ਭਾਸ਼ਾ ਵਿੱਚ ਪੁੱਛੋ। ਜਿਵੇਂ: "ਟਮਾਟਰ ਲਈ ਕਿਹੜੀ ਖਾਦ?" ਜਾਂ "ਕੀੜੇ ਕਿਵੇਂ ਭਜਾਈਏ?"</div>
-<div class='manual-step'><b>🌱 Crop Rotation Advisor</b> — ਆਪਣੀ ਫ਼ਸਲ ਅਤੇ ਖੇਤ ਦਾ ਆਕਾਰ ਦੱਸੋ। 3 ਸਾਲ ਦੀ ਫ਼ਸਲ ਬਦਲਾਅ ਯੋਜਨਾ ਪਾਓ।</div>
-<div class='manual-step'><b>💰 Cost Calculator & ROI</b> — ਇਲਾਜ ਦਾ ਖਰਚ ਅਤੇ ਸਮੇਂ ਸਿਰ ਇਲਾਜ ਨਾਲ ਕਿੰਨਾ ਪੈਸਾ ਬਚੇਗਾ — ਸਭ ਦੇਖੋ।</div>
-
-<div class='manual-section-title'>📸 ਪੌਦੇ ਦੀ ਜਾਂਚ ਕਿਵੇਂ ਕਰੀਏ — ਕਦਮ ਦਰ ਕਦਮ</div>
-<div class='manual-step'><b>ਕਦਮ 1:</b> ਬਿਮਾਰ ਪੱਤੇ ਦੀ ਧੁੱਪ ਵਿੱਚ ਪਾਸ ਤੋਂ ਸਾਫ਼ ਫ਼ੋਟੋ ਲਓ।</div>
-<div class='manual-step'><b>ਕਦਮ 2:</b> ਖੱਬੇ ਮੇਨੂ ਵਿੱਚ <b>"AI Plant Doctor"</b> ਤੇ ਕਲਿੱਕ ਕਰੋ।</div>
-<div class='manual-step'><b>ਕਦਮ 3:</b> <b>"Browse files"</b> ਨਾਲ ਫ਼ੋਟੋ ਅਪਲੋਡ ਕਰੋ।</div>
-<div class='manual-step'><b>ਕਦਮ 4:</b> ਪੌਦੇ ਦਾ ਨਾਮ ਚੁਣੋ (ਜਿਵੇਂ ਟਮਾਟਰ, ਕਣਕ, ਗੁਲਾਬ)।</div>
-<div class='manual-step'><b>ਕਦਮ 5:</b> <b>"Diagnose Plant"</b> ਦਬਾਓ — ਕੁਝ ਸਕਿੰਟਾਂ ਵਿੱਚ ਨਤੀਜਾ ਆਵੇਗਾ।</div>
-<div class='manual-step'><b>ਕਦਮ 6:</b> ਹੇਠਾਂ ਸਕ੍ਰੋਲ ਕਰੋ — ਦਵਾਈ, ਮਾਤਰਾ, ਅਤੇ ਤਰੀਕਾ ਸਭ ਮਿਲੇਗਾ।</div>
-
-<div class='manual-tip'>💡 ਪਹਿਲਾਂ AI Plant Doctor ਚਲਾਓ — KisanAI ਅਤੇ Cost Calculator ਉਸੇ ਦੇ ਨਤੀਜੇ ਵਰਤਦੇ ਹਨ।</div>
-<div class='manual-warning'>⚠️ ਦਵਾਈ ਵਰਤਣ ਤੋਂ ਪਹਿਲਾਂ ਲੇਬਲ ਜ਼ਰੂਰ ਪੜ੍ਹੋ। ਗੰਭੀਰ ਮਾਮਲਿਆਂ ਵਿੱਚ ਖੇਤੀ ਮਾਹਰ ਤੋਂ ਮਦਦ ਲਓ।</div>
-</div>
-""",
-
-"मराठी (Marathi)": """
-<div class='manual-card'>
-<div class='manual-lang-badge'>🇮🇳 मराठी</div>
-
-<div class='manual-section-title'>🌿 AI Plant Doctor म्हणजे काय?</div>
-<p>AI Plant Doctor हे एक मोफत साधन आहे जे झाडाचा फोटो पाहून रोग आणि उपचार सांगते. संगणकाची कोणतीही माहिती लागत नाही.</p>
-
-<div class='manual-section-title'>📱 चार पाने — काय काम करतात</div>
-<div class='manual-step'><b>🌿 AI Plant Doctor</b> — आजारी झाडाचा फोटो टाका, झाडाचे नाव निवडा, रोग आणि संपूर्ण उपचार काही सेकंदात मिळवा.</div>
-<div class='manual-step'><b>🤖 KisanAI Assistant</b> — शेतीचा कोणताही प्रश्न सोप्या शब्दात विचारा. उदा: "टोमॅटोला कोणते खत द्यावे?" किंवा "कीड कशी घालवावी?"</div>
-<div class='manual-step'><b>🌱 Crop Rotation Advisor</b> — तुमचे पीक व शेताचा आकार सांगा. जमीन सुधारण्यासाठी ३ वर्षांची पीक बदलाची योजना मिळवा.</div>
-<div class='manual-step'><b>💰 Cost Calculator & ROI</b> — उपचाराचा एकूण खर्च आणि वेळीच उपचार केल्यास किती पैसे वाचतील ते पाहा.</div>
-
-<div class='manual-section-title'>📸 झाडाची तपासणी कशी करावी — पायरी पायरी</div>
-<div class='manual-step'><b>पायरी 1:</b> आजारी पानाचा उन्हात जवळून स्पष्ट फोटो काढा.</div>
-<div class='manual-step'><b>पायरी 2:</b> डाव्या मेनूत <b>"AI Plant Doctor"</b> वर क्लिक करा.</div>
-<div class='manual-step'><b>पायरी 3:</b> <b>"Browse files"</b> ने फोटो अपलोड करा.</div>
-<div class='manual-step'><b>पायरी 4:</b> झाडाचे नाव निवडा (उदा. टोमॅटो, गहू, गुलाब).</div>
-<div class='manual-step'><b>पायरी 5:</b> <b>"Diagnose Plant"</b> दाबा — काही सेकंदात निकाल येईल.</div>
-<div class='manual-step'><b>पायरी 6:</b> खाली स्क्रोल करा — औषध, प्रमाण आणि वापर पद्धत सर्व दिसेल.</div>
-
-<div class='manual-tip'>💡 आधी AI Plant Doctor चालवा — KisanAI आणि Cost Calculator त्याचेच निकाल वापरतात.</div>
-<div class='manual-warning'>⚠️ औषध वापरण्यापूर्वी लेबल वाचा. गंभीर प्रकरणात कृषी तज्ञाचा सल्ला घ्या.</div>
-</div>
-""",
-
-"தமிழ் (Tamil)": """
-<div class='manual-card'>
-<div class='manual-lang-badge'>🌿 தமிழ்</div>
-
-<div class='manual-section-title'>🌿 AI Plant Doctor என்றால் என்ன?</div>
-<p>AI Plant Doctor ஒரு இலவச கருவி. செடியின் படம் பார்த்து நோய் மற்றும் சிகிச்சை சொல்லும். கணினி அறிவு தேவையில்லை.</p>
-
-<div class='manual-section-title'>📱 நான்கு பக்கங்கள் — என்ன செய்கின்றன</div>
-<div class='manual-step'><b>🌿 AI Plant Doctor</b> — நோய்வாய்ப்பட்ட செடியின் படம் பதிவேற்றவும், செடி வகை தேர்ந்தெடுக்கவும், சில நொடிகளில் நோய் மற்றும் சிகிச்சை பெறவும்.</div>
-<div class='manual-step'><b>🤖 KisanAI Assistant</b> — எளிய வார்த்தைகளில் எந்த விவசாய கேள்வியும் கேளுங்கள். எ.கா: "தக்காளிக்கு என்ன உரம்?" அல்லது "பூச்சி எப்படி ஒழிப்பது?"</div>
-<div class='manual-step'><b>🌱 Crop Rotation Advisor</b> — உங்கள் பயிர் மற்றும் நிலத்தின் அளவு கொடுங்கள். மண் வளம் காக்க 3 ஆண்டு சுழற்சி திட்டம் பெறுங்கள்.</div>
-<div class='manual-step'><b>💰 Cost Calculator & ROI</b> — சிகிச்சை செலவு மற்றும் சரியான நேரத்தில் சிகிச்சை செய்தால் எவ்வளவு பணம் மிச்சமாகும் என்று பாருங்கள்.</div>
-
-<div class='manual-section-title'>📸 செடியை கண்டறிவது எப்படி — படி படியாக</div>
-<div class='manual-step'><b>படி 1:</b> நோய்வாய்ப்பட்ட இலையை வெயிலில் அருகில் இருந்து தெளிவான படம் எடுக்கவும்.</div>
-<div class='manual-step'><b>படி 2:</b> இடது மெனுவில் <b>"AI Plant Doctor"</b> கிளிக் செய்யவும்.</div>
-<div class='manual-step'><b>படி 3:</b> <b>"Browse files"</b> மூலம் படம் பதிவேற்றவும்.</div>
-<div class='manual-step'><b>படி 4:</b> செடியின் பெயர் தேர்ந்தெடுக்கவும் (எ.கா. தக்காளி, கோதுமை, ரோஜா).</div>
-<div class='manual-step'><b>படி 5:</b> <b>"Diagnose Plant"</b> அழுத்தவும் — சில நொடிகளில் முடிவு வரும்.</div>
-<div class='manual-step'><b>படி 6:</b> கீழே உருட்டவும் — மருந்து பெயர், அளவு, தெளிக்கும் முறை அனைத்தும் தெரியும்.</div>
-
-<div class='manual-tip'>💡 முதலில் AI Plant Doctor இயக்கவும் — KisanAI மற்றும் Cost Calculator அதன் முடிவுகளை பயன்படுத்துகின்றன.</div>
-<div class='manual-warning'>⚠️ மருந்து பயன்படுத்தும் முன் லேபிளை படிக்கவும். தீவிர நிலையில் வேளாண் நிபுணரை அணுகவும்.</div>
-</div>
-""",
-
-"తెలుగు (Telugu)": """
-<div class='manual-card'>
-<div class='manual-lang-badge'>🌾 తెలుగు</div>
-
-<div class='manual-section-title'>🌿 AI Plant Doctor అంటే ఏమిటి?</div>
-<p>AI Plant Doctor ఒక ఉచిత సాధనం. మొక్క ఫోటో చూసి వ్యాధి మరియు చికిత్స చెప్తుంది. కంప్యూటర్ జ్ఞానం అవసరం లేదు.</p>
-
-<div class='manual-section-title'>📱 నాలుగు పేజీలు — ఏమి చేస్తాయి</div>
-<div class='manual-step'><b>🌿 AI Plant Doctor</b> — జబ్బుపడిన మొక్క ఫోటో అప్‌లోడ్ చేయండి, మొక్క పేరు ఎంచుకోండి, కొన్ని సెకన్లలో వ్యాధి మరియు పూర్తి చికిత్స పొందండి.</div>
-<div class='manual-step'><b>🤖 KisanAI Assistant</b> — ఏ వ్యవసాయ ప్రశ్నైనా సాధారణ మాటల్లో అడగండి. ఉదా: "టమోటాకు ఏ ఎరువు?" లేదా "పురుగులు ఎలా తొలగించాలి?"</div>
-<div class='manual-step'><b>🌱 Crop Rotation Advisor</b> — మీ పంట మరియు పొలం పరిమాణం నమోదు చేయండి. నేల ఆరోగ్యానికి 3 సంవత్సరాల పంట మార్పిడి ప్రణాళిక పొందండి.</div>
-<div class='manual-step'><b>💰 Cost Calculator & ROI</b> — చికిత్స ఖర్చు మరియు సకాలంలో చికిత్స చేస్తే ఎంత డబ్బు ఆదా అవుతుందో చూడండి.</div>
-
-<div class='manual-section-title'>📸 మొక్కను నిర్ధారించడం ఎలా — దశల వారీగా</div>
-<div class='manual-step'><b>దశ 1:</b> జబ్బుపడిన ఆకును ఎండలో దగ్గరగా స్పష్టంగా ఫోటో తీయండి.</div>
-<div class='manual-step'><b>దశ 2:</b> ఎడమ వైపు మెనూలో <b>"AI Plant Doctor"</b> క్లిక్ చేయండి.</div>
-<div class='manual-step'><b>దశ 3:</b> <b>"Browse files"</b> తో ఫోటో అప్‌లోడ్ చేయండి.</div>
-<div class='manual-step'><b>దశ 4:</b> జాబితా నుండి మొక్క పేరు ఎంచుకోండి (ఉదా. టమోటా, గోధుమ, గులాబి).</div>
-<div class='manual-step'><b>దశ 5:</b> <b>"Diagnose Plant"</b> నొక్కండి — కొన్ని సెకన్లలో ఫలితం వస్తుంది.</div>
-<div class='manual-step'><b>దశ 6:</b> కిందకు స్క్రోల్ చేయండి — మందు పేరు, మోతాదు, వాడకం విధానం అన్నీ కనిపిస్తాయి.</div>
-
-<div class='manual-tip'>💡 ముందు AI Plant Doctor నడపండి — KisanAI మరియు Cost Calculator దాని ఫలితాలను ఉపయోగిస్తాయి.</div>
-<div class='manual-warning'>⚠️ మందు వాడే ముందు లేబుల్ చదవండి. తీవ్రమైన సందర్భాల్లో వ్యవసాయ నిపుణుడిని సంప్రదించండి.</div>
-</div>
-""",
-
-"ಕನ್ನಡ (Kannada)": """
-<div class='manual-card'>
-<div class='manual-lang-badge'>🌿 ಕನ್ನಡ</div>
-
-<div class='manual-section-title'>🌿 AI Plant Doctor ಎಂದರೇನು?</div>
-<p>AI Plant Doctor ಒಂದು ಉಚಿತ ಸಾಧನ. ಗಿಡದ ಫೋಟೋ ನೋಡಿ ರೋಗ ಮತ್ತು ಚಿಕಿತ್ಸೆ ಹೇಳುತ್ತದೆ. ಕಂಪ್ಯೂಟರ್ ಜ್ಞಾನ ಅಗತ್ಯವಿಲ್ಲ.</p>
-
-<div class='manual-section-title'>📱 ನಾಲ್ಕು ಪುಟಗಳು — ಏನು ಮಾಡುತ್ತವೆ</div>
-<div class='manual-step'><b>🌿 AI Plant Doctor</b> — ರೋಗಿಷ್ಟ ಗಿಡದ ಫೋಟೋ ಅಪ್‌ಲೋಡ್ ಮಾಡಿ, ಗಿಡದ ಹೆಸರು ಆಯ್ಕೆ ಮಾಡಿ, ಕೆಲವೇ ಸೆಕೆಂಡುಗಳಲ್ಲಿ ರೋಗ ಮತ್ತು ಚಿಕಿತ್ಸೆ ಪಡೆಯಿರಿ.</div>
-<div class='manual-step'><b>🤖 KisanAI Assistant</b> — ಯಾವುದೇ ಕೃಷಿ ಪ್ರಶ್ನೆ ಸರಳ ಮಾತಿನಲ್ಲಿ ಕೇಳಿ. ಉದಾ: "ಟೊಮಾಟೊಗೆ ಯಾವ ಗೊಬ್ಬರ?" ಅಥವಾ "ಕೀಟಗಳನ್ನು ಹೇಗೆ ತೊಡೆಯಬೇಕು?"</div>
-<div class='manual-step'><b>🌱 Crop Rotation Advisor</b> — ನಿಮ್ಮ ಬೆಳೆ ಮತ್ತು ಹೊಲದ ಗಾತ್ರ ನಮೂದಿಸಿ. ಮಣ್ಣಿನ ಆರೋಗ್ಯಕ್ಕಾಗಿ 3 ವರ್ಷದ ಬೆಳೆ ಬದಲಾವಣೆ ಯೋಜನೆ ಪಡೆಯಿರಿ.</div>
-<div class='manual-step'><b>💰 Cost Calculator & ROI</b> — ಚಿಕಿತ್ಸೆಯ ಒಟ್ಟು ವೆಚ್ಚ ಮತ್ತು ಸಮಯಕ್ಕೆ ಚಿಕಿತ್ಸೆ ನೀಡಿದರೆ ಎಷ್ಟು ಹಣ ಉಳಿಯುತ್ತದೆ ಎಂದು ನೋಡಿ.</div>
-
-<div class='manual-section-title'>📸 ಗಿಡವನ್ನು ಪರೀಕ್ಷಿಸುವುದು ಹೇಗೆ — ಹಂತ ಹಂತವಾಗಿ</div>
-<div class='manual-step'><b>ಹಂತ 1:</b> ರೋಗಿಷ್ಟ ಎಲೆಯನ್ನು ಬಿಸಿಲಿನಲ್ಲಿ ಹತ್ತಿರದಿಂದ ಸ್ಪಷ್ಟ ಫೋಟೋ ತೆಗೆಯಿರಿ.</div>
-<div class='manual-step'><b>ಹಂತ 2:</b> ಎಡ ಮೆನುವಿನಲ್ಲಿ <b>"AI Plant Doctor"</b> ಕ್ಲಿಕ್ ಮಾಡಿ.</div>
-<div class='manual-step'><b>ಹಂತ 3:</b> <b>"Browse files"</b> ನಿಂದ ಫೋಟೋ ಅಪ್‌ಲೋಡ್ ಮಾಡಿ.</div>
-<div class='manual-step'><b>ಹಂತ 4:</b> ಗಿಡದ ಹೆಸರು ಆಯ್ಕೆ ಮಾಡಿ (ಉದಾ. ಟೊಮಾಟೊ, ಗೋಧಿ, ಗುಲಾಬಿ).</div>
-<div class='manual-step'><b>ಹಂತ 5:</b> <b>"Diagnose Plant"</b> ಒತ್ತಿ — ಕೆಲವೇ ಸೆಕೆಂಡುಗಳಲ್ಲಿ ಫಲಿತಾಂಶ ಬರುತ್ತದೆ.</div>
-<div class='manual-step'><b>ಹಂತ 6:</b> ಕೆಳಗೆ ಸ್ಕ್ರೋಲ್ ಮಾಡಿ — ಔಷಧ ಹೆಸರು, ಪ್ರಮಾಣ, ಬಳಸುವ ವಿಧಾನ ಎಲ್ಲ ಕಾಣಿಸುತ್ತದೆ.</div>
-
-<div class='manual-tip'>💡 ಮೊದಲು AI Plant Doctor ಚಲಾಯಿಸಿ — KisanAI ಮತ್ತು Cost Calculator ಅದರ ಫಲಿತಾಂಶಗಳನ್ನು ಬಳಸುತ್ತವೆ.</div>
-<div class='manual-warning'>⚠️ ಔಷಧ ಬಳಸುವ ಮುಂಚೆ ಲೇಬಲ್ ಓದಿ. ತೀವ್ರ ಸಂದರ್ಭದಲ್ಲಿ ಕೃಷಿ ತಜ್ಞರನ್ನು ಸಂಪರ್ಕಿಸಿ.</div>
-</div>
-""",
-
-"বাংলা (Bengali)": """
-<div class='manual-card'>
-<div class='manual-lang-badge'>🇧🇩 বাংলা</div>
-
-<div class='manual-section-title'>🌿 AI Plant Doctor কী?</div>
-<p>AI Plant Doctor একটি বিনামূল্যের সরঞ্জাম। গাছের ছবি দেখে রোগ ও চিকিৎসা বলে দেয়। কম্পিউটার জ্ঞান দরকার নেই।</p>
-
-<div class='manual-section-title'>📱 চারটি পাতা — কী কাজ করে</div>
-<div class='manual-step'><b>🌿 AI Plant Doctor</b> — অসুস্থ গাছের ছবি আপলোড করুন, গাছের নাম বেছে নিন, কয়েক সেকেন্ডে রোগ ও সম্পূর্ণ চিকিৎসা পান।</div>
-<div class='manual-step'><b>🤖 KisanAI Assistant</b> — সহজ কথায় যেকোনো কৃষি প্রশ্ন করুন। যেমন: "টমেটোতে কোন সার দেব?" বা "পোকা কীভাবে তাড়াব?"</div>
-<div class='manual-step'><b>🌱 Crop Rotation Advisor</b> — আপনার ফসল ও জমির আকার লিখুন। মাটির স্বাস্থ্য রক্ষায় ৩ বছরের ফসল পরিবর্তন পরিকল্পনা পান।</div>
-<div class='manual-step'><b>💰 Cost Calculator & ROI</b> — চিকিৎসার মোট খরচ এবং সময়মতো চিকিৎসা করলে কত টাকা সাশ্রয় হবে তা দেখুন।</div>
-
-<div class='manual-section-title'>📸 গাছ পরীক্ষা করবেন কীভাবে — ধাপে ধাপে</div>
-<div class='manual-step'><b>ধাপ ১:</b> অসুস্থ পাতার কাছ থেকে রোদে স্পষ্ট ছবি তুলুন।</div>
-<div class='manual-step'><b>ধাপ ২:</b> বাম মেনুতে <b>"AI Plant Doctor"</b> তে ক্লিক করুন।</div>
-<div class='manual-step'><b>ধাপ ৩:</b> <b>"Browse files"</b> দিয়ে ছবি আপলোড করুন।</div>
-<div class='manual-step'><b>ধাপ ৪:</b> তালিকা থেকে গাছের নাম বেছে নিন (যেমন টমেটো, গম, গোলাপ)।</div>
-<div class='manual-step'><b>ধাপ ৫:</b> <b>"Diagnose Plant"</b> চাপুন — কয়েক সেকেন্ডে ফলাফল আসবে।</div>
-<div class='manual-step'><b>ধাপ ৬:</b> নিচে স্ক্রোল করুন — ওষুধের নাম, পরিমাণ, প্রয়োগ পদ্ধতি সব দেখাবে।</div>
-
-<div class='manual-tip'>💡 আগে AI Plant Doctor চালান — KisanAI ও Cost Calculator সেই ফলাফল ব্যবহার করে।</div>
-<div class='manual-warning'>⚠️ ওষুধ ব্যবহারের আগে লেবেল পড়ুন। গুরুতর ক্ষেত্রে কৃষি বিশেষজ্ঞের পরামর্শ নিন।</div>
-</div>
-""",
-
-"ગુજરાતી (Gujarati)": """
-<div class='manual-card'>
-<div class='manual-lang-badge'>🌾 ગુજરાતી</div>
-
-<div class='manual-section-title'>🌿 AI Plant Doctor શું છે?</div>
-<p>AI Plant Doctor એક મફત સાધન છે. છોડની ફોટો જોઈ બીમારી અને ઈલાજ બતાવે છે. કોમ્પ્યુટર જ્ઞાન જરૂરી નથી.</p>
-
-<div class='manual-section-title'>📱 ચાર પાના — શું કામ કરે છે</div>
-<div class='manual-step'><b>🌿 AI Plant Doctor</b> — બીમાર છોડની ફોટો અપલોડ કરો, છોડનું નામ પસંદ કરો, થોડી સેકન્ડમાં બીમારી અને સંપૂર્ણ ઈલાજ મેળવો.</div>
-<div class='manual-step'><b>🤖 KisanAI Assistant</b> — સરળ ભાષામાં કોઈ પણ ખેતી સવાલ પૂછો. ઉદા: "ટામેટાને ક્યું ખાતર?" અથવા "જીવાત કેવી રીતે ભગાડવી?"</div>
-<div class='manual-step'><b>🌱 Crop Rotation Advisor</b> — તમારો પાક અને ખેતરનો આકાર નાખો. જમીન સ્વસ્થ રાખવા 3 વર્ષની પાક ફેરબદલ યોજના મેળવો.</div>
-<div class='manual-step'><b>💰 Cost Calculator & ROI</b> — ઈલાજનો કુલ ખર્ચ અને સમયસર ઈલાજ કરવાથી કેટલા પૈસા બચશે — બધું જોઓ.</div>
-
-<div class='manual-section-title'>📸 છોડની તપાસ કેવી રીતે કરવી — પગલે પગલે</div>
-<div class='manual-step'><b>પગલું 1:</b> બીમાર પાનની તડકામાં નજીકથી સ્પષ્ટ ફોટો લો.</div>
-<div class='manual-step'><b>પગલું 2:</b> ડાબી બાજુ મેનૂમાં <b>"AI Plant Doctor"</b> ક્લિક કરો.</div>
-<div class='manual-step'><b>પગલું 3:</b> <b>"Browse files"</b> થી ફોટો અપલોડ કરો.</div>
-<div class='manual-step'><b>પગલું 4:</b> યાદીમાંથી છોડનું નામ પસંદ કરો (ઉદા. ટામેટા, ઘઉં, ગુલાબ).</div>
-<div class='manual-step'><b>પગલું 5:</b> <b>"Diagnose Plant"</b> દબાવો — થોડી સેકન્ડમાં પરિણામ આવશે.</div>
-<div class='manual-step'><b>પગલું 6:</b> નીચે સ્ક્રોલ કરો — દવાનું નામ, માત્રા, વાપરવાની રીત — બધું દેખાશે.</div>
-
-<div class='manual-tip'>💡 પહેલાં AI Plant Doctor ચલાવો — KisanAI અને Cost Calculator એ જ પરિણામ વાપરે છે.</div>
-<div class='manual-warning'>⚠️ દવા વાપરતા પહેલા લેબલ વાંચો. ગંભીર કેસમાં કૃષિ નિષ્ણાત પાસે જાઓ.</div>
-</div>
-"""
-    }
-
-    st.markdown(_manuals.get(_manual_lang, _manuals["English"]), unsafe_allow_html=True)
+    st.markdown(manual_html(_manual_lang), unsafe_allow_html=True)
 
 # --- AI Plant Doctor ---
 elif page == "AI Plant Doctor":
@@ -2555,7 +695,11 @@ elif page == "AI Plant Doctor":
         if len(uploaded_files) > 3:
             st.warning("Maximum 3 images. Only first 3 will be analyzed.")
             uploaded_files = uploaded_files[:3]
-        images = [Image.open(f) for f in uploaded_files]
+        images = [load_image_for_vision(f) for f in uploaded_files]
+        if st.session_state.crop_to_leaf:
+            leaf_crops = [crop_to_leaf(img) for img in images]
+        else:
+            leaf_crops = [(img, None) for img in images]
 
         if st.session_state.show_tips:
             st.markdown(
@@ -2565,9 +709,12 @@ elif page == "AI Plant Doctor":
 
         st.markdown("<div class='result-container'>", unsafe_allow_html=True)
         cols = st.columns(len(images))
-        for idx, (col, image) in enumerate(zip(cols, images)):
+        for idx, (col, (image, crop_stats)) in enumerate(zip(cols, leaf_crops)):
             with col:
-                st.caption(f"Image {idx + 1}")
+                if crop_stats and crop_stats["box"]:
+                    st.caption(f"Image {idx + 1} · leaf crop (−{crop_stats['saved_pct']:.0f}% pixels)")
+                else:
+                    st.caption(f"Image {idx + 1}")
                 display_image = resize_image(image.copy())
                 st.image(display_image, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
@@ -2587,71 +734,65 @@ elif page == "AI Plant Doctor":
 
                 prefer_pro = st.session_state.get("model_choice", False)  # prefer_pro_toggle
                 enhanced_images = [
-                    enhance_image_for_analysis(img.copy()) for img in images
+                    prepare_image_payload(enhance_image_for_analysis(img.copy())) for img, _ in leaf_crops
                 ]
+                _pixel_stats = [s for _, s in leaf_crops if s]
+                _pixel_savings = (
+                    100.0 * (1 - sum(s["cropped_px"] for s in _pixel_stats)
+                             / max(sum(s["original_px"] for s in _pixel_stats), 1))
+                    if _pixel_stats else 0.0
+                )
+                if st.session_state.debug_mode:
+                    _upload_kb = sum(getattr(f, "size", 0) for f in uploaded_files) / 1024
+                    _payload_kb = sum(len(p.data) for p in enhanced_images) / 1024
+                    st.info(
+                        f"📦 Vision payload: {_payload_kb:.0f} KB "
+                        f"({', '.join(f'{p.image.width}×{p.image.height}' for p in enhanced_images)}) "
+                        f"from {_upload_kb:.0f} KB uploaded · leaf crop saved {_pixel_savings:.0f}% pixels"
+                    )
 
-                # ── TWO-PASS for AUTO_DETECT ──────────────────────────
+                # ── Local triage, else the identify → diagnose pipeline ──
                 identified_plant = None
                 plant_id_result = None
                 _vision_model_used = "unknown"
-                if plant_type == "AUTO_DETECT":
-                    id_raw, _vision_model_used = gemini_vision_with_fallback(
-                        [PLANT_ID_PROMPT_TEMPLATE] + enhanced_images, prefer_pro
-                    )
-                    plant_id_result = extract_json_robust(id_raw)
-                    if plant_id_result and plant_id_result.get("is_plant_image", True):
-                        identified_plant = plant_id_result.get("common_name", "Unknown Plant")
-                        id_confidence = plant_id_result.get("identification_confidence", 0)
-                        id_reason = plant_id_result.get("identification_reason", "")
-                        progress_placeholder.info(
-                            f"🌿 Plant identified: {identified_plant} ({id_confidence}% confidence) "
-                            f"via {_vision_model_used}"
-                        )
-                        effective_plant = identified_plant
-                    else:
-                        effective_plant = (
-                            None if (plant_id_result and not plant_id_result.get("is_plant_image", True))
-                            else "Unknown Plant"
+                _near_distance = None
+                _local_result = None
+                if st.session_state.use_local_triage:
+                    _triage = local_triage(images, plant_type)
+                    if _triage and st.session_state.debug_mode:
+                        st.info(
+                            f"⚡ Local triage ({_triage['model']}): "
+                            + ", ".join(f"{label} {p:.0%}" for label, p in _triage["top_k"])
                         )
-                else:
-                    effective_plant = plant_type
+                    if _triage and _triage["confident"]:
+                        _local_result = local_triage_to_result(_triage)
+                        _vision_model_used = _triage["model"]
 
-                if st.session_state.debug_mode:
-                    st.info(f"🔭 Vision model: {_vision_model_used}")
-
-                # ── DISEASE DIAGNOSIS PASS ────────────────────────────
-                if effective_plant is None:
-                    result = {"is_plant_image": False, "disease_name": "Unable to diagnose", "confidence": 0, "severity": "healthy",
-                              "disease_type": "healthy", "symptoms": [], "probable_causes": [], "immediate_action": [],
-                              "organic_treatments": [], "chemical_treatments": [], "prevention_long_term": [],
-                              "confidence_reason": "Image does not contain a plant.", "image_quality": "N/A",
-                              "differential_diagnosis": [], "plant_specific_notes": "", "similar_conditions": ""}
+                if _local_result is not None:
+                    result = _local_result
                     raw_response = ""
+                    if plant_type == "AUTO_DETECT":
+                        plant_type = _local_result["plant_species"]
                 else:
-                    progress_placeholder.info(
-                        f"🧬 Step 2: Diagnosing disease in {effective_plant}..."
-                        if plant_type == "AUTO_DETECT"
-                        else f"Processing {effective_plant} leaf..."
-                    )
-                    common_diseases = PLANT_COMMON_DISEASES.get(effective_plant, "various plant diseases")
-                    prompt = EXPERT_PROMPT_TEMPLATE.format(
-                        plant_type=effective_plant, common_diseases=common_diseases
+                    _outcome = run_diagnosis(
+                        enhanced_images, plant_type, prefer_pro, _openrouter_vision_client(),
+                        progress_placeholder, st.session_state.stream_diagnosis,
                     )
-                    diag_parts = [prompt] + enhanced_images
-                    _ck = _make_cache_key(diag_parts, effective_plant)
-                    _cached = _cache_get(_ck)
-                    if _cached:
-                        raw_response, _vision_model_used = _cached[1], "cache"
-                        if st.session_state.debug_mode:
-                            st.info("⚡ Loaded from cache — no API call used")
-                    else:
-                        raw_response, _vision_model_used = gemini_vision_with_fallback(
-                            diag_parts, prefer_pro
+                    result, raw_response = _outcome["result"], _outcome["raw_response"]
+                    plant_id_result = _outcome["plant_id"]
+                    _vision_model_used = _outcome["model_used"]
+                    _near_distance = _outcome["near_match_distance"]
+                    if plant_type == "AUTO_DETECT" and _outcome["plant_type"] != "AUTO_DETECT":
+                        identified_plant = _outcome["plant_type"]
+                    plant_type = _outcome["plant_type"]
+                    if _vision_model_used == "cache" and st.session_state.debug_mode:
+                        st.info(
+                            "⚡ Loaded from cache — no API call used"
+                            + (f" (near match, {_near_distance}/64 bits differ)" if _near_distance is not None else "")
                         )
-                    if plant_type == "AUTO_DETECT":
-                        plant_type = effective_plant
-                    if st.session_state.debug_mode:
-                        st.info(f"🧬 Diagnosis model: {_vision_model_used}")
+
+                if st.session_state.debug_mode:
+                    st.info(f"🧬 Diagnosis model: {_vision_model_used}")
 
                 if st.session_state.debug_mode:
                     with st.expander("Raw Response"):
@@ -2664,10 +805,6 @@ elif page == "AI Plant Doctor":
                         st.text(displayed)
                         st.markdown("</div>", unsafe_allow_html=True)
 
-                if raw_response:
-                    result = extract_json_robust(raw_response)
-                else:
-                    result = result  # already set as error dict above
                 if result is None:
                     st.markdown("""
                     <div class="error-box">
@@ -2744,9 +881,6 @@ elif page == "AI Plant Doctor":
 
                         # Preserve infected_count from widget if user already set it
                         _prev_infected = st.session_state.get("farm_infected_plants", 50)
-                        # Save result to cache to avoid repeat API calls
-                        if "_ck" in dir() and _ck and _vision_model_used != "cache":
-                            _cache_set(_ck, (result, raw_response))
 
                         st.session_state.last_diagnosis = {
                             "plant_type": plant_type,
@@ -2760,11 +894,13 @@ elif page == "AI Plant Doctor":
                             "timestamp": datetime.now().isoformat(),
                             "result": result,
                             "model_used": _vision_model_used,
+                            "near_match_distance": _near_distance,
+                            "pixel_savings_pct": round(_pixel_savings, 1),
                         }
 
             except Exception as e:
                 err_str = str(e)
-                if _is_quota_err(e):
+                if is_quota_err(e):
                     st.markdown("""
                     <div class="warning-box">
                         ⏳ <b>All AI models are temporarily at capacity.</b><br>
@@ -2796,6 +932,14 @@ elif page == "AI Plant Doctor":
             diag["infected_count"] = int(st.session_state["farm_infected_plants"])
         _render_result = diag.get("result", {}) or {}
         _render_result["model_used"] = diag.get("model_used", "—")
+        if diag.get("near_match_distance") is not None:
+            st.markdown(
+                f"""<div class="tips-card"><div class="tips-card-title">♻️ Near match</div>
+                These photos closely match a leaf diagnosed earlier
+                ({diag["near_match_distance"]}/64 image-hash bits differ), so the stored diagnosis was reused
+                instantly. Upload a clearly different photo for a fresh analysis.</div>""",
+                unsafe_allow_html=True,
+            )
         organic_total_cost, chemical_total_cost = render_diagnosis_and_treatments(
             result=_render_result,
             plant_type=diag.get("plant_type", "Unknown"),
@@ -2879,7 +1023,19 @@ elif page == "KisanAI Assistant":
         st.session_state.farmer_bot_messages.append(
             {"role": "farmer", "content": user_question.strip()}
         )
-        answer = get_farmer_bot_response(user_question.strip(), diagnosis_context=diag)
+        st.markdown(
+            f'<div class="chat-message"><b>👨 You:</b> {user_question.strip()}</div>',
+            unsafe_allow_html=True,
+        )
+        # Render tokens as they arrive; the rerun below redraws the history normally
+        _live = st.empty()
+        answer = ""
+        for _piece in stream_farmer_bot_response(user_question.strip(), diagnosis_context=diag):
+            answer += _piece
+            _live.markdown(
+                f'<div class="chat-message"><b>🤖 KisanAI:</b> {answer}▌</div>',
+                unsafe_allow_html=True,
+            )
         st.session_state.farmer_bot_messages.append(
             {"role": "assistant", "content": answer}
         )
@@ -3393,3 +1549,6 @@ else:
                     file_name=f"plant_doctor_{st.session_state.report_lang}.txt",
                     use_container_width=True
                 )
+
+_run_profile.mark("page render")
+_startup.finish_run(_run_profile)
@@ -0,0 +1,9 @@
+"""
+AI Plant Doctor core — the Streamlit-free half of the app.
+
+app.py is only the UI; everything it shares with headless callers (the batch
+CLI, workers, benchmarks) lives here: the provider fallback chain, the
+persistent diagnosis cache, prompt templates, JSON extraction, image
+preprocessing, local triage, treatment costing, the yield-loss model and crop
+rotation lookup. Nothing in this package imports streamlit.
+"""
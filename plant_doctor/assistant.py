@@ -0,0 +1,220 @@
+"""
+Text-only helpers on the provider chain: the KisanAI farmer assistant and report translation.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+
+from .cache import cache_get, cache_set
+from .parsing import extract_json_robust
+from .providers import (
+    gemini_text_async,
+    gemini_text_stream,
+    gemini_text_with_fallback,
+    get_async_groq_client,
+    get_async_openrouter_client,
+    run_async,
+)
+from .quota import is_quota_err
+
+BOT_UNAVAILABLE_MESSAGE = "⚠️ All AI models are temporarily unavailable. Please try again in a minute."
+
+
+def _farmer_bot_prompt(user_question, diagnosis_context=None):
+    context_text = ""
+    if diagnosis_context:
+        context_text = (
+            "Current Diagnosis:\n"
+            f"- Plant: {diagnosis_context.get('plant_type', 'Unknown')}\n"
+            f"- Disease: {diagnosis_context.get('disease_name', 'Unknown')}\n"
+            f"- Severity: {diagnosis_context.get('severity', 'Unknown')}\n"
+            f"- Confidence: {diagnosis_context.get('confidence', 'Unknown')}%\n"
+        )
+    return (
+        "You are an expert agricultural advisor for farmers with deep expertise in crop management, "
+        "disease control, and sustainable farming practices.\n\n"
+        f"{context_text}\n"
+        f"Farmer question: {user_question}\n\n"
+        "Provide a comprehensive response (5-8 sentences) covering: "
+        "1. Direct answer 2. Practical, cost-effective solutions for Indian farming conditions "
+        "3. Seasonal timing and weather considerations 4. Resource availability and sourcing "
+        "5. Long-term sustainability recommendations.\n"
+        "Use clear, professional English. Focus on actionable solutions."
+    )
+
+
+def get_farmer_bot_response(user_question, diagnosis_context=None):
+    try:
+        answer, _ = gemini_text_with_fallback(_farmer_bot_prompt(user_question, diagnosis_context))
+        return answer
+    except Exception:
+        return BOT_UNAVAILABLE_MESSAGE
+
+
+def stream_farmer_bot_response(user_question, diagnosis_context=None):
+    """
+    Yield the answer in chunks as the provider chain produces them. A provider
+    failing mid-answer is continued by the next one; if nothing can answer,
+    the unavailable message is yielded instead (appended if text already arrived).
+    """
+    from .pipeline import record_ttfuc
+
+    t0 = time.monotonic()
+    started = False
+    try:
+        for _, chunk in gemini_text_stream(_farmer_bot_prompt(user_question, diagnosis_context)):
+            if not started:
+                started = True
+                record_ttfuc(time.monotonic() - t0, "chat")
+            yield chunk
+    except Exception:
+        yield ("\n\n" if started else "") + BOT_UNAVAILABLE_MESSAGE
+
+
+# ─── Report translation ──────────────────────────────────────────────────────
+# A report is split into segments — line labels ("Total Farm Value"), headings
+# and worded values or paragraphs; number-only values ("Rs 12,000", "35%") are
+# never sent. Each distinct segment is translated once per (language, glossary
+# version) and kept in the response cache, so labels shared by every report are
+# reused. Uncached segments go out in small numbered batches, translated
+# concurrently and far below the text models' 2,048-token output cap, then put
+# back into the report's layout. Finished reports are cached by content hash.
+TRANSLATION_GLOSSARY_VERSION = "g1"   # bump when the terms or rules below change
+TRANSLATION_KEEP_TERMS = ("Rs", "ROI", "AI Plant Doctor")
+TRANSLATION_CHUNK_CHARS = int(os.environ.get("PLANT_DOCTOR_TRANSLATION_CHUNK_CHARS", 800))
+TRANSLATION_CONCURRENCY = int(os.environ.get("PLANT_DOCTOR_TRANSLATION_CONCURRENCY", 4))
+
+_LABEL_LINE = re.compile(r"^(\s*)([A-Za-z][^:]*?)(\s*:\s*)(.+)$")
+_DECORATION = re.compile(r"^([\s\-=*#•|]*)(.*?)([\s\-=*#•|]*)$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_KEPT_WORDS = re.compile(r"\b(?:Rs|ROI)\b\.?")
+
+
+def _translation_key(kind: str, text: str, language: str) -> str:
+    digest = hashlib.sha256(f"{TRANSLATION_GLOSSARY_VERSION}\0{language}\0{text}".encode()).hexdigest()
+    return f"translation-{kind}-{digest}"
+
+
+def _split_report(report_text: str):
+    """
+    (lines, segments): each line is a list of literal strings and
+    (segment_index, min_width) slots; segments are the distinct texts to translate.
+    """
+    segments, seen, lines = [], {}, []
+
+    def slot(text: str, width: int = 0) -> list:
+        lead, body, trail = _DECORATION.match(text).groups()
+        if not re.search(r"[A-Za-z]", _KEPT_WORDS.sub("", body)):
+            return [text]
+        pieces = [lead] if lead else []
+        sentences = _SENTENCE_END.split(body) if len(body) > TRANSLATION_CHUNK_CHARS else [body]
+        for i, sentence in enumerate(sentences):
+            if sentence not in seen:
+                seen[sentence] = len(segments)
+                segments.append(sentence)
+            pieces += ([" "] if i else []) + [(seen[sentence], width)]
+        return pieces + ([trail] if trail else [])
+
+    for line in report_text.split("\n"):
+        m = _LABEL_LINE.match(line)
+        if m:
+            indent, label, sep, value = m.groups()
+            lines.append([indent] + slot(label, len(label)) + [sep] + slot(value))
+        else:
+            lines.append(slot(line) if line.strip() else [line])
+    return lines, segments
+
+
+def _join_report(lines: list, translations: list) -> str:
+    out = []
+    for pieces in lines:
+        out.append("".join(
+            p if isinstance(p, str) else translations[p[0]].ljust(p[1]) for p in pieces
+        ))
+    return "\n".join(out)
+
+
+def _translation_batches(texts: list) -> list:
+    batches, current, size = [], [], 0
+    for text in texts:
+        if current and size + len(text) > TRANSLATION_CHUNK_CHARS:
+            batches.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += len(text)
+    return batches + ([current] if current else [])
+
+
+def _translation_prompt(texts: list, language: str) -> str:
+    numbered = json.dumps({str(i + 1): t for i, t in enumerate(texts)}, ensure_ascii=False, indent=0)
+    return (
+        f"Translate each numbered English text from a farm diagnosis report to {language}.\n"
+        f"Keep numbers, % signs and these terms exactly as written: {', '.join(TRANSLATION_KEEP_TERMS)}.\n"
+        "Use the crop and disease names farmers know locally. Translate every entry on its own.\n"
+        "Reply ONLY with a JSON object mapping the same numbers to the translations.\n\n"
+        f"{numbered}"
+    )
+
+
+async def _translate_batches(batches: list, language: str) -> tuple:
+    """({english: translation} for every batch that succeeded, last error or None)."""
+    groq_client, or_client = get_async_groq_client(), get_async_openrouter_client()
+    gate = asyncio.Semaphore(TRANSLATION_CONCURRENCY)
+
+    async def _one(texts):
+        async with gate:
+            answer, _ = await gemini_text_async(_translation_prompt(texts, language), groq_client, or_client)
+        data = extract_json_robust(answer)
+        if not data:
+            raise ValueError("no parseable translation in the model's answer")
+        return {t: str(data[str(i + 1)]).strip() for i, t in enumerate(texts)
+                if str(data.get(str(i + 1)) or "").strip()}
+
+    done, last_err = {}, None
+    for outcome in await asyncio.gather(*map(_one, batches), return_exceptions=True):
+        if isinstance(outcome, Exception):
+            last_err = outcome
+        else:
+            done.update(outcome)
+    return done, last_err
+
+
+def translate_report(report_text, language):
+    if language == "English":
+        return report_text
+    report_key = _translation_key("report", report_text, language)
+    cached = cache_get(report_key)
+    if cached:
+        return cached[0]
+
+    lines, segments = _split_report(report_text)
+    translations = [None] * len(segments)
+    for i, text in enumerate(segments):
+        hit = cache_get(_translation_key("segment", text, language))
+        if hit:
+            translations[i] = hit[0]
+    missing = [t for t, tr in zip(segments, translations) if tr is None]
+
+    last_err = None
+    if missing:
+        try:
+            done, last_err = run_async(_translate_batches(_translation_batches(missing), language))
+        except Exception as e:
+            done, last_err = {}, e
+        for text, translated in done.items():
+            cache_set(_translation_key("segment", text, language), (translated, language))
+        translations = [tr if tr is not None else done.get(t) for t, tr in zip(segments, translations)]
+
+    untranslated = sum(tr is None for tr in translations)
+    result = _join_report(lines, [tr if tr is not None else t for t, tr in zip(segments, translations)])
+    if not untranslated:
+        cache_set(report_key, (result, language))
+        return result
+    if untranslated == len(segments):
+        if last_err is None or is_quota_err(last_err):
+            return report_text + "\n\n⏳ Translation unavailable — all models at capacity. Try again shortly."
+        return report_text + f"\n\n❌ Translation failed: {str(last_err)[:80]}"
+    return result + "\n\n⚠️ Some lines could not be translated and are shown in English."
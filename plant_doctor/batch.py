@@ -0,0 +1,170 @@
+"""
+Headless batch diagnosis over a folder or ZIP of field photos.
+
+    python -m plant_doctor.batch survey.zip --plant AUTO_DETECT --out survey.jsonl --csv survey.csv
+
+Each image is one diagnosis. Results are appended to the JSONL file one line
+per image as they finish, so an interrupted run resumes by skipping every
+source already recorded without an error. Concurrency is a bounded worker pool;
+every provider call still goes through the shared token buckets and circuit
+breakers, so a big survey queues behind the per-model limits instead of
+burning through the day's quota.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from datetime import datetime
+
+from .imaging import prepare_upload
+from .pipeline import diagnose_async
+from .providers import get_async_openrouter_client, get_secret
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+CSV_FIELDS = [
+    "source", "plant_type", "disease_name", "disease_type", "severity", "confidence",
+    "model_used", "near_match_distance", "seconds", "error", "timestamp",
+]
+
+
+def iter_sources(path: str):
+    """Yield (source_name, opener) for each image in a directory tree or ZIP archive."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = sorted(
+                n for n in zf.namelist()
+                if n.lower().endswith(IMAGE_EXTENSIONS) and not n.startswith("__MACOSX/")
+            )
+        for name in names:
+            def _open(name=name):
+                with zipfile.ZipFile(path) as zf:
+                    return io.BytesIO(zf.read(name))
+            yield f"{os.path.basename(path)}:{name}", _open
+        return
+    for root, _, files in sorted(os.walk(path)):
+        for fname in sorted(files):
+            if fname.lower().endswith(IMAGE_EXTENSIONS):
+                full = os.path.join(root, fname)
+                yield os.path.relpath(full, path), (lambda full=full: open(full, "rb"))
+
+
+def load_checkpoint(jsonl_path: str) -> set:
+    """Sources already diagnosed successfully in a previous run."""
+    done = set()
+    if not os.path.exists(jsonl_path):
+        return done
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue             # a line cut short by the interruption
+            if not rec.get("error"):
+                done.add(rec.get("source"))
+    return done
+
+
+def _prepare(opener, crop: bool):
+    with opener() as fh:
+        return prepare_upload(fh, crop)[0]
+
+
+async def _diagnose_one(source, opener, args, or_client) -> dict:
+    t0 = time.monotonic()
+    rec = {"source": source, "timestamp": datetime.now().isoformat()}
+    try:
+        payload = await asyncio.to_thread(_prepare, opener, not args.no_crop)
+        out = await diagnose_async([payload], args.plant, args.prefer_pro, or_client)
+        result = out["result"]
+        rec.update(
+            plant_type=out["plant_type"],
+            model_used=out["model_used"],
+            near_match_distance=out["near_match_distance"],
+            result=result,
+            error=None if result else "Could not parse AI response",
+        )
+        if result:
+            rec.update({k: result.get(k) for k in ("disease_name", "disease_type", "severity", "confidence")})
+    except Exception as e:
+        rec["error"] = f"{type(e).__name__}: {e}"
+    rec["seconds"] = round(time.monotonic() - t0, 2)
+    return rec
+
+
+async def run_batch(args) -> int:
+    done = load_checkpoint(args.out)
+    pending = [(s, o) for s, o in iter_sources(args.input) if s not in done]
+    total = len(pending) + len(done)
+    print(f"{len(done)} already done, {len(pending)} to diagnose ({total} images)", file=sys.stderr)
+    if not pending:
+        return 0
+
+    or_client = get_async_openrouter_client() if args.openrouter else None
+    sem = asyncio.Semaphore(args.workers)
+    failures = 0
+
+    csv_file = csv_writer = None
+    if args.csv:
+        new_csv = not os.path.exists(args.csv)
+        csv_file = open(args.csv, "a", newline="", encoding="utf-8")
+        csv_writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        if new_csv:
+            csv_writer.writeheader()
+
+    async def _worker(source, opener):
+        async with sem:
+            return await _diagnose_one(source, opener, args, or_client)
+
+    try:
+        with open(args.out, "a", encoding="utf-8") as jsonl:
+            tasks = [asyncio.ensure_future(_worker(s, o)) for s, o in pending]
+            for n, fut in enumerate(asyncio.as_completed(tasks), start=len(done) + 1):
+                rec = await fut
+                jsonl.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                jsonl.flush()               # each finished image is a checkpoint
+                if csv_writer:
+                    csv_writer.writerow(rec)
+                    csv_file.flush()
+                if rec.get("error"):
+                    failures += 1
+                status = rec.get("error") or f"{rec.get('disease_name')} ({rec.get('confidence')}%)"
+                print(f"[{n}/{total}] {rec['source']}: {status} · {rec.get('model_used', '-')}", file=sys.stderr)
+    finally:
+        if csv_file:
+            csv_file.close()
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m plant_doctor.batch", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="directory of images or a .zip archive")
+    parser.add_argument("--plant", default="AUTO_DETECT", help="plant type, or AUTO_DETECT (default)")
+    parser.add_argument("--out", default="results.jsonl", help="JSONL results / checkpoint file")
+    parser.add_argument("--csv", default=None, help="also append a flat CSV summary here")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("PLANT_DOCTOR_BATCH_WORKERS", 4)))
+    parser.add_argument("--prefer-pro", action="store_true", help="try Gemini 2.5 Pro first")
+    parser.add_argument("--no-crop", action="store_true", help="send the full frame instead of the leaf crop")
+    parser.add_argument("--no-openrouter", dest="openrouter", action="store_false",
+                        help="do not fall back to OpenRouter Qwen vision")
+    parser.add_argument("--fake-provider", action="store_true",
+                        help="answer from canned responses; no keys or quota used")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        parser.error(f"{args.input} does not exist")
+    if args.fake_provider:
+        from .fake_provider import install
+        install()
+    if not get_secret("GEMINI_API_KEY"):
+        parser.error("GEMINI_API_KEY is not set")
+    return asyncio.run(run_batch(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Response cache (avoid re-calling the API for the same image + plant).
+
+Persistent, content-addressed store shared by every worker process, with a
+byte budget, TTL and LRU eviction. Falls back to a small in-memory dict if the
+cache file can't be opened (read-only filesystems).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+from .catalog import catalog_version
+from .imaging import ImagePayload
+from .prompts import PROMPT_VERSION, PromptPrefix
+from .store import connection
+
+_CACHE_MAX_BYTES = int(os.environ.get("PLANT_DOCTOR_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+_CACHE_TTL_SECONDS = int(os.environ.get("PLANT_DOCTOR_CACHE_TTL", 30 * 24 * 3600))
+
+_RESPONSE_CACHE: dict = {}   # in-memory fallback { cache_key: (result_dict, raw_text) }
+_CACHE_MAX = 50              # fallback keeps last 50 results
+
+
+_schema_ready = threading.local()
+
+
+def _cache_conn():
+    """Shared state connection with the cache tables created, or None."""
+    conn = connection()
+    if conn is None or getattr(_schema_ready, "ok", False):
+        return conn
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS phashes ("
+            " hash INTEGER NOT NULL, plant TEXT NOT NULL, key TEXT NOT NULL,"
+            " position INTEGER NOT NULL, n_images INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS phashes_key ON phashes(key)")
+        # bumped whenever phashes rows are deleted, so every process rebuilds its BK-tree
+        conn.execute("CREATE TABLE IF NOT EXISTS phash_generation (id INTEGER PRIMARY KEY, n INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO phash_generation (id, n) VALUES (0, 0)")
+    except Exception:
+        return None
+    _schema_ready.ok = True
+    return conn
+
+
+def make_cache_key(parts: list, plant_type: str) -> str:
+    """Content address: every image's encoded payload (or raw pixels) + plant + prompt and catalogue versions."""
+    hasher = hashlib.sha256()
+    hasher.update(PROMPT_VERSION.encode())
+    hasher.update(b"\0" + catalog_version().encode())
+    hasher.update(b"\0" + plant_type.encode() + b"\0")
+    for p in parts:
+        if isinstance(p, PromptPrefix):
+            hasher.update(p.sha256)
+        elif isinstance(p, str):
+            hasher.update(hashlib.sha256(p.encode()).digest())
+        elif isinstance(p, ImagePayload):
+            hasher.update(p.sha256)
+        else:
+            try:
+                hasher.update(f"{p.mode}:{p.size[0]}x{p.size[1]}:".encode())
+                hasher.update(p.tobytes())
+            except Exception:
+                pass
+    return hasher.hexdigest()
+
+
+def cache_get(key: str):
+    conn = _cache_conn()
+    if conn is None:
+        return _RESPONSE_CACHE.get(key)
+    try:
+        row = conn.execute(
+            "SELECT value, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > _CACHE_TTL_SECONDS:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                _delete_keys(conn, [(key,)])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return None
+        conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        result, raw = json.loads(row[0])
+        return result, raw
+    except Exception:
+        return None
+
+
+def _delete_keys(conn, keys: list):
+    """Drop responses and their near-duplicate hashes; call inside the caller's transaction."""
+    conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+    before = conn.total_changes
+    conn.executemany("DELETE FROM phashes WHERE key = ?", keys)
+    if conn.total_changes != before:
+        conn.execute("UPDATE phash_generation SET n = n + 1 WHERE id = 0")
+
+
+def _evict(conn):
+    """Drop expired rows, then least-recently-used rows until under the byte budget."""
+    now = time.time()
+    doomed = conn.execute("SELECT key FROM responses WHERE created < ?", (now - _CACHE_TTL_SECONDS,)).fetchall()
+    if doomed:
+        _delete_keys(conn, doomed)
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= _CACHE_MAX_BYTES:
+        return
+    freed, doomed = 0, []
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed ASC"):
+        doomed.append((key,))
+        freed += size
+        if total - freed <= _CACHE_MAX_BYTES:
+            break
+    _delete_keys(conn, doomed)
+
+
+def cache_set(key: str, value):
+    conn = _cache_conn()
+    if conn is None:
+        if len(_RESPONSE_CACHE) >= _CACHE_MAX:
+            oldest = next(iter(_RESPONSE_CACHE))
+            del _RESPONSE_CACHE[oldest]
+        _RESPONSE_CACHE[key] = value
+        return
+    try:
+        blob = json.dumps(list(value), ensure_ascii=False).encode("utf-8")
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            _evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    except Exception:
+        pass
+
+
+# ─── Near-duplicate lookup (same leaf, new angle / WhatsApp recompression) ───
+# 64-bit dHash per image, kept in the cache DB and mirrored into an in-process
+# BK-tree that is topped up incrementally from rows other workers have added.
+# Evicting a response deletes its hashes in the same transaction and bumps
+# phash_generation; a tree that sees a new generation is rebuilt from the table.
+NEAR_DUP_MAX_DISTANCE = int(os.environ.get("PLANT_DOCTOR_NEAR_DUP_DISTANCE", 6))
+
+
+def dhash(image) -> int:
+    """Difference hash: sign of horizontal gradients on a 9x8 grayscale thumbnail."""
+    from PIL import Image
+
+    image = getattr(image, "image", image)   # ImagePayload → its downsized PIL image
+    small = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits
+
+
+class _BKTree:
+    """Burkhard-Keller tree over Hamming distance; nodes are [hash, payloads, children]."""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, h: int, payload):
+        if self.root is None:
+            self.root = [h, [payload], {}]
+            return
+        node = self.root
+        while True:
+            d = bin(node[0] ^ h).count("1")
+            if d == 0:
+                node[1].append(payload)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [payload], {}]
+                return
+            node = child
+
+    def search(self, h: int, max_dist: int):
+        found, stack = [], [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = bin(node[0] ^ h).count("1")
+            if d <= max_dist:
+                found.extend((d, p) for p in node[1])
+            for cd, child in node[2].items():
+                if d - max_dist <= cd <= d + max_dist:
+                    stack.append(child)
+        return found
+
+
+_phash_tree = _BKTree()
+_phash_last_rowid = 0
+_phash_generation = None
+_phash_lock = threading.Lock()
+
+
+def _phash_sync(conn):
+    """Pull rows added since the last sync (possibly by other processes) into the tree."""
+    global _phash_tree, _phash_last_rowid, _phash_generation
+    generation = conn.execute("SELECT n FROM phash_generation WHERE id = 0").fetchone()[0]
+    if generation != _phash_generation:     # rows were deleted somewhere: start over
+        _phash_tree, _phash_last_rowid, _phash_generation = _BKTree(), 0, generation
+    rows = conn.execute(
+        "SELECT rowid, hash, plant, key, position, n_images FROM phashes WHERE rowid > ?"
+        " ORDER BY rowid", (_phash_last_rowid,)
+    ).fetchall()
+    for rowid, h, plant, key, position, n_images in rows:
+        _phash_tree.add(h & 0xFFFFFFFFFFFFFFFF, (plant, key, position, n_images))
+        _phash_last_rowid = rowid
+
+
+def _phash_namespace(plant_type: str) -> str:
+    # entries written under another prompt or catalogue version are never matched
+    return f"{PROMPT_VERSION}/{catalog_version()}/{plant_type}"
+
+
+def phash_index_add(images: list, plant_type: str, key: str):
+    conn = _cache_conn()
+    if conn is None or not images:
+        return
+    plant_type = _phash_namespace(plant_type)
+    try:
+        hashes = [dhash(img) for img in images]
+        with _phash_lock:
+            _phash_sync(conn)
+            # SQLite integers are signed 64-bit; store the two's-complement form
+            conn.executemany(
+                "INSERT INTO phashes (hash, plant, key, position, n_images) VALUES (?, ?, ?, ?, ?)",
+                [(h - (1 << 64) if h >= (1 << 63) else h, plant_type, key, i, len(hashes))
+                 for i, h in enumerate(hashes)],
+            )
+            _phash_sync(conn)
+    except Exception:
+        pass
+
+
+def near_duplicate_lookup(images: list, plant_type: str, max_dist: int = None):
+    """
+    Find a stored diagnosis whose images are all within `max_dist` bits of the
+    uploaded ones (same count, same order). Returns (cached_value, distance) or None.
+    """
+    max_dist = NEAR_DUP_MAX_DISTANCE if max_dist is None else max_dist
+    conn = _cache_conn()
+    if conn is None or not images or max_dist <= 0:
+        return None
+    plant_type = _phash_namespace(plant_type)
+    try:
+        hashes = [dhash(img) for img in images]
+        with _phash_lock:
+            _phash_sync(conn)
+            worst = None
+            for i, h in enumerate(hashes):
+                best = {}
+                for d, (plant, key, position, n_images) in _phash_tree.search(h, max_dist):
+                    if plant == plant_type and position == i and n_images == len(hashes):
+                        best[key] = min(d, best.get(key, d))
+                worst = best if worst is None else {
+                    k: max(worst[k], best[k]) for k in worst.keys() & best.keys()
+                }
+                if not worst:
+                    return None
+        for key, dist in sorted(worst.items(), key=lambda kv: kv[1]):
+            cached = cache_get(key)
+            if cached:
+                return cached, dist
+    except Exception:
+        pass
+    return None
@@ -0,0 +1,147 @@
+"""
+Reference catalogue: treatment prices, curated crop rotations and per-plant
+disease hints, loaded from data/catalog.json (or PLANT_DOCTOR_CATALOG).
+
+The file is parsed once into an immutable Catalog shared by every session
+and thread. get_catalog() re-stats the file at most every
+CATALOG_CHECK_SECONDS and swaps in a fresh Catalog when it has changed, so a
+price update goes live without a restart. A file that fails to load is
+reported and the previous catalogue stays in service.
+
+The modules that used to hold these dicts expose live read-only views
+(TREATMENT_COSTS, CROP_ROTATION_DATA, PLANT_COMMON_DISEASES) that always read
+the current catalogue. catalog_version() goes into diagnosis cache keys.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
+
+CATALOG_PATH = os.environ.get(
+    "PLANT_DOCTOR_CATALOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "catalog.json"),
+)
+CATALOG_CHECK_SECONDS = float(os.environ.get("PLANT_DOCTOR_CATALOG_CHECK", 2))
+SECTIONS = ("treatment_costs", "crop_rotation_data", "plant_common_diseases")
+
+
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj):
+    """Plain, mutable, JSON-serialisable copy of a catalogue value."""
+    if isinstance(obj, Mapping):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+class Catalog:
+    """One loaded version of the catalogue. Sections are read-only mappings."""
+
+    def __init__(self, data: dict, content_sha256: str):
+        missing = [s for s in SECTIONS if not isinstance(data.get(s), dict)]
+        if missing:
+            raise ValueError(f"catalogue is missing sections: {', '.join(missing)}")
+        # the declared version decides cache invalidation; unversioned files use their content hash
+        self.version = str(data.get("version") or "").strip() or content_sha256[:12]
+        self.treatment_costs = _freeze(data["treatment_costs"])
+        self.crop_rotation_data = _freeze(data["crop_rotation_data"])
+        self.plant_common_diseases = _freeze(data["plant_common_diseases"])
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def derived(self, name: str, build):
+        """Memo for structures built from this catalogue (indexes); a reload starts fresh."""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = build(self)
+            return self._derived[name]
+
+
+_current = None
+_current_stat = None
+_next_check = 0.0
+_lock = threading.Lock()
+
+
+def _file_stat(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_catalog(path: str) -> Catalog:
+    with open(path, "rb") as f:
+        raw = f.read()
+    return Catalog(json.loads(raw), hashlib.sha256(raw).hexdigest())
+
+
+def get_catalog() -> Catalog:
+    """The current catalogue, reloaded if the file changed since the last check."""
+    global _current, _current_stat, _next_check
+    now = time.monotonic()
+    if _current is not None and now < _next_check:
+        return _current
+    with _lock:
+        if _current is not None and now < _next_check:
+            return _current
+        _next_check = now + CATALOG_CHECK_SECONDS
+        stat = _file_stat(CATALOG_PATH)
+        if _current is None or (stat is not None and stat != _current_stat):
+            try:
+                fresh = load_catalog(CATALOG_PATH)
+            except Exception as e:
+                if _current is None:
+                    raise
+                print(f"catalog: reload of {CATALOG_PATH} failed, keeping version "
+                      f"{_current.version}: {e}", file=sys.stderr)
+            else:
+                _current = fresh
+            _current_stat = stat     # a broken file is retried on its next change, not every check
+        return _current
+
+
+def catalog_version() -> str:
+    return get_catalog().version
+
+
+class LiveSection(Mapping):
+    """Read-only view of one catalogue section that always reads the current version."""
+
+    def __init__(self, section: str):
+        self._section = section
+
+    def _data(self):
+        return getattr(get_catalog(), self._section)
+
+    def __getitem__(self, key):
+        return self._data()[key]
+
+    def __iter__(self):
+        return iter(self._data())
+
+    def __len__(self):
+        return len(self._data())
+
+    def __contains__(self, key):
+        return key in self._data()
+
+    def __repr__(self):
+        return f"LiveSection({self._section!r}, version={catalog_version()!r})"
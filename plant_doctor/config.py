@@ -0,0 +1,20 @@
+"""Model fallback chains. The lists are mutated in place by the UI, never rebound."""
+
+# ─── Gemini vision chain (same API key, separate quota pools) ──────────────
+# Free limits: 2.5 Flash ~250 RPD → 1.5 Flash 1500 RPD → 1.5 Flash-8B 1500 RPD
+VISION_MODEL_CHAIN = [
+    "gemini-2.5-flash",       # PRIMARY  — best quality (250 RPD)
+    "gemini-1.5-flash",       # FALLBACK — higher quota (1500 RPD)
+    "gemini-1.5-flash-8b",    # LAST RESORT — lightest (1500 RPD)
+]
+
+# ─── OpenRouter vision fallback (completely free via openrouter.ai) ────────
+OPENROUTER_VISION_MODEL = "qwen/qwen-2.5-vl-7b-instruct:free"
+OPENROUTER_TEXT_MODEL   = "meta-llama/llama-3.3-70b-instruct:free"
+
+# ─── Text-only chain (chatbot, crop rotation, translation) ────────────────
+# Groq: 14,400 free RPD  |  OpenRouter: unlimited free tier
+GROQ_TEXT_MODELS = [
+    "llama-3.1-8b-instant",     # 14,400 RPD free — very fast
+    "llama-3.3-70b-versatile",  # 1,000  RPD free — highest quality
+]
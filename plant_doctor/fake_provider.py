@@ -0,0 +1,197 @@
+"""
+Deterministic offline stand-in for the Gemini SDK.
+
+install() puts a fake google.generativeai module in front of the real one, so
+the HTTP API and the batch CLI can be exercised end to end (multipart upload,
+worker pool, backpressure, caching) without keys or quota:
+
+    python -m plant_doctor.server --fake-provider
+
+Groq/OpenRouter keys are dropped for the process so the text chain also
+lands on the fake, and shared state goes to a separate SQLite file so fake
+calls never count against the real quota ledger or fill the real cache.
+
+The fake also implements explicit context caching and reports token usage
+the way Gemini does, so prompt-prefix caching can be checked offline:
+
+    python -m plant_doctor.fake_provider --requests 5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import types
+
+FAKE_LATENCY_SECONDS = float(os.environ.get("PLANT_DOCTOR_FAKE_LATENCY", 0.2))
+FAKE_CACHE_MIN_TOKENS = 1024     # like Gemini 2.5 Flash: smaller prefixes are refused
+_IMAGE_TOKENS = 258              # Gemini's flat charge per image
+
+FAKE_PLANT_ID = {
+    "is_plant_image": True,
+    "common_name": "Tomato",
+    "scientific_name": "Solanum lycopersicum",
+    "identification_confidence": 92,
+    "identification_reason": "Compound leaves with serrated leaflets (fake provider).",
+    "visible_features": ["compound leaves", "serrated margins"],
+    "possible_alternatives": ["Potato"],
+}
+
+FAKE_DIAGNOSIS = {
+    "is_plant_image": True,
+    "is_correct_plant": True,
+    "plant_species": "Tomato",
+    "disease_name": "Early Blight",
+    "disease_type": "fungal",
+    "severity": "moderate",
+    "confidence": 87,
+    "confidence_reason": "Concentric brown lesions on older leaves (fake provider).",
+    "image_quality": "Good",
+    "symptoms": ["Concentric ring lesions", "Yellowing around spots"],
+    "differential_diagnosis": ["Septoria leaf spot"],
+    "probable_causes": ["Alternaria solani favoured by warm humid weather"],
+    "immediate_action": ["Remove infected lower leaves"],
+    "organic_treatments": ["Neem Oil Spray", "Trichoderma viride"],
+    "chemical_treatments": ["Mancozeb (Indofil M-45)"],
+    "prevention_long_term": ["Rotate with non-solanaceous crops"],
+    "plant_specific_notes": "",
+    "similar_conditions": "",
+}
+
+FAKE_ROTATION = {
+    "rotations": ["Beans", "Maize", "Mustard"],
+    "info": {
+        "Beans": "Fixes nitrogen (fake provider).",
+        "Maize": "Different pest spectrum (fake provider).",
+        "Mustard": "Biofumigant break crop (fake provider).",
+    },
+}
+
+
+def fake_response(prompt: str) -> str:
+    """Canned reply chosen by which prompt template produced `prompt`."""
+    if "IDENTIFY AND DIAGNOSE" in prompt:
+        return json.dumps(dict(FAKE_DIAGNOSIS, **FAKE_PLANT_ID))
+    if "plant taxonomist" in prompt:
+        return json.dumps(FAKE_PLANT_ID)
+    if "plant pathologist" in prompt:
+        return "```json\n" + json.dumps(FAKE_DIAGNOSIS) + "\n```"
+    if "knowledge of crop rotation" in prompt:
+        return json.dumps(FAKE_ROTATION)
+    if "from a farm diagnosis report to" in prompt:
+        language = prompt.split(" to ", 1)[1].split(".", 1)[0]
+        texts = json.loads(prompt[prompt.index("{"):])
+        return json.dumps({k: f"[{language}] {v}" for k, v in texts.items()}, ensure_ascii=False)
+    return "Fake provider answer: inspect the lower leaves, remove infected foliage and avoid overhead watering."
+
+
+def _tokens(contents: list) -> int:
+    return sum(len(c) // 4 if isinstance(c, str) else _IMAGE_TOKENS for c in contents)
+
+
+class _FakeCachedContent:
+    _ids = itertools.count(1)
+
+    def __init__(self, model, contents):
+        self.name = f"cachedContents/fake-{next(self._ids)}"
+        self.model = model
+        self.contents = list(contents)
+
+    @classmethod
+    def create(cls, model, contents=(), **_):
+        if _tokens(list(contents)) < FAKE_CACHE_MIN_TOKENS:
+            raise ValueError(f"400 Cached content is too small. min_total_token_count={FAKE_CACHE_MIN_TOKENS}")
+        return cls(model, contents)
+
+
+class _FakeStream:
+    """Async-iterable chunks with usage_metadata, like a streamed Gemini response."""
+
+    def __init__(self, text, usage_metadata, chunk_chars: int = 24):
+        self.text = text
+        self.usage_metadata = usage_metadata
+        self._chunk_chars = chunk_chars
+
+    async def __aiter__(self):
+        """Spread the fake latency across ~24-character chunks, like a token stream."""
+        n = max(1, -(-len(self.text) // self._chunk_chars))
+        for i in range(0, len(self.text), self._chunk_chars):
+            await asyncio.sleep(FAKE_LATENCY_SECONDS / n)
+            yield types.SimpleNamespace(text=self.text[i:i + self._chunk_chars])
+
+
+class _FakeModel:
+    def __init__(self, model_id, cached_content=None):
+        self.model_id = model_id
+        self.cached_content = cached_content
+
+    @classmethod
+    def from_cached_content(cls, cached_content, **_):
+        return cls(cached_content.model, cached_content)
+
+    async def generate_content_async(self, contents, stream=False, **_):
+        cached = self.cached_content.contents if self.cached_content else []
+        full = cached + list(contents)
+        prompt = next((c for c in full if isinstance(c, str)), "")
+        text = fake_response(prompt)
+        usage = types.SimpleNamespace(prompt_token_count=_tokens(full), cached_content_token_count=_tokens(cached))
+        if stream:
+            return _FakeStream(text, usage)
+        await asyncio.sleep(FAKE_LATENCY_SECONDS)
+        return types.SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def install():
+    """Route every provider call in this process to the fake. Call before the first request."""
+    from . import store
+
+    genai = types.ModuleType("google.generativeai")
+    genai.configure = lambda **_: None
+    genai.GenerativeModel = _FakeModel
+    genai.caching = types.ModuleType("google.generativeai.caching")
+    genai.caching.CachedContent = _FakeCachedContent
+    google = sys.modules.get("google") or types.ModuleType("google")
+    google.generativeai = genai
+    sys.modules["google"] = google
+    sys.modules["google.generativeai"] = genai
+    sys.modules["google.generativeai.caching"] = genai.caching
+
+    os.environ.setdefault("GEMINI_API_KEY", "fake")
+    for key in ("GROQ_API_KEY", "OPENROUTER_API_KEY"):
+        os.environ.pop(key, None)
+    store.CACHE_DB_PATH = os.path.join(os.path.dirname(store.CACHE_DB_PATH), "fake_provider.sqlite3")
+
+
+def main(argv=None) -> int:
+    """Diagnose a synthetic leaf repeatedly on the fake and report input tokens per request."""
+    parser = argparse.ArgumentParser(prog="python -m plant_doctor.fake_provider", description=main.__doc__)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--plant", default="Tomato")
+    args = parser.parse_args(argv)
+
+    install()
+    from PIL import Image
+
+    from .imaging import prepare_image_payload
+    from .pipeline import diagnose_plant_async
+    from .prompts import prompt_memo_stats
+    from .providers import recent_prompt_usage, run_async
+
+    for i in range(args.requests):
+        # random pixels each time, so neither the exact nor the near-duplicate cache answers
+        payload = prepare_image_payload(Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)))
+        _, _, model_used, _ = run_async(diagnose_plant_async([payload], args.plant))
+        usage = recent_prompt_usage(model_used)
+        if not usage:
+            print(f"request {i + 1}: answered from {model_used}")
+            continue
+        sent, cached = usage[-1]
+        print(f"request {i + 1}: {model_used} · {sent} input tokens · {cached} from context cache")
+    hits, builds = prompt_memo_stats()
+    print(f"prompt memo: {builds} built, {hits} reused")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+User Manual pages, one HTML file per language under data/manuals/.
+
+Each page ships as <code>.html (the source to edit) and a pre-compressed
+<code>.html.gz, which is what the app reads. A page is decompressed the first
+time its language is selected and then kept for the life of the process;
+languages nobody selects are never read. After editing a page:
+
+    python -m plant_doctor.manuals           # rebuild the .html.gz files
+    python -m plant_doctor.manuals --check   # exit 1 if any is out of date
+"""
+import argparse
+import functools
+import gzip
+import os
+import sys
+
+MANUAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "manuals")
+
+# selector label → file code, in menu order
+MANUAL_LANGUAGES = {
+    "English": "en",
+    "हिंदी (Hindi)": "hi",
+    "ਪੰਜਾਬੀ (Punjabi)": "pa",
+    "मराठी (Marathi)": "mr",
+    "தமிழ் (Tamil)": "ta",
+    "తెలుగు (Telugu)": "te",
+    "ಕನ್ನಡ (Kannada)": "kn",
+    "বাংলা (Bengali)": "bn",
+    "ગુજરાતી (Gujarati)": "gu",
+}
+DEFAULT_MANUAL_LANGUAGE = "English"
+
+
+def _source_path(code: str) -> str:
+    return os.path.join(MANUAL_DIR, f"{code}.html")
+
+
+def _compress(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=9, mtime=0)   # mtime=0 → byte-identical rebuilds
+
+
+@functools.lru_cache(maxsize=None)
+def _manual_page(code: str) -> str:
+    try:
+        with open(_source_path(code) + ".gz", "rb") as f:
+            return gzip.decompress(f.read()).decode("utf-8")
+    except FileNotFoundError:          # not built yet: fall back to the source
+        with open(_source_path(code), encoding="utf-8") as f:
+            return f.read()
+
+
+def manual_html(language: str) -> str:
+    """The manual page for a selector label (English if unknown), read on first use."""
+    code = MANUAL_LANGUAGES.get(language) or MANUAL_LANGUAGES[DEFAULT_MANUAL_LANGUAGE]
+    return _manual_page(code)
+
+
+def build_manuals(check: bool = False) -> list:
+    """Rewrite every .html.gz that no longer matches its .html; returns their codes."""
+    stale = []
+    for code in MANUAL_LANGUAGES.values():
+        with open(_source_path(code), "rb") as f:
+            packed = _compress(f.read())
+        try:
+            with open(_source_path(code) + ".gz", "rb") as f:
+                if f.read() == packed:
+                    continue
+        except FileNotFoundError:
+            pass
+        stale.append(code)
+        if not check:
+            with open(_source_path(code) + ".gz", "wb") as f:
+                f.write(packed)
+    return stale
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m plant_doctor.manuals",
+                                     description="Rebuild the pre-compressed User Manual pages.")
+    parser.add_argument("--check", action="store_true", help="only report out-of-date pages")
+    args = parser.parse_args(argv)
+    stale = build_manuals(check=args.check)
+    verb = "out of date" if args.check else "rebuilt"
+    print(f"{len(stale)} of {len(MANUAL_LANGUAGES)} manual pages {verb}" + (f": {', '.join(stale)}" if stale else ""))
+    return 1 if args.check and stale else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""
+Cache-aware identify → diagnose pipeline shared by the Streamlit app and the batch CLI.
+"""
+import asyncio
+import collections
+import os
+import threading
+import time
+
+from .cache import cache_get, cache_set, make_cache_key, near_duplicate_lookup, phash_index_add
+from .parsing import IncrementalJSONParser, extract_json_robust
+from .prompts import PLANT_ID_PROMPT, combined_prompt, diagnosis_prompt
+from .providers import gemini_vision_async, gemini_vision_stream_async, run_async, stream_sync
+from .schema import COMBINED_SCHEMA, DIAGNOSIS_SCHEMA, PLANT_ID_SCHEMA, STRUCTURED_OUTPUT
+
+
+NOT_A_PLANT_RESULT = {
+    "is_plant_image": False, "disease_name": "Unable to diagnose", "confidence": 0, "severity": "healthy",
+    "disease_type": "healthy", "symptoms": [], "probable_causes": [], "immediate_action": [],
+    "organic_treatments": [], "chemical_treatments": [], "prevention_long_term": [],
+    "confidence_reason": "Image does not contain a plant.", "image_quality": "N/A",
+    "differential_diagnosis": [], "plant_specific_notes": "", "similar_conditions": "",
+}
+
+
+def _provider_schema(schema):
+    """The ResponseSchema to send to providers, or None when structured output is off."""
+    return schema if STRUCTURED_OUTPUT else None
+
+
+def _cache_store(ck: str, value, payloads: list, plant_key: str):
+    cache_set(ck, value)
+    phash_index_add(payloads, plant_key, ck)
+
+
+async def _cached_vision(parts: list, payloads: list, plant_key: str, prefer_pro: bool, or_client,
+                         schema=None):
+    """
+    Exact-cache → near-duplicate → provider chain for one vision prompt.
+    Returns (raw_text, model_used, cache_key, near_distance); model_used is "cache" on a hit.
+    Cache reads and writes are SQLite calls, so the async passes run them in
+    worker threads rather than on the provider loop.
+    """
+    ck = make_cache_key(parts, plant_key)
+    cached = await asyncio.to_thread(cache_get, ck)
+    near_distance = None
+    if not cached:
+        near = await asyncio.to_thread(near_duplicate_lookup, payloads, plant_key)
+        if near:
+            cached, near_distance = near
+    if cached:
+        return cached[1], "cache", ck, near_distance
+    raw, model_used = await gemini_vision_async(
+        parts, prefer_pro, or_client=or_client, schema=_provider_schema(schema)
+    )
+    return raw, model_used, ck, near_distance
+
+
+async def identify_plant_async(payloads: list, prefer_pro: bool = False, or_client=None):
+    """
+    AUTO_DETECT identification pass. Returns (plant_id_result, effective_plant,
+    model_used, near_distance); effective_plant is None when the photo is not a plant.
+    """
+    id_parts = [PLANT_ID_PROMPT] + payloads
+    id_raw, model_used, id_ck, near_distance = await _cached_vision(
+        id_parts, payloads, "AUTO_DETECT", prefer_pro, or_client, PLANT_ID_SCHEMA
+    )
+    plant_id_result = PLANT_ID_SCHEMA.validate(extract_json_robust(id_raw))
+    if plant_id_result and model_used != "cache":
+        await asyncio.to_thread(_cache_store, id_ck, (plant_id_result, id_raw), payloads, "AUTO_DETECT")
+    if plant_id_result and plant_id_result.get("is_plant_image", True):
+        effective_plant = plant_id_result.get("common_name", "Unknown Plant")
+    elif plant_id_result:
+        effective_plant = None
+    else:
+        effective_plant = "Unknown Plant"
+    return plant_id_result, effective_plant, model_used, near_distance
+
+
+async def diagnose_plant_async(payloads: list, plant: str, prefer_pro: bool = False, or_client=None):
+    """
+    Disease diagnosis pass for a known plant. Returns (result, raw_response,
+    model_used, near_distance); result is None if the response is unparseable.
+    """
+    diag_parts = [diagnosis_prompt(plant)] + payloads
+    t0 = time.monotonic()
+    raw_response, model_used, ck, near_distance = await _cached_vision(
+        diag_parts, payloads, plant, prefer_pro, or_client, DIAGNOSIS_SCHEMA
+    )
+    if model_used != "cache":
+        record_ttfuc(time.monotonic() - t0, "blocking")
+    result = DIAGNOSIS_SCHEMA.validate(extract_json_robust(raw_response))
+    if result and model_used != "cache" and result.get("is_plant_image", True):
+        await asyncio.to_thread(_cache_store, ck, (result, raw_response), payloads, plant)
+    return result, raw_response, model_used, near_distance
+
+
+# ─── Single-call identify + diagnose (AUTO_DETECT) ───────────────────────────
+# One vision call returns the species and the diagnosis together, halving
+# latency and quota for AUTO_DETECT. If the species comes back with low
+# confidence the caller falls back to the two-pass path, whose dedicated
+# identification prompt and plant-specific diagnosis prompt do better there.
+SINGLE_CALL_AUTO_DETECT = os.environ.get("PLANT_DOCTOR_SINGLE_CALL", "1") == "1"
+SINGLE_CALL_MIN_ID_CONFIDENCE = int(os.environ.get("PLANT_DOCTOR_SINGLE_CALL_MIN_ID_CONFIDENCE", 70))
+_COMBINED_CACHE_KEY = "AUTO_DETECT+diagnosis"
+
+
+async def identify_and_diagnose_async(payloads: list, prefer_pro: bool = False, or_client=None):
+    """
+    AUTO_DETECT in one vision call. Returns (plant_id_result, effective_plant,
+    result, raw_response, model_used, near_distance) — effective_plant is None
+    when the photo is not a plant — or None when the response is unparseable or
+    the identification is below SINGLE_CALL_MIN_ID_CONFIDENCE, in which case the
+    caller should run identify_plant_async + diagnose_plant_async instead.
+    """
+    parts = [combined_prompt()] + payloads
+    raw, model_used, ck, near_distance = await _cached_vision(
+        parts, payloads, _COMBINED_CACHE_KEY, prefer_pro, or_client, COMBINED_SCHEMA
+    )
+    combined = COMBINED_SCHEMA.validate(extract_json_robust(raw))
+    if combined is None:
+        return None
+    if model_used != "cache":
+        # cached even when low-confidence, so a repeat photo skips straight to two-pass
+        await asyncio.to_thread(_cache_store, ck, (combined, raw), payloads, _COMBINED_CACHE_KEY)
+    plant_id_result = {k: combined[k] for k in PLANT_ID_SCHEMA.names}
+    plant = combined["common_name"]
+    if not combined["is_plant_image"]:
+        plant, result = None, dict(NOT_A_PLANT_RESULT)
+    elif (combined["identification_confidence"] < SINGLE_CALL_MIN_ID_CONFIDENCE
+            or plant.lower().startswith(("unknown", "not a plant"))):
+        return None
+    else:
+        result = DIAGNOSIS_SCHEMA.validate(dict(combined, plant_species=plant, is_correct_plant=True))
+        result = {k: result[k] for k in DIAGNOSIS_SCHEMA.names}
+    return plant_id_result, plant, result, raw, model_used, near_distance
+
+
+# ─── Streaming diagnosis + time-to-first-useful-content ──────────────────────
+# TTFUC: seconds until the farmer sees something actionable — the disease
+# name for a diagnosis, the first token for a KisanAI answer. Blocking calls
+# only get there when the whole response has arrived, so every mode is
+# recorded for comparison.
+USEFUL_FIELDS = ("disease_name",)
+
+_TTFUC: dict = {}   # { "stream" | "blocking" | "chat": deque of seconds }
+_ttfuc_lock = threading.Lock()
+
+
+def record_ttfuc(seconds: float, mode: str):
+    with _ttfuc_lock:
+        _TTFUC.setdefault(mode, collections.deque(maxlen=200)).append(seconds)
+
+
+def ttfuc_stats() -> list:
+    """[(mode, samples, p50_seconds, p90_seconds)] for provider-served answers in this process."""
+    with _ttfuc_lock:
+        snapshot = {mode: sorted(d) for mode, d in _TTFUC.items() if d}
+    return [
+        (mode, len(v), v[(len(v) - 1) // 2], v[int(0.9 * (len(v) - 1))])
+        for mode, v in sorted(snapshot.items())
+    ]
+
+
+def diagnose_plant_stream(payloads: list, plant: str, prefer_pro: bool = False, or_client=None):
+    """
+    Streamed diagnosis pass, for progressive rendering from the script thread.
+
+    Yields ("fields", {completed top-level fields}) as the response arrives,
+    ("reset", model_id) when a model fails mid-stream and the next one starts
+    over, and finally ("done", (result, raw_response, model_used, near_distance))
+    — the same tuple diagnose_plant_async returns. Cache hits go straight to "done".
+    """
+    diag_parts = [diagnosis_prompt(plant)] + payloads
+    ck = make_cache_key(diag_parts, plant)
+    cached = cache_get(ck)
+    near_distance = None
+    if not cached:
+        near = near_duplicate_lookup(payloads, plant)
+        if near:
+            cached, near_distance = near
+    if cached:
+        raw_response = cached[1]
+        yield "done", (DIAGNOSIS_SCHEMA.validate(extract_json_robust(raw_response)), raw_response,
+                       "cache", near_distance)
+        return
+
+    t0 = time.monotonic()
+    parser, chunks, model_used, first_useful = IncrementalJSONParser(), [], "unknown", None
+    stream = gemini_vision_stream_async(diag_parts, prefer_pro, or_client, _provider_schema(DIAGNOSIS_SCHEMA))
+    for model_used, piece in stream_sync(stream):
+        if piece is None:
+            parser, chunks = IncrementalJSONParser(), []
+            yield "reset", model_used
+            continue
+        chunks.append(piece)
+        new = parser.feed(piece)
+        if new:
+            if first_useful is None and any(f in new for f in USEFUL_FIELDS):
+                first_useful = time.monotonic() - t0
+                record_ttfuc(first_useful, "stream")
+            yield "fields", new
+
+    raw_response = "".join(chunks)
+    result = DIAGNOSIS_SCHEMA.validate(extract_json_robust(raw_response))
+    if result and result.get("is_plant_image", True):
+        _cache_store(ck, (result, raw_response), payloads, plant)
+    yield "done", (result, raw_response, model_used, near_distance)
+
+
+def _outcome(plant_type, plant_id, result, raw_response, model_used, near_distance) -> dict:
+    return {
+        "plant_type": plant_type, "plant_id": plant_id, "result": result,
+        "raw_response": raw_response, "model_used": model_used, "near_match_distance": near_distance,
+    }
+
+
+def _diagnosing_message(plant: str) -> str:
+    return f"🧬 Step 2: Diagnosing disease in {plant}..."
+
+
+async def _identification_stage(payloads: list, plant_type: str, prefer_pro: bool, or_client):
+    """
+    Everything before the diagnosis pass, as an async generator: ("progress",
+    message) events, then ("identified", outcome). The outcome is diagnose_async's
+    dict, without a "result" key when the diagnosis pass for its plant_type
+    still has to run.
+    """
+    if plant_type != "AUTO_DETECT":
+        yield "identified", {"plant_type": plant_type, "plant_id": None}
+        return
+
+    if SINGLE_CALL_AUTO_DETECT:
+        yield "progress", "🔍 Identifying and diagnosing in one pass..."
+        single = await identify_and_diagnose_async(payloads, prefer_pro, or_client)
+        if single is not None:
+            plant_id_result, effective_plant, result, raw_response, model_used, near_distance = single
+            yield "identified", _outcome(effective_plant or plant_type, plant_id_result, result, raw_response,
+                                         model_used, near_distance)
+            return
+        yield "progress", "🔁 Low identification confidence — running the two-pass path..."
+
+    yield "progress", "🔍 Step 1: Identifying plant species..."
+    plant_id_result, effective_plant, model_used, near_distance = await identify_plant_async(
+        payloads, prefer_pro, or_client
+    )
+    if effective_plant is None:
+        yield "identified", _outcome(plant_type, plant_id_result, dict(NOT_A_PLANT_RESULT), "",
+                                     model_used, near_distance)
+        return
+    yield "progress", (
+        f"🌿 Plant identified: {effective_plant} "
+        f"({plant_id_result.get('identification_confidence', 0) if plant_id_result else 0}% confidence) "
+        f"via {model_used}"
+    )
+    yield "identified", {"plant_type": effective_plant, "plant_id": plant_id_result}
+
+
+async def diagnose_async(payloads: list, plant_type: str = "AUTO_DETECT", prefer_pro: bool = False,
+                         or_client=None, on_progress=None) -> dict:
+    """
+    Full diagnosis of one plant from prepared ImagePayloads: identification
+    first for AUTO_DETECT, then the diagnosis pass. Returns a dict with
+    plant_type, plant_id, result (None if unparseable), raw_response,
+    model_used and near_match_distance. on_progress is called on the provider
+    loop; the script thread should use diagnose_events instead.
+    """
+    async for event, data in _identification_stage(payloads, plant_type, prefer_pro, or_client):
+        if event == "progress":
+            if on_progress:
+                on_progress(data)
+        else:
+            out = data
+    if "result" in out:
+        return out
+
+    if on_progress:
+        on_progress(_diagnosing_message(out["plant_type"]))
+    result, raw_response, model_used, near_distance = await diagnose_plant_async(
+        payloads, out["plant_type"], prefer_pro, or_client
+    )
+    return _outcome(out["plant_type"], out["plant_id"], result, raw_response, model_used, near_distance)
+
+
+def diagnose_events(payloads: list, plant_type: str = "AUTO_DETECT", prefer_pro: bool = False,
+                    or_client=None, stream: bool = False):
+    """
+    diagnose_async for the script thread, as events it can render: ("progress",
+    message) between steps; with `stream`, the diagnosis pass's ("fields", ...)
+    and ("reset", ...) events from diagnose_plant_stream; finally ("done",
+    diagnose_async's dict).
+    """
+    for event, data in stream_sync(_identification_stage(payloads, plant_type, prefer_pro, or_client)):
+        if event == "progress":
+            yield event, data
+        else:
+            out = data
+    if "result" not in out:
+        plant = out["plant_type"]
+        yield "progress", _diagnosing_message(plant)
+        if stream:
+            for event, data in diagnose_plant_stream(payloads, plant, prefer_pro, or_client):
+                if event == "done":
+                    out = _outcome(plant, out["plant_id"], *data)
+                else:
+                    yield event, data
+        else:
+            diagnosis = run_async(diagnose_plant_async(payloads, plant, prefer_pro, or_client))
+            out = _outcome(plant, out["plant_id"], *diagnosis)
+    yield "done", out
@@ -0,0 +1,226 @@
+"""Vision prompt templates and the per-plant disease hints they are filled with."""
+import functools
+import hashlib
+import re
+
+from .catalog import LiveSection, catalog_version
+
+PROMPT_VERSION = "v1"        # bump whenever a prompt template changes meaning
+
+EXPERT_PROMPT_TEMPLATE = """You are a world-class plant pathologist and image analyst with 40 years of field experience diagnosing diseases in {plant_type}.
+
+STEP 1 — IMAGE VALIDITY CHECK (do this FIRST, before any diagnosis):
+Carefully examine what is shown in the image(s).
+- If the image does NOT contain any plant, leaf, stem, root, or fruit at all (e.g. it shows a person, animal, object, sky, food on a plate, etc.):
+  → Set "is_plant_image": false, "disease_name": "Unable to diagnose", "confidence": 0, "severity": "healthy"
+- If the image contains a plant but it does NOT look like {plant_type}:
+  → Set "is_correct_plant": false, "disease_name": "Unable to diagnose — Image does not appear to be {plant_type}", "confidence": 0
+- If the image is too blurry, too dark, too distant, or otherwise unanalyzable:
+  → Set "image_quality": "Poor", "disease_name": "Unable to diagnose — Image quality too low for analysis", "confidence": 0
+- Only proceed to Step 2 if is_plant_image=true AND is_correct_plant=true AND image_quality is not "Poor"
+
+STEP 2 — DEEP DISEASE DIAGNOSIS (only if Step 1 passes):
+Analyze every visible detail with expert precision:
+• Lesion shape, color zones, margins (sharp vs. fuzzy), distribution pattern (scattered/zonal/systemic)
+• Necrosis, chlorosis, water-soaking, wilting, cankers, pustules, mold, powder, streaks
+• Insect frass, webbing, stippling, galleries, egg masses
+• Nutrient deficiency patterns (interveinal, tip, margin)
+• Compare findings against known {plant_type} disease profiles: {common_diseases}
+
+SEVERITY MUST BE DETERMINED FROM THE IMAGE VISUALLY — NOT FROM DISEASE NAME:
+- "healthy"  → No visible abnormalities, fully normal leaf/plant appearance
+- "mild"     → <20% leaf/plant area affected; small isolated spots or early lesions; plant mostly normal
+- "moderate" → 20–50% area affected; multiple lesions merging; visible wilting or discoloration across sections
+- "severe"   → >50% area affected; extensive necrosis/wilting/rot; plant structure visibly compromised
+
+ACCURACY RULES:
+1. RESPOND ONLY WITH VALID JSON — zero markdown, zero text outside the JSON
+2. If the plant looks fully healthy with no abnormalities → "disease_name": "Healthy Plant", "severity": "healthy"
+3. "Unable to diagnose" ONLY for invalid images or genuinely ambiguous cases after full analysis
+4. Confidence scale: 0-49 = ambiguous/invalid, 50-70 = probable, 71-89 = likely, 90-100 = certain
+5. Never hallucinate symptoms — only report what is actually visible in the image
+6. Severity is based on the VISIBLE DAMAGE in the image only — not on what the disease typically does
+7. If multiple diseases are equally possible, pick the most statistically common one for {plant_type} and list others in differential_diagnosis
+
+RESPOND WITH EXACTLY THIS JSON (all keys required, no extras):
+{{
+  "is_plant_image": true,
+  "is_correct_plant": true,
+  "plant_species": "{plant_type}",
+  "disease_name": "Exact disease name / Healthy Plant / Unable to diagnose",
+  "disease_type": "fungal/bacterial/viral/pest/nutrient/environmental/healthy",
+  "severity": "healthy/mild/moderate/severe — based ONLY on visible image damage percentage",
+  "confidence": 85,
+  "confidence_reason": "Exact visual evidence that drives this confidence level for {plant_type}",
+  "image_quality": "Excellent/Good/Fair/Poor — brief reason",
+  "symptoms": ["Specific visible symptom 1 with location", "Symptom 2", "Symptom 3 if present"],
+  "differential_diagnosis": [
+    "Most likely: Disease A — key matching visual features",
+    "Possible: Disease B — why considered but less likely",
+    "Ruled out: Disease C — why this does NOT match"
+  ],
+  "probable_causes": ["Primary pathogen/cause with reasoning", "Contributing environmental factor", "Secondary cause if any"],
+  "immediate_action": ["Urgent action 1 specific to {plant_type}", "Action 2", "Action 3"],
+  "organic_treatments": ["Organic product 1 with dosage/rate for {plant_type}", "Organic product 2"],
+  "chemical_treatments": ["Chemical 1 with exact dilution rate for {plant_type}", "Chemical 2 with dilution"],
+  "prevention_long_term": ["Prevention strategy 1 for {plant_type}", "Prevention strategy 2", "Resistant variety if known"],
+  "plant_specific_notes": "Critical management notes unique to {plant_type}",
+  "similar_conditions": "Other {plant_type} diseases easily confused with this diagnosis"
+}}"""
+
+PLANT_ID_PROMPT_TEMPLATE = """You are a world-class botanist and plant taxonomist with expertise in identifying plant species from images.
+
+YOUR TASK: Identify the exact plant species shown in this image with the highest possible accuracy.
+
+IDENTIFICATION RULES:
+1. Examine leaf shape, venation pattern, leaf margins, texture, color, stem structure, fruit/flower if visible
+2. RESPOND ONLY WITH VALID JSON — no markdown, no explanations
+3. If the image is not a plant at all → set "is_plant_image": false
+4. If you can identify the plant with >70% confidence → provide the common name and scientific name
+5. If you cannot identify it confidently → say "Unknown Plant" but still describe what you see
+6. Never guess blindly — partial identification is better than a wrong one
+
+RESPOND WITH EXACTLY THIS JSON:
+{
+  "is_plant_image": true,
+  "common_name": "Tomato / Unknown Plant / Not a plant",
+  "scientific_name": "Solanum lycopersicum or Unknown",
+  "plant_family": "Solanaceae or Unknown",
+  "identification_confidence": 88,
+  "identification_reason": "Key visual features that led to this identification",
+  "visible_features": ["Feature 1 used for ID", "Feature 2", "Feature 3"],
+  "possible_alternatives": ["Other plant this could be", "Second alternative"],
+  "image_quality": "Excellent/Good/Fair/Poor — reason"
+}"""
+
+
+# { plant: "Disease A, Disease B (pathogen), ..." } — the plant picker's list and
+# the diagnosis prompt hints, served from the hot-reloadable catalogue
+PLANT_COMMON_DISEASES = LiveSection("plant_common_diseases")
+
+
+# ── Single-call identify + diagnose (AUTO_DETECT) ──────────────────────────────
+# One request instead of PLANT_ID_PROMPT_TEMPLATE followed by
+# EXPERT_PROMPT_TEMPLATE. The plant is not known up front, so the per-plant
+# disease profiles go in as a compact table the model consults only for the
+# species it identifies.
+COMBINED_PROMPT_TEMPLATE = """You are a world-class botanist and plant pathologist. In ONE pass, IDENTIFY AND DIAGNOSE the plant shown in the image(s).
+
+STEP 1 — IMAGE VALIDITY + IDENTIFICATION:
+- If the image does NOT contain any plant, leaf, stem, root, or fruit at all:
+  → Set "is_plant_image": false, "common_name": "Not a plant", "identification_confidence": 0, "disease_name": "Unable to diagnose", "confidence": 0, "severity": "healthy"
+- Otherwise identify the species from leaf shape, venation, margins, texture, colour, stem, fruit/flower if visible
+- If you cannot identify it with >70% confidence → "common_name": "Unknown Plant"; never guess blindly
+- If the image is too blurry, dark or distant to analyse → "image_quality": "Poor", "disease_name": "Unable to diagnose — Image quality too low for analysis", "confidence": 0
+
+STEP 2 — DISEASE DIAGNOSIS of the plant you identified (only if Step 1 found an analysable plant):
+• Lesion shape, colour zones, margins, distribution; necrosis, chlorosis, water-soaking, wilting, mold, powder
+• Insect frass, webbing, stippling, galleries; nutrient deficiency patterns (interveinal, tip, margin)
+{disease_hints}
+SEVERITY FROM THE IMAGE ONLY: "healthy" = no abnormalities · "mild" = <20% area affected · "moderate" = 20–50% · "severe" = >50%
+
+ACCURACY RULES:
+1. RESPOND ONLY WITH VALID JSON — zero markdown, zero text outside the JSON
+2. Fully healthy plant → "disease_name": "Healthy Plant", "severity": "healthy"
+3. Confidence scale: 0-49 = ambiguous/invalid, 50-70 = probable, 71-89 = likely, 90-100 = certain
+4. Never hallucinate symptoms — only report what is actually visible
+5. If several diseases are equally possible, pick the most common one for the identified plant and list the others in differential_diagnosis
+
+RESPOND WITH EXACTLY THIS JSON (all keys required, no extras):
+{{
+  "is_plant_image": true,
+  "common_name": "Tomato / Unknown Plant / Not a plant",
+  "scientific_name": "Solanum lycopersicum or Unknown",
+  "plant_family": "Solanaceae or Unknown",
+  "identification_confidence": 88,
+  "identification_reason": "Key visual features that led to this identification",
+  "visible_features": ["Feature 1 used for ID", "Feature 2"],
+  "possible_alternatives": ["Other plant this could be"],
+  "image_quality": "Excellent/Good/Fair/Poor — brief reason",
+  "disease_name": "Exact disease name / Healthy Plant / Unable to diagnose",
+  "disease_type": "fungal/bacterial/viral/pest/nutrient/environmental/healthy",
+  "severity": "healthy/mild/moderate/severe",
+  "confidence": 85,
+  "confidence_reason": "Exact visual evidence that drives this confidence level",
+  "symptoms": ["Specific visible symptom 1 with location", "Symptom 2"],
+  "differential_diagnosis": ["Most likely: Disease A — why", "Possible: Disease B — why less likely"],
+  "probable_causes": ["Primary pathogen/cause with reasoning", "Contributing environmental factor"],
+  "immediate_action": ["Urgent action 1 for this plant", "Action 2"],
+  "organic_treatments": ["Organic product 1 with dosage/rate", "Organic product 2"],
+  "chemical_treatments": ["Chemical 1 with exact dilution rate", "Chemical 2 with dilution"],
+  "prevention_long_term": ["Prevention strategy 1", "Resistant variety if known"],
+  "plant_specific_notes": "Critical management notes unique to this plant",
+  "similar_conditions": "Other diseases of this plant easily confused with this diagnosis"
+}}"""
+
+
+def build_combined_prompt(hints_per_plant: int = 4) -> str:
+    """
+    COMBINED_PROMPT_TEMPLATE with the disease-profile table: pathogen names in
+    parentheses dropped and at most `hints_per_plant` diseases per plant, to
+    keep the table small. hints_per_plant=0 leaves the table out.
+    """
+    if hints_per_plant <= 0:
+        return COMBINED_PROMPT_TEMPLATE.format(disease_hints="")
+    lines = []
+    for plant, diseases in PLANT_COMMON_DISEASES.items():
+        names = [d.strip() for d in re.sub(r"\s*\([^)]*\)", "", diseases).split(",") if d.strip()]
+        lines.append(f"  {plant}: {', '.join(names[:hints_per_plant])}")
+    return COMBINED_PROMPT_TEMPLATE.format(disease_hints=(
+        "• If the plant you identified is listed below, compare your findings against its common diseases;\n"
+        "  for any other plant rely on general pathology:\n" + "\n".join(lines) + "\n"
+    ))
+
+
+# ── Stable prompt prefixes ─────────────────────────────────────────────────────
+# A vision request is [prompt text] + images, and the text is identical for
+# every request about the same plant. Each prompt is formatted once per
+# (plant, catalogue version) and passed on as a PromptPrefix, whose key lets
+# providers with context caching reuse the already-processed prefix instead
+# of billing it again. Template edits bump PROMPT_VERSION and need a restart.
+class PromptPrefix(str):
+    """Prompt text that leads a vision request unchanged for every image."""
+
+    def __new__(cls, text: str, name: str):
+        self = super().__new__(cls, text)
+        self.name = name
+        self.sha256 = hashlib.sha256(text.encode()).digest()
+        self.key = f"{PROMPT_VERSION}-{self.sha256.hex()[:16]}"
+        return self
+
+    @property
+    def approx_tokens(self) -> int:
+        return len(self) // 4      # ~4 characters per token for this English prose
+
+
+PLANT_ID_PROMPT = PromptPrefix(PLANT_ID_PROMPT_TEMPLATE, "plant_id")
+
+
+@functools.lru_cache(maxsize=256)
+def _diagnosis_prompt(plant: str, catalog_version: str) -> PromptPrefix:
+    common_diseases = PLANT_COMMON_DISEASES.get(plant, "various plant diseases")
+    return PromptPrefix(
+        EXPERT_PROMPT_TEMPLATE.format(plant_type=plant, common_diseases=common_diseases),
+        f"diagnosis:{plant}",
+    )
+
+
+@functools.lru_cache(maxsize=2)
+def _combined_prompt(catalog_version: str) -> PromptPrefix:
+    return PromptPrefix(build_combined_prompt(), "identify+diagnose")
+
+
+def diagnosis_prompt(plant: str) -> PromptPrefix:
+    """EXPERT_PROMPT_TEMPLATE filled in for `plant`, built once per catalogue version."""
+    return _diagnosis_prompt(plant, catalog_version())
+
+
+def combined_prompt() -> PromptPrefix:
+    """The AUTO_DETECT single-call prompt, built once per catalogue version."""
+    return _combined_prompt(catalog_version())
+
+
+def prompt_memo_stats() -> tuple:
+    """(hits, builds) of the formatted-prompt memo in this process."""
+    infos = [_diagnosis_prompt.cache_info(), _combined_prompt.cache_info()]
+    return sum(i.hits for i in infos), sum(i.misses for i in infos)
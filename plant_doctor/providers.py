@@ -0,0 +1,870 @@
+"""
+Provider fallback chains for vision and text calls (Gemini, Groq, OpenRouter).
+
+All provider I/O runs as coroutines on one background event loop per process,
+so back-off is asyncio.sleep (never blocks the Streamlit script thread) and a
+losing or abandoned call is genuinely cancelled. The sync functions are thin
+facades that submit to that loop.
+
+Provider SDKs (google.generativeai, groq, openai) are imported the first time
+their provider is actually used, so a cold start never pays for an SDK whose
+key is missing or whose provider this process never calls.
+"""
+import asyncio
+import collections
+import datetime
+import functools
+import os
+import sys
+import threading
+import time
+
+from .config import (
+    GROQ_TEXT_MODELS,
+    OPENROUTER_TEXT_MODEL,
+    OPENROUTER_VISION_MODEL,
+    VISION_MODEL_CHAIN,
+)
+from .imaging import ImagePayload
+from .parsing import extract_json_robust
+from .prompts import PromptPrefix
+from .quota import (
+    ModelUnavailable,
+    acquire_slot,
+    breaker_check,
+    breaker_trip,
+    is_quota_err,
+    is_transient_err,
+    ledger_record,
+)
+from .startup import import_sdk
+
+
+# ─── Optional clients (won't crash if keys missing) ────────────────────────
+def get_secret(name: str) -> str:
+    """
+    Bulletproof secret reader — works on Streamlit Cloud AND local dev.
+    Strategy:
+      1. st.secrets[name]         — direct key lookup (most reliable on Cloud)
+      2. st.secrets.get(name, "") — fallback for older Streamlit
+      3. os.environ.get(name, "") — local .env / shell exports
+    """
+    st = sys.modules.get("streamlit")   # only consult st.secrets inside the app
+    # Method 1: direct bracket access (handles [section] nesting too)
+    try:
+        if st is not None and hasattr(st, "secrets") and name in st.secrets:
+            val = st.secrets[name]
+            if val:
+                return str(val).strip()
+    except Exception:
+        pass
+    # Method 2: .get() method
+    try:
+        if st is not None and hasattr(st, "secrets"):
+            val = st.secrets.get(name, "")
+            if val:
+                return str(val).strip()
+    except Exception:
+        pass
+    # Method 3: environment variable
+    val = os.environ.get(name, "")
+    return val.strip() if val else ""
+
+
+@functools.lru_cache(maxsize=None)
+def get_groq_client():
+    """Return an authenticated Groq client, or None if unavailable."""
+    key = get_secret("GROQ_API_KEY")
+    if not key:
+        return None
+    try:
+        return import_sdk("groq").Groq(api_key=key)
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_openrouter_client():
+    """Return an authenticated OpenRouter client, or None if unavailable."""
+    key = get_secret("OPENROUTER_API_KEY")
+    if not key:
+        return None
+    try:
+        return import_sdk("openai").OpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=key,
+        )
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_async_groq_client():
+    """Async Groq client for the provider event loop, or None if unavailable."""
+    key = get_secret("GROQ_API_KEY")
+    if not key:
+        return None
+    try:
+        return import_sdk("groq").AsyncGroq(api_key=key)
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_async_openrouter_client():
+    """Async OpenRouter client for the provider event loop, or None if unavailable."""
+    key = get_secret("OPENROUTER_API_KEY")
+    if not key:
+        return None
+    try:
+        return import_sdk("openai").AsyncOpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=key,
+        )
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def configure_gemini() -> bool:
+    """Configure the Gemini SDK from GEMINI_API_KEY once per process; False if the key is missing."""
+    key = get_secret("GEMINI_API_KEY")
+    if not key:
+        return False
+    import_sdk("google.generativeai").configure(api_key=key)
+    return True
+
+
+def _gemini_sdk():
+    """The configured Gemini SDK. The first import takes hundreds of ms: coroutines call this via asyncio.to_thread."""
+    configure_gemini()
+    return import_sdk("google.generativeai")
+
+
+@functools.lru_cache(maxsize=None)
+def _get_provider_loop():
+    """Background event loop shared by every session in this process."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="provider-loop", daemon=True).start()
+    return loop
+
+
+def run_async(coro, timeout: float = None):
+    """Run a coroutine on the provider loop and block this thread for its result."""
+    fut = asyncio.run_coroutine_threadsafe(coro, _get_provider_loop())
+    try:
+        return fut.result(timeout)
+    except BaseException:
+        fut.cancel()       # script rerun / stop → cancel the in-flight provider call
+        raise
+
+
+def run_parallel(*coros, timeout: float = None) -> list:
+    """
+    Await independent provider coroutines concurrently on the provider loop
+    (e.g. a rotation plan and a report translation) and block this thread for
+    their results, in order; a coroutine that failed gives its exception.
+    """
+    async def _gather():
+        return await asyncio.gather(*coros, return_exceptions=True)
+    return run_async(_gather(), timeout)
+
+
+# ─── Structured output ───────────────────────────────────────────────────────
+# Vision calls can carry a ResponseSchema (schema.py); providers that support
+# it then return bare JSON of that shape. A model that rejects the schema is
+# remembered for the process and asked again without it. property_ordering is
+# newer than the rest of the schema: an SDK or API version that doesn't know it
+# only loses the ordering, and the refused request is re-sent at once (it never
+# ran, so it takes no new rate-limit token or ledger count).
+_SCHEMA_REJECTED: set = set()
+_SCHEMA_ERR_HINTS = ("response_schema", "responseschema", "response_format", "json_schema",
+                     "response_mime_type", "structured output")
+_ORDERING_REJECTED: set = set()
+_ORDERING_ERR_HINTS = ("property_ordering", "propertyordering")
+
+
+def _use_schema(model_id: str, schema) -> bool:
+    return schema is not None and model_id not in _SCHEMA_REJECTED
+
+
+def _schema_rejected(model_id: str, err) -> bool:
+    """True (and remembered) if `err` is the provider refusing the output schema."""
+    msg = str(err).lower()
+    if any(h in msg for h in _SCHEMA_ERR_HINTS):
+        _SCHEMA_REJECTED.add(model_id)
+        return True
+    return False
+
+
+@functools.lru_cache(maxsize=None)
+def _sdk_knows_property_ordering() -> bool:
+    """False if the installed Gemini SDK's Schema message has no property_ordering field."""
+    try:
+        return "property_ordering" in import_sdk("google.generativeai").protos.Schema.meta.fields
+    except AttributeError:
+        return True                 # no protos to inspect: send it and let a refusal decide
+
+
+def _gemini_call_kwargs(model_id: str, schema=None, timeout: float = None) -> dict:
+    kwargs = {"request_options": {"timeout": timeout}} if timeout else {}
+    if _use_schema(model_id, schema):
+        response_schema = schema.gemini_schema
+        if model_id in _ORDERING_REJECTED or not _sdk_knows_property_ordering():
+            response_schema = {k: v for k, v in response_schema.items() if k != "property_ordering"}
+        kwargs["generation_config"] = {
+            "response_mime_type": "application/json",
+            "response_schema": response_schema,
+        }
+    return kwargs
+
+
+def _ordering_rejected(model_id: str, kwargs: dict, err) -> bool:
+    """
+    True if `err` is a refusal of property_ordering alone; the model is
+    remembered and the key is dropped from `kwargs` so the call can be re-sent.
+    """
+    response_schema = kwargs.get("generation_config", {}).get("response_schema", {})
+    if "property_ordering" not in response_schema or not any(h in str(err).lower() for h in _ORDERING_ERR_HINTS):
+        return False
+    _ORDERING_REJECTED.add(model_id)
+    kwargs["generation_config"] = dict(
+        kwargs["generation_config"],
+        response_schema={k: v for k, v in response_schema.items() if k != "property_ordering"},
+    )
+    return True
+
+
+# ─── Prompt-prefix context caching ───────────────────────────────────────────
+# Vision requests lead with a PromptPrefix (prompts.py) that is identical for
+# every image of the same plant. For Gemini models that support explicit
+# context caching the prefix is uploaded once per (model, prefix) and later
+# requests send only the images; other models get it inline, where Gemini's
+# implicit caching and OpenRouter's prompt caching can still match it. Token
+# counts reported by every provider response are kept per model, so the
+# saving is visible whichever mechanism produced it. A model is only switched
+# to inline prefixes when creating a cache is refused; a call that finds its
+# cache gone (expired, deleted, not ours) drops it and re-creates it next time.
+CONTEXT_CACHE = os.environ.get("PLANT_DOCTOR_CONTEXT_CACHE", "1") == "1"
+CONTEXT_CACHE_TTL_SECONDS = int(os.environ.get("PLANT_DOCTOR_CONTEXT_CACHE_TTL", 3600))
+CONTEXT_CACHE_MIN_TOKENS = int(os.environ.get("PLANT_DOCTOR_CONTEXT_CACHE_MIN_TOKENS", 1024))
+_CONTEXT_CACHE_RENEW_SECONDS = 60     # re-create a cache this close to expiry rather than race it
+
+_CONTEXT_CACHES: dict = {}            # { (model_id, prefix.key): (CachedContent, expires_at) }
+_CONTEXT_CACHE_REJECTED: set = set()  # models that refused caching; prefix sent inline
+_context_cache_locks: dict = {}       # one asyncio.Lock per key, so a prefix is uploaded once
+_CACHE_GONE_ERRORS = ("NotFound", "PermissionDenied")   # google.api_core exception names
+
+
+async def _context_cache_for(model_id: str, prefix):
+    """The provider-side cache holding `prefix` for `model_id`, or None to send it inline."""
+    if (not CONTEXT_CACHE or not isinstance(prefix, PromptPrefix) or model_id in _CONTEXT_CACHE_REJECTED
+            or prefix.approx_tokens < CONTEXT_CACHE_MIN_TOKENS):
+        return None
+    key = (model_id, prefix.key)
+    lock = _context_cache_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        entry = _CONTEXT_CACHES.get(key)
+        if entry is not None and entry[1] - time.time() > _CONTEXT_CACHE_RENEW_SECONDS:
+            return entry[0]
+        caching = await asyncio.to_thread(import_sdk, "google.generativeai.caching")
+        try:
+            cached = await asyncio.to_thread(
+                caching.CachedContent.create,
+                model=model_id,
+                display_name=f"plant-doctor {prefix.name}"[:128],
+                contents=[str(prefix)],
+                ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL_SECONDS),
+            )
+        except Exception as e:
+            if not is_quota_err(e) and not is_transient_err(e):
+                _CONTEXT_CACHE_REJECTED.add(model_id)   # unsupported model / tier / size
+            _CONTEXT_CACHES.pop(key, None)
+            return None
+        _CONTEXT_CACHES[key] = (cached, time.time() + CONTEXT_CACHE_TTL_SECONDS)
+        return cached
+
+
+def _context_cache_failed(model_id: str, prefix, err) -> bool:
+    """
+    True (and the cache dropped, so the call is re-sent inline) if `err` says
+    the call's cached content no longer exists or isn't readable: a NotFound /
+    PermissionDenied about cached content, or "CachedContent not found".
+    """
+    msg = str(err).lower()
+    if is_quota_err(err) or "cachedcontent" not in msg.replace("_", "").replace(" ", ""):
+        return False
+    if type(err).__name__ not in _CACHE_GONE_ERRORS and not msg.startswith(("403", "404")) and "not found" not in msg:
+        return False
+    _CONTEXT_CACHES.pop((model_id, getattr(prefix, "key", None)), None)
+    return True
+
+
+async def _gemini_model(genai, model_id: str, parts: list, use_context_cache: bool = True):
+    """(GenerativeModel, contents, cached) for one call; a cached prefix is left out of contents."""
+    cached = await _context_cache_for(model_id, parts[0]) if use_context_cache and parts else None
+    if cached is not None:
+        model, parts = genai.GenerativeModel.from_cached_content(cached_content=cached), parts[1:]
+    else:
+        model = genai.GenerativeModel(model_id)
+    contents = [p.as_gemini_part() if isinstance(p, ImagePayload) else p for p in parts]
+    return model, contents, cached is not None
+
+
+_PROMPT_USAGE: dict = {}   # { model_id: deque of (input_tokens, cached_input_tokens) per request }
+_usage_lock = threading.Lock()
+
+
+def _record_usage(model_id: str, usage):
+    """Input-token counts from a Gemini usage_metadata or an OpenAI-style usage object."""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_token_count", None)
+    if prompt is not None:
+        cached = getattr(usage, "cached_content_token_count", 0)
+    else:
+        prompt = getattr(usage, "prompt_tokens", None)
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0)
+    if not prompt:
+        return
+    with _usage_lock:
+        _PROMPT_USAGE.setdefault(model_id, collections.deque(maxlen=200)).append((prompt, cached or 0))
+
+
+def recent_prompt_usage(model_id: str, n: int = 1) -> list:
+    """The last n requests to `model_id` as [(input_tokens, cached_input_tokens)], oldest first."""
+    with _usage_lock:
+        return list(_PROMPT_USAGE.get(model_id, ()))[-n:]
+
+
+def prompt_cache_stats() -> list:
+    """[(model, requests, avg_input_tokens, avg_cached_tokens, saved_fraction)] in this process."""
+    with _usage_lock:
+        snapshot = {m: list(d) for m, d in _PROMPT_USAGE.items() if d}
+    out = []
+    for model_id, rows in sorted(snapshot.items()):
+        total, cached = sum(r[0] for r in rows), sum(r[1] for r in rows)
+        out.append((model_id, len(rows), total / len(rows), cached / len(rows), cached / total if total else 0.0))
+    return out
+
+
+async def retry_generate_async(model_id: str, parts: list, max_retries: int = 3,
+                                timeout: float = None, schema=None, use_context_cache: bool = True):
+    """Single Gemini model call with non-blocking exponential back-off."""
+    await asyncio.to_thread(breaker_check, model_id)
+    genai = await asyncio.to_thread(_gemini_sdk)
+    kwargs = _gemini_call_kwargs(model_id, schema, timeout)
+    last_err = None
+    for attempt in range(max_retries):
+        await acquire_slot(model_id)
+        cached = False
+        try:
+            await asyncio.to_thread(ledger_record, model_id)
+            m, contents, cached = await _gemini_model(genai, model_id, parts, use_context_cache)
+            try:
+                resp = await m.generate_content_async(contents, **kwargs)
+            except Exception as e:
+                if not _ordering_rejected(model_id, kwargs, e):
+                    raise
+                resp = await m.generate_content_async(contents, **kwargs)
+            _record_usage(model_id, getattr(resp, "usage_metadata", None))
+            text = getattr(resp, "text", "") or ""
+            if text.strip():
+                return text
+            raise ValueError("Empty response from model")
+        except Exception as e:
+            last_err = e
+            if cached and _context_cache_failed(model_id, parts[0], e):
+                return await retry_generate_async(model_id, parts, max_retries, timeout, schema, False)
+            if "generation_config" in kwargs and _schema_rejected(model_id, e):
+                return await retry_generate_async(model_id, parts, max_retries, timeout,
+                                                  use_context_cache=use_context_cache)
+            if is_quota_err(e):
+                await asyncio.to_thread(breaker_trip, model_id, e)  # skip this model, no back-off wait
+                break
+            if is_transient_err(e) and attempt < max_retries - 1:
+                await asyncio.sleep(2 ** attempt)   # 1s → 2s → 4s
+                continue
+            break
+    raise last_err
+
+
+# ─── Hedged vision mode (bounded tail latency) ─────────────────────────────
+# The primary model starts alone; if it hasn't answered by its own p90 latency
+# the next model in the chain is fired alongside it. First parseable JSON wins.
+
+HEDGED_VISION = os.environ.get("PLANT_DOCTOR_HEDGED_VISION", "1") == "1"
+VISION_DEADLINE_SECONDS = float(os.environ.get("PLANT_DOCTOR_VISION_DEADLINE", 45))
+_HEDGE_PERCENTILE = 0.90
+_HEDGE_DEFAULT_DELAY = 8.0   # seconds, until a model has enough latency samples
+_HEDGE_MIN_SAMPLES = 5
+
+_MODEL_LATENCIES: dict = {}  # { model_id: deque of recent successful call durations }
+_latency_lock = threading.Lock()
+
+
+def _record_latency(model_id: str, seconds: float):
+    with _latency_lock:
+        _MODEL_LATENCIES.setdefault(model_id, collections.deque(maxlen=50)).append(seconds)
+
+
+def _hedge_delay(model_id: str) -> float:
+    with _latency_lock:
+        samples = sorted(_MODEL_LATENCIES.get(model_id, ()))
+    if len(samples) < _HEDGE_MIN_SAMPLES:
+        return _HEDGE_DEFAULT_DELAY
+    return samples[int(_HEDGE_PERCENTILE * (len(samples) - 1))]
+
+
+def _openrouter_image_parts(parts: list) -> list:
+    """Chat-completions content list; images are sent inline as base64 data URLs."""
+    import base64 as _b64, io as _io
+    content_parts = []
+    for part in parts:
+        if isinstance(part, str):
+            content_parts.append({"type": "text", "text": part})
+        elif isinstance(part, ImagePayload):
+            content_parts.append({"type": "image_url", "image_url": {"url": part.as_data_url()}})
+        else:
+            buf = _io.BytesIO()
+            part.save(buf, format="PNG")
+            b64 = _b64.b64encode(buf.getvalue()).decode()
+            content_parts.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:image/png;base64,{b64}"}
+            })
+    return content_parts
+
+
+async def _async_openrouter_vision(client, parts: list, timeout: float = 30, schema=None):
+    """Qwen2.5-VL via OpenRouter."""
+    await acquire_slot(OPENROUTER_VISION_MODEL)
+    extra = {"response_format": schema.openai_response_format} if _use_schema(OPENROUTER_VISION_MODEL, schema) else {}
+    try:
+        resp = await client.chat.completions.create(
+            model=OPENROUTER_VISION_MODEL,
+            messages=[{"role": "user", "content": _openrouter_image_parts(parts)}],
+            max_tokens=3000,
+            timeout=timeout,
+            **extra,
+        )
+    except Exception as e:
+        if extra and _schema_rejected(OPENROUTER_VISION_MODEL, e):
+            return await _async_openrouter_vision(client, parts, timeout)
+        raise
+    _record_usage(OPENROUTER_VISION_MODEL, getattr(resp, "usage", None))
+    text = resp.choices[0].message.content or ""
+    if not text.strip():
+        raise ValueError("Empty response from model")
+    return text
+
+
+async def _vision_attempt(model_id: str, parts: list, timeout: float, or_client=None, schema=None):
+    """One un-retried call to a single vision model, timed for the hedge percentile."""
+    t0 = time.monotonic()
+    if model_id == OPENROUTER_VISION_MODEL:
+        text = await _async_openrouter_vision(or_client, parts, timeout=timeout, schema=schema)
+    else:
+        text = await retry_generate_async(model_id, parts, max_retries=1, timeout=timeout, schema=schema)
+    _record_latency(model_id, time.monotonic() - t0)
+    return text
+
+
+def _vision_capacity_error(last_err):
+    return RuntimeError(
+        "⏳ All vision models are temporarily at capacity. "
+        "Please wait ~60 seconds and try again. "
+        f"(Last error: {str(last_err)[:100]})"
+    )
+
+
+async def _gemini_vision_hedged(parts: list, chain: list, deadline: float, or_client=None, schema=None):
+    """Race the vision chain with hedging; losers are cancelled once a winner is found."""
+
+    candidates = list(chain) + ([OPENROUTER_VISION_MODEL] if or_client else [])
+    end = time.monotonic() + deadline
+    pending = {}
+    next_idx = 0
+    last_err = None
+
+    def _launch():
+        nonlocal next_idx
+        model_id = candidates[next_idx]
+        next_idx += 1
+        remaining = max(end - time.monotonic(), 1.0)
+        task = asyncio.ensure_future(_vision_attempt(model_id, parts, remaining, or_client, schema))
+        pending[task] = model_id
+
+    try:
+        _launch()
+        while pending:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                last_err = TimeoutError(f"vision deadline of {deadline:.0f}s exceeded")
+                break
+            can_hedge = next_idx < len(candidates)
+            newest = candidates[next_idx - 1]
+            timeout = min(_hedge_delay(newest), remaining) if can_hedge else remaining
+            done, _ = await asyncio.wait(pending, timeout=timeout,
+                                          return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if can_hedge:
+                    _launch()           # primary is slow → fire the hedge
+                continue
+            for task in done:
+                model_id = pending.pop(task)
+                try:
+                    text = task.result()
+                except Exception as e:
+                    last_err = e
+                    continue
+                if extract_json_robust(text) is not None:
+                    return text, model_id
+                last_err = ValueError(f"{model_id} returned no parseable JSON")
+            if not pending and next_idx < len(candidates):
+                _launch()               # everything in flight failed → next model now
+    finally:
+        for task in pending:
+            task.cancel()
+
+    raise _vision_capacity_error(last_err)
+
+
+async def gemini_vision_async(parts: list, prefer_pro: bool = False, hedged: bool = None,
+                              deadline: float = None, or_client=None, schema=None):
+    """
+    Ultra-stable vision call:
+      1. Gemini 2.5 Flash  (primary, best quality)
+      2. Gemini 1.5 Flash  (fallback, higher quota)
+      3. Gemini 1.5 Flash-8B (last-resort Gemini)
+      4. OpenRouter Qwen2.5-VL (free, no key required beyond OR key)
+    Hedged mode (default) races the chain under a per-request deadline; the
+    sequential mode gives each model up to 3 auto-retries with back-off.
+    With a ResponseSchema, providers that support it are constrained to return
+    bare JSON of that shape.
+    """
+    chain = VISION_MODEL_CHAIN.copy()
+    if prefer_pro:
+        chain = ["gemini-2.5-pro"] + chain
+
+    if HEDGED_VISION if hedged is None else hedged:
+        return await _gemini_vision_hedged(
+            parts, chain, VISION_DEADLINE_SECONDS if deadline is None else deadline, or_client, schema
+        )
+
+    last_err = None
+    for model_id in chain:
+        try:
+            text = await retry_generate_async(model_id, parts, max_retries=3, schema=schema)
+            return text, model_id
+        except Exception as e:
+            last_err = e          # quota or hard error → try next model immediately
+            continue
+
+    # All Gemini models exhausted → OpenRouter Qwen vision (if enabled in sidebar)
+    if or_client:
+        try:
+            return await _async_openrouter_vision(or_client, parts, schema=schema), OPENROUTER_VISION_MODEL
+        except Exception as or_err:
+            last_err = or_err
+
+    raise _vision_capacity_error(last_err)
+
+
+async def gemini_text_async(prompt: str, groq_client=None, or_client=None):
+    """Awaitable text chain; see gemini_text_with_fallback for the provider order."""
+    # 1. Groq — fastest + highest free quota
+    if groq_client:
+        for gm in GROQ_TEXT_MODELS:
+            try:
+                await asyncio.to_thread(breaker_check, gm)
+            except ModelUnavailable:
+                continue
+            for attempt in range(3):
+                try:
+                    await acquire_slot(gm)
+                except ModelUnavailable:
+                    break
+                try:
+                    await asyncio.to_thread(ledger_record, gm)
+                    resp = await groq_client.chat.completions.create(
+                        model=gm,
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=2048,
+                        temperature=0.3,
+                        timeout=20,
+                    )
+                    text = (resp.choices[0].message.content or "").strip()
+                    if text:
+                        return text, f"Groq/{gm}"
+                except Exception as e:
+                    if is_quota_err(e):
+                        await asyncio.to_thread(breaker_trip, gm, e)
+                    elif is_transient_err(e) and attempt < 2:
+                        await asyncio.sleep(2 ** attempt)
+                        continue
+                    break
+
+    # 2. OpenRouter text
+    if or_client:
+        for attempt in range(2):
+            try:
+                await acquire_slot(OPENROUTER_TEXT_MODEL)
+            except ModelUnavailable:
+                break
+            try:
+                resp = await or_client.chat.completions.create(
+                    model=OPENROUTER_TEXT_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=2048,
+                    timeout=25,
+                )
+                text = (resp.choices[0].message.content or "").strip()
+                if text:
+                    return text, "OpenRouter/Llama-70B"
+            except Exception as e:
+                if is_quota_err(e) and attempt < 1:
+                    await asyncio.sleep(2)
+                    continue
+                break
+
+    # 3. Gemini text fallback chain
+    for model_id in ["gemini-2.5-flash", "gemini-1.5-flash", "gemini-1.5-flash-8b"]:
+        try:
+            text = await retry_generate_async(model_id, [prompt], max_retries=3)
+            return text, model_id
+        except Exception:
+            continue
+
+    raise RuntimeError(
+        "⏳ All text models are temporarily at capacity. Please wait a moment and try again."
+    )
+
+
+def _text_clients():
+    # Re-resolve clients each call (handles post-boot secret loading)
+    return (
+        get_async_groq_client(),
+        get_async_openrouter_client(),
+    )
+
+
+def gemini_text_with_fallback(prompt: str):
+    """
+    Ultra-stable text call:
+      1. Groq Llama-3.1-8B  (14,400 free RPD — fastest)
+      2. Groq Llama-3.3-70B (1,000  free RPD — best quality)
+      3. OpenRouter Llama-70B (free tier)
+      4. Gemini 2.5 Flash → 1.5 Flash → 1.5 Flash-8B
+    Each provider gets auto-retries with back-off.
+    """
+    groq_client, or_client = _text_clients()
+    return run_async(gemini_text_async(prompt, groq_client, or_client))
+
+
+# ─── Streaming (progressive rendering) ───────────────────────────────────────
+# Async generators of text chunks, consumed from the script thread through
+# stream_sync(). A vision fallback after output has started yields None so the
+# consumer can discard the failed model's partial text and start over.
+
+async def _gemini_stream(model_id: str, parts: list, timeout: float = None, schema=None,
+                         use_context_cache: bool = True):
+    await asyncio.to_thread(breaker_check, model_id)
+    genai = await asyncio.to_thread(_gemini_sdk)
+    await acquire_slot(model_id)
+    await asyncio.to_thread(ledger_record, model_id)
+    kwargs = _gemini_call_kwargs(model_id, schema, timeout)
+    started = cached = False
+    try:
+        model, contents, cached = await _gemini_model(genai, model_id, parts, use_context_cache)
+        try:
+            resp = await model.generate_content_async(contents, stream=True, **kwargs)
+        except Exception as e:
+            if not _ordering_rejected(model_id, kwargs, e):
+                raise
+            resp = await model.generate_content_async(contents, stream=True, **kwargs)
+        async for chunk in resp:
+            try:
+                text = chunk.text
+            except ValueError:      # safety-filtered or empty candidate
+                continue
+            if text:
+                started = True
+                yield text
+        _record_usage(model_id, getattr(resp, "usage_metadata", None))
+    except Exception as e:
+        if is_quota_err(e):
+            await asyncio.to_thread(breaker_trip, model_id, e)
+        if started:
+            raise
+        if cached and _context_cache_failed(model_id, parts[0], e):
+            use_context_cache = False
+        elif _ordering_rejected(model_id, kwargs, e):
+            pass                    # refused on the first chunk: retried below without the ordering
+        elif "generation_config" in kwargs and _schema_rejected(model_id, e):
+            schema = None
+        else:
+            raise
+    else:
+        return
+    async for text in _gemini_stream(model_id, parts, timeout, schema, use_context_cache):
+        yield text                  # retried without the refused cache / schema
+
+
+async def _openai_compatible_stream(client, model: str, content, max_tokens: int, timeout: float,
+                                    **kwargs):
+    """Groq and OpenRouter share the OpenAI chat-completions streaming shape."""
+    await acquire_slot(model)
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": content}],
+        max_tokens=max_tokens,
+        timeout=timeout,
+        stream=True,
+        **kwargs,
+    )
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+
+async def _openrouter_vision_stream(client, parts: list, schema=None):
+    extra = {"response_format": schema.openai_response_format} if _use_schema(OPENROUTER_VISION_MODEL, schema) else {}
+    started = False
+    try:
+        async for piece in _openai_compatible_stream(
+            client, OPENROUTER_VISION_MODEL, _openrouter_image_parts(parts), 3000, 30, **extra
+        ):
+            started = True
+            yield piece
+    except Exception as e:
+        if started or not extra or not _schema_rejected(OPENROUTER_VISION_MODEL, e):
+            raise
+    else:
+        return
+    async for piece in _openrouter_vision_stream(client, parts):
+        yield piece
+
+
+async def gemini_vision_stream_async(parts: list, prefer_pro: bool = False, or_client=None, schema=None):
+    """
+    Streamed vision chain (same order as the sequential mode). Yields
+    (model_id, chunk); chunk is None when a model failed mid-stream and the
+    next one starts from scratch.
+    """
+    chain = VISION_MODEL_CHAIN.copy()
+    if prefer_pro:
+        chain = ["gemini-2.5-pro"] + chain
+    attempts = [(m, functools.partial(_gemini_stream, m, parts, None, schema)) for m in chain]
+    if or_client:
+        attempts.append((OPENROUTER_VISION_MODEL, functools.partial(
+            _openrouter_vision_stream, or_client, parts, schema,
+        )))
+
+    last_err = None
+    for model_id, start in attempts:
+        started = False
+        try:
+            async for piece in start():
+                started = True
+                yield model_id, piece
+            if started:
+                return
+            last_err = ValueError("Empty response from model")
+        except Exception as e:
+            last_err = e
+            if started:
+                yield model_id, None
+    raise _vision_capacity_error(last_err)
+
+
+def stream_sync(agen, timeout: float = None):
+    """Iterate an async generator on the provider loop from a sync (script) thread."""
+    import queue as _queue
+
+    items = _queue.Queue()
+    end = object()
+
+    async def _pump():
+        try:
+            async for item in agen:
+                items.put((True, item))
+            items.put((True, end))
+        except Exception as e:
+            items.put((False, e))
+
+    fut = asyncio.run_coroutine_threadsafe(_pump(), _get_provider_loop())
+    try:
+        while True:
+            ok, item = items.get(timeout=timeout)
+            if not ok:
+                raise item
+            if item is end:
+                return
+            yield item
+    finally:
+        fut.cancel()       # consumer stopped early (rerun / stop) → cancel the stream
+
+
+def _continuation_prompt(prompt: str, partial: str) -> str:
+    return (
+        f"{prompt}\n\n"
+        "Your answer so far is below. Continue it from exactly where it stops — "
+        "do not repeat or restate any of it.\n\n"
+        f"{partial}"
+    )
+
+
+async def gemini_text_stream_async(prompt: str, groq_client=None, or_client=None):
+    """
+    Streamed text chain in gemini_text_with_fallback's provider order. Yields
+    (provider_label, chunk). If a provider fails mid-answer, the next one is
+    asked to continue the partial answer rather than start again, so the
+    reader never sees text disappear.
+    """
+    attempts = []
+    if groq_client:
+        for gm in GROQ_TEXT_MODELS:
+            attempts.append((f"Groq/{gm}", gm, functools.partial(
+                _openai_compatible_stream, groq_client, gm, max_tokens=2048, timeout=20, temperature=0.3,
+            )))
+    if or_client:
+        attempts.append(("OpenRouter/Llama-70B", OPENROUTER_TEXT_MODEL, functools.partial(
+            _openai_compatible_stream, or_client, OPENROUTER_TEXT_MODEL, max_tokens=2048, timeout=25,
+        )))
+    for model_id in ["gemini-2.5-flash", "gemini-1.5-flash", "gemini-1.5-flash-8b"]:
+        attempts.append((model_id, model_id, lambda content, m=model_id: _gemini_stream(m, [content])))
+
+    partial = ""
+    for label, model_id, start in attempts:
+        try:
+            if not model_id.startswith("gemini"):
+                await asyncio.to_thread(breaker_check, model_id)  # Gemini streams check their own breaker
+                await asyncio.to_thread(ledger_record, model_id)
+            content = _continuation_prompt(prompt, partial) if partial else prompt
+            async for piece in start(content):
+                if not partial:
+                    piece = piece.lstrip()
+                    if not piece:
+                        continue
+                partial += piece
+                yield label, piece
+            if partial.strip():
+                return
+        except ModelUnavailable:
+            continue                            # breaker already open / budget spent: keep its cooldown
+        except Exception as e:
+            if is_quota_err(e) and not model_id.startswith("gemini"):
+                await asyncio.to_thread(breaker_trip, model_id, e)
+            continue
+
+    raise RuntimeError(
+        "⏳ All text models are temporarily at capacity. Please wait a moment and try again."
+    )
+
+
+def gemini_text_stream(prompt: str):
+    """Sync iterator of (provider_label, chunk) over the streamed text chain."""
+    groq_client, or_client = _text_clients()
+    return stream_sync(gemini_text_stream_async(prompt, groq_client, or_client))
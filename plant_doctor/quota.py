@@ -0,0 +1,276 @@
+"""
+Provider budget enforcement, shared by every session and worker:
+
+* a quota ledger + circuit breaker so exhausted models are skipped instantly;
+* token buckets so requests queue (or reroute) before they would hit a 429.
+"""
+import collections
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from .config import OPENROUTER_TEXT_MODEL, OPENROUTER_VISION_MODEL
+from .store import connection
+
+
+def is_quota_err(e):
+    s = str(e).lower()
+    return any(x in s for x in ["429", "quota", "rate limit", "resource_exhausted",
+                                  "too many", "overloaded", "capacity"])
+
+
+def is_transient_err(e):
+    return any(x in str(e).lower() for x in
+               ["500", "503", "internal", "unavailable", "timeout",
+                "deadline", "empty", "connection"])
+
+
+# ─── Quota ledger + circuit breaker ──────────────────────────────────────────
+# Requests are counted per model per quota day in the cache DB, so the count
+# survives restarts and is shared by every worker. A quota error opens the
+# model's breaker: until it resets the model is skipped with zero wait.
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo("America/Los_Angeles")   # Google/Groq daily quotas reset at PT midnight
+except Exception:
+    _QUOTA_TZ = None
+
+MODEL_DAILY_LIMITS = {
+    "gemini-2.5-pro":          100,
+    "gemini-2.5-flash":        250,
+    "gemini-1.5-flash":        1500,
+    "gemini-1.5-flash-8b":     1500,
+    "llama-3.1-8b-instant":    14400,
+    "llama-3.3-70b-versatile": 1000,
+}
+_BREAKER_DEFAULT_COOLDOWN = 60     # seconds, for per-minute 429s without a retry hint
+
+
+class ModelUnavailable(RuntimeError):
+    """Raised instead of calling a model whose breaker is open or budget is spent."""
+
+
+def _quota_now():
+    return datetime.now(_QUOTA_TZ) if _QUOTA_TZ else datetime.now()
+
+
+def _quota_day() -> str:
+    return _quota_now().strftime("%Y-%m-%d")
+
+
+def _next_quota_reset() -> float:
+    now = _quota_now()
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.timestamp()
+
+
+def _quota_tables(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS quota_ledger ("
+        " model TEXT NOT NULL, day TEXT NOT NULL, requests INTEGER NOT NULL,"
+        " PRIMARY KEY (model, day))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS circuit_breakers ("
+        " model TEXT PRIMARY KEY, open_until REAL NOT NULL, reason TEXT)"
+    )
+
+
+def _quota_used(conn, model_id: str) -> int:
+    row = conn.execute(
+        "SELECT requests FROM quota_ledger WHERE model = ? AND day = ?", (model_id, _quota_day())
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def ledger_record(model_id: str):
+    conn = connection()
+    if conn is None:
+        return
+    try:
+        _quota_tables(conn)
+        conn.execute(
+            "INSERT INTO quota_ledger (model, day, requests) VALUES (?, ?, 1)"
+            " ON CONFLICT(model, day) DO UPDATE SET requests = requests + 1",
+            (model_id, _quota_day()),
+        )
+    except Exception:
+        pass
+
+
+def breaker_trip(model_id: str, err):
+    """Open the breaker until the provider's hinted retry time, or the daily reset."""
+    s = str(err).lower()
+    if "per day" in s or "perday" in s or "daily" in s:
+        open_until = _next_quota_reset()
+    else:
+        hint = re.search(r"retry(?:_delay)?\D{0,20}?(\d+(?:\.\d+)?)", s)
+        open_until = time.time() + (float(hint.group(1)) if hint else _BREAKER_DEFAULT_COOLDOWN)
+    conn = connection()
+    if conn is None:
+        return
+    try:
+        _quota_tables(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO circuit_breakers (model, open_until, reason) VALUES (?, ?, ?)",
+            (model_id, open_until, str(err)[:200]),
+        )
+    except Exception:
+        pass
+
+
+def breaker_check(model_id: str):
+    """Raise ModelUnavailable if the model is tripped or its daily budget is used up."""
+    conn = connection()
+    if conn is None:
+        return
+    try:
+        _quota_tables(conn)
+        row = conn.execute(
+            "SELECT open_until FROM circuit_breakers WHERE model = ?", (model_id,)
+        ).fetchone()
+        limit = MODEL_DAILY_LIMITS.get(model_id)
+        used = _quota_used(conn, model_id) if limit else 0
+    except Exception:
+        return
+    if row and row[0] > time.time():
+        raise ModelUnavailable(f"{model_id}: quota circuit open until {datetime.fromtimestamp(row[0]):%H:%M:%S}")
+    if limit and used >= limit:
+        raise ModelUnavailable(f"{model_id}: daily quota of {limit} requests used")
+
+
+def quota_status() -> list:
+    """[(model, used, limit, breaker_open_until or None)] for the debug sidebar."""
+    conn = connection()
+    rows = []
+    for model_id, limit in MODEL_DAILY_LIMITS.items():
+        used, open_until = 0, None
+        if conn is not None:
+            try:
+                _quota_tables(conn)
+                used = _quota_used(conn, model_id)
+                row = conn.execute(
+                    "SELECT open_until FROM circuit_breakers WHERE model = ?", (model_id,)
+                ).fetchone()
+                if row and row[0] > time.time():
+                    open_until = row[0]
+            except Exception:
+                pass
+        rows.append((model_id, used, limit, open_until))
+    return rows
+
+
+# ─── Token-bucket rate limiter (per provider/model, shared by all sessions) ──
+# Requests take a token before they are sent. When a bucket is empty the call
+# queues for up to RATE_LIMIT_MAX_QUEUE_SECONDS (never less than one refill
+# interval, so a token that is merely not due yet is waited for rather than
+# treated like a spent quota), otherwise it is rerouted to the next model in
+# the chain. Set PLANT_DOCTOR_SHARED_RATE_LIMIT=1 to keep bucket
+# state in the cache DB so every worker process draws from the same buckets.
+MODEL_RPM_LIMITS = {
+    "gemini-2.5-pro":          5,
+    "gemini-2.5-flash":        10,
+    "gemini-1.5-flash":        15,
+    "gemini-1.5-flash-8b":     15,
+    "llama-3.1-8b-instant":    30,
+    "llama-3.3-70b-versatile": 30,
+    OPENROUTER_VISION_MODEL:   20,
+    OPENROUTER_TEXT_MODEL:     20,
+}
+RATE_LIMIT_MAX_QUEUE_SECONDS = float(os.environ.get("PLANT_DOCTOR_RATE_QUEUE_MAX", 5))
+_QUEUE_SLACK_SECONDS = 0.1   # sleep/clock jitter on top of the cap
+_SHARED_RATE_LIMIT = os.environ.get("PLANT_DOCTOR_SHARED_RATE_LIMIT", "0") == "1"
+
+_BUCKETS: dict = {}          # { model_id: [tokens, last_refill_monotonic] }
+_bucket_lock = threading.Lock()
+_RATE_WAITS: dict = {}       # { model_id: deque of recent queue waits in seconds }
+
+
+def _bucket_params(model_id: str):
+    rpm = MODEL_RPM_LIMITS.get(model_id)
+    if not rpm:
+        return None
+    return rpm / 60.0, max(1, math.ceil(rpm / 6))   # refill per second, burst size
+
+
+def _refill(tokens: float, elapsed: float, rate: float, burst: int) -> float:
+    return min(burst, tokens + max(elapsed, 0) * rate)
+
+
+def _bucket_take_local(model_id: str, rate: float, burst: int) -> float:
+    now = time.monotonic()
+    with _bucket_lock:
+        tokens, last = _BUCKETS.get(model_id, (burst, now))
+        tokens = _refill(tokens, now - last, rate, burst)
+        if tokens >= 1:
+            _BUCKETS[model_id] = [tokens - 1, now]
+            return 0.0
+        _BUCKETS[model_id] = [tokens, now]
+        return (1 - tokens) / rate
+
+
+def _bucket_take_shared(model_id: str, rate: float, burst: int) -> float:
+    conn = connection()
+    if conn is None:
+        return _bucket_take_local(model_id, rate, burst)
+    now = time.time()
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " model TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE model = ?", (model_id,)
+            ).fetchone()
+            tokens = _refill(row[0], now - row[1], rate, burst) if row else burst
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (model, tokens, updated) VALUES (?, ?, ?)",
+                (model_id, tokens - 1 if wait == 0 else tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+    except Exception:
+        return _bucket_take_local(model_id, rate, burst)
+
+
+async def acquire_slot(model_id: str, max_wait: float = None):
+    """Wait for a token for `model_id`, or raise ModelUnavailable to reroute."""
+    params = _bucket_params(model_id)
+    if params is None:
+        return
+    if max_wait is None:
+        max_wait = max(RATE_LIMIT_MAX_QUEUE_SECONDS, 1 / params[0])   # e.g. 6 s at 10 RPM
+    import asyncio
+    waited = 0.0
+    while True:
+        if _SHARED_RATE_LIMIT:      # a SQLite transaction: keep it off the provider loop
+            wait = await asyncio.to_thread(_bucket_take_shared, model_id, *params)
+        else:
+            wait = _bucket_take_local(model_id, *params)
+        if wait == 0:
+            break
+        if waited + wait > max_wait + _QUEUE_SLACK_SECONDS:
+            _RATE_WAITS.setdefault(model_id, collections.deque(maxlen=100)).append(waited)
+            raise ModelUnavailable(f"{model_id}: local request budget busy, rerouting")
+        await asyncio.sleep(wait)
+        waited += wait
+    _RATE_WAITS.setdefault(model_id, collections.deque(maxlen=100)).append(waited)
+
+
+def rate_limit_stats() -> list:
+    """[(model, requests seen, mean queue wait s, max queue wait s)] for the debug sidebar."""
+    stats = []
+    for model_id, waits in list(_RATE_WAITS.items()):
+        waits = list(waits)
+        if waits:
+            stats.append((model_id, len(waits), sum(waits) / len(waits), max(waits)))
+    return stats
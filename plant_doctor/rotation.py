@@ -0,0 +1,46 @@
+"""
+Crop rotation lookup: curated plans for common crops, LLM-generated plans otherwise.
+"""
+from .catalog import LiveSection, thaw
+from .parsing import extract_json_robust
+
+# ============ CROP ROTATION DATABASE ============
+# { plant: {"rotations": [...], "info": {crop: text}} }, served from the
+# hot-reloadable catalogue (data/catalog.json)
+CROP_ROTATION_DATA = LiveSection("crop_rotation_data")
+
+REGIONS = ["North India", "South India", "East India", "West India", "Central India"]
+SOIL_TYPES = ["Black Soil", "Red Soil", "Laterite Soil", "Alluvial Soil", "Clay Soil"]
+MARKET_FOCUS = ["Stable essentials", "High-value cash crops", "Low input / low risk"]
+
+
+def generate_crop_rotation_plan(plant_type, region, soil_type, market_focus):
+    plan = CROP_ROTATION_DATA.get(plant_type)
+    if plan is not None:
+        return thaw(plan)
+    else:
+        return get_manual_rotation_plan(plant_type)
+
+
+def get_manual_rotation_plan(plant_name):
+    prompt = f"""You are an agricultural expert with deep knowledge of crop rotation and soil health. For the plant: {plant_name}
+Provide ONLY a valid JSON response in this exact format (no markdown, no explanations, no code blocks):
+{{"rotations": ["Crop1", "Crop2", "Crop3"], "info": {{"{plant_name}": "Detailed info about {plant_name}", "Crop1": "Why good after {plant_name}", "Crop2": "Why follows Crop1", "Crop3": "Why completes cycle"}}}}"""
+    from .providers import gemini_text_with_fallback
+
+    try:
+        raw, _ = gemini_text_with_fallback(prompt)
+        result = extract_json_robust(raw)
+        if result and "rotations" in result and "info" in result:
+            return result
+    except Exception:
+        pass
+    return {
+        "rotations": ["Legumes or Pulses", "Cereals (Wheat/Maize)", "Oilseeds or Vegetables"],
+        "info": {
+            plant_name: "Primary crop. Requires disease break and soil replenishment.",
+            "Legumes or Pulses": "Nitrogen-fixing crops. Soil improvement and disease cycle break.",
+            "Cereals (Wheat/Maize)": "Different nutrient profile. Continues income generation.",
+            "Oilseeds or Vegetables": "Diverse crop selection. Completes rotation cycle.",
+        },
+    }
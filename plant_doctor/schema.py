@@ -0,0 +1,204 @@
+"""
+Response schemas for the plant-ID and diagnosis passes.
+
+One field spec per payload drives both sides of structured output: the JSON
+schema handed to providers that can constrain their output to it (Gemini
+response_schema, OpenAI-style response_format on OpenRouter), and a validator
+compiled once at import that coerces whatever came back to the shapes the UI
+expects — confidence as an int in 0–100, lists as lists of strings, booleans
+as booleans, severity / disease type as one of the known values.
+"""
+import os
+import re
+
+STRUCTURED_OUTPUT = os.environ.get("PLANT_DOCTOR_STRUCTURED_OUTPUT", "1") == "1"
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_TRUE_WORDS = {"true", "yes", "y", "1"}
+_FALSE_WORDS = {"false", "no", "n", "0", "none", "null", ""}
+
+_GEMINI_TYPES = {"object": "OBJECT", "bool": "BOOLEAN", "int": "INTEGER", "str": "STRING", "list": "ARRAY"}
+_JSON_TYPES = {"object": "object", "bool": "boolean", "int": "integer", "str": "string", "list": "array"}
+
+
+# ─── Coercers (one per field kind) ──────────────────────────────────────────
+def _to_bool(value, default):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str):
+        word = value.strip().lower()
+        if word in _TRUE_WORDS:
+            return True
+        if word in _FALSE_WORDS:
+            return False
+    return default
+
+
+def _to_int(value, default, lo=None, hi=None):
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, str):
+        m = _NUMBER.search(value)          # "87%", "about 80", "0.9"
+        value = float(m.group()) if m else None
+    if isinstance(value, float):
+        if 0 < value <= 1 and hi == 100:   # a probability where a percentage was asked for
+            value *= 100
+        value = round(value)
+    if not isinstance(value, int):
+        return default
+    if lo is not None:
+        value = max(lo, value)
+    if hi is not None:
+        value = min(hi, value)
+    return value
+
+
+def _item_text(item) -> str:
+    if isinstance(item, dict):
+        return " — ".join(str(v).strip() for v in item.values() if str(v).strip())
+    return str(item).strip()
+
+
+def _to_str(value, default):
+    if value is None:
+        return default
+    if isinstance(value, (list, tuple)):
+        return ", ".join(t for t in map(_item_text, value) if t)
+    if isinstance(value, dict):
+        return _item_text(value)
+    return str(value).strip()
+
+
+def _to_list(value, default):
+    if value is None:
+        return list(default)
+    if isinstance(value, str):
+        value = [line.lstrip("•-* ").strip() for line in value.splitlines()] if "\n" in value else [value]
+    elif isinstance(value, dict):
+        value = [value]
+    elif not isinstance(value, (list, tuple)):
+        value = [value]
+    return [t for t in map(_item_text, value) if t]
+
+
+def _to_choice(value, default, choices):
+    text = _to_str(value, default).lower()
+    return next((c for c in choices if c in text), text or default)
+
+
+class ResponseSchema:
+    """
+    A payload's field spec, with its provider schemas rendered and its
+    validator compiled once.
+
+    fields: [(name, kind, default, options)] — kind is bool | int | str | list;
+    options may hold "required", "min"/"max" (int) and "choices" (str).
+    lead: fields the model should write first (then declaration order). Gemini
+    otherwise emits properties alphabetically, which puts disease_name and
+    severity near the end of a streamed diagnosis.
+    """
+
+    def __init__(self, name: str, fields: list, lead: tuple = ()):
+        self.name = name
+        self.fields = fields
+        self.names = [f[0] for f in fields]
+        self.ordering = [f for f in lead if f in self.names] + [f for f in self.names if f not in lead]
+        self.required = [f[0] for f in fields if f[3].get("required")]
+        self._steps = [(fname, self._coercer(kind, default, opts)) for fname, kind, default, opts in fields]
+        self.gemini_schema = dict(self._render(_GEMINI_TYPES), property_ordering=self.ordering)
+        self.openai_response_format = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": name,
+                "strict": False,
+                "schema": self._render(_JSON_TYPES),
+            },
+        }
+
+    @staticmethod
+    def _coercer(kind, default, opts):
+        if kind == "bool":
+            return lambda v: _to_bool(v, default)
+        if kind == "int":
+            lo, hi = opts.get("min"), opts.get("max")
+            return lambda v: _to_int(v, default, lo, hi)
+        if kind == "list":
+            return lambda v: _to_list(v, default)
+        if opts.get("choices"):
+            choices = opts["choices"]
+            return lambda v: _to_choice(v, default, choices)
+        return lambda v: _to_str(v, default)
+
+    def _render(self, types: dict) -> dict:
+        properties = {}
+        for fname, kind, _, _ in self.fields:
+            prop = {"type": types[kind]}
+            if kind == "list":
+                prop["items"] = {"type": types["str"]}
+            properties[fname] = prop
+        return {"type": types["object"], "properties": properties, "required": list(self.required)}
+
+    def missing(self, data) -> list:
+        """Required fields absent from a raw (uncoerced) result."""
+        if not isinstance(data, dict):
+            return list(self.required)
+        return [f for f in self.required if f not in data]
+
+    def validate(self, data):
+        """
+        Coerced copy of a parsed result — every spec field present with its
+        expected type, unknown keys kept as-is. None if `data` is not an object.
+        """
+        if not isinstance(data, dict):
+            return None
+        out = dict(data)
+        get = data.get
+        for fname, coerce in self._steps:
+            out[fname] = coerce(get(fname))
+        return out
+
+
+_SEVERITIES = ["healthy", "mild", "moderate", "severe"]
+_DISEASE_TYPES = ["fungal", "bacterial", "viral", "pest", "nutrient", "environmental", "healthy"]
+
+PLANT_ID_SCHEMA = ResponseSchema("plant_identification", [
+    ("is_plant_image", "bool", True, {"required": True}),
+    ("common_name", "str", "Unknown Plant", {"required": True}),
+    ("scientific_name", "str", "Unknown", {}),
+    ("plant_family", "str", "Unknown", {}),
+    ("identification_confidence", "int", 0, {"required": True, "min": 0, "max": 100}),
+    ("identification_reason", "str", "", {}),
+    ("visible_features", "list", [], {}),
+    ("possible_alternatives", "list", [], {}),
+    ("image_quality", "str", "", {}),
+])
+
+DIAGNOSIS_SCHEMA = ResponseSchema("plant_diagnosis", [
+    ("is_plant_image", "bool", True, {}),
+    ("is_correct_plant", "bool", True, {}),
+    ("plant_species", "str", "", {}),
+    ("disease_name", "str", "Unknown", {"required": True}),
+    ("disease_type", "str", "", {"required": True, "choices": _DISEASE_TYPES}),
+    ("severity", "str", "", {"required": True, "choices": _SEVERITIES}),
+    ("confidence", "int", 0, {"required": True, "min": 0, "max": 100}),
+    ("confidence_reason", "str", "", {}),
+    ("image_quality", "str", "", {}),
+    ("symptoms", "list", [], {"required": True}),
+    ("differential_diagnosis", "list", [], {}),
+    ("probable_causes", "list", [], {"required": True}),
+    ("immediate_action", "list", [], {}),
+    ("organic_treatments", "list", [], {}),
+    ("chemical_treatments", "list", [], {}),
+    ("prevention_long_term", "list", [], {}),
+    ("plant_specific_notes", "str", "", {}),
+    ("similar_conditions", "str", "", {}),
+], lead=("disease_name", "severity"))
+
+# AUTO_DETECT single call: identification fields, then the diagnosis fields
+# that are not implied by them (plant_species is the identified common_name).
+COMBINED_SCHEMA = ResponseSchema("plant_identify_and_diagnose", PLANT_ID_SCHEMA.fields + [
+    f for f in DIAGNOSIS_SCHEMA.fields
+    if f[0] not in PLANT_ID_SCHEMA.names and f[0] not in ("is_correct_plant", "plant_species")
+])
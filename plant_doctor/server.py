@@ -0,0 +1,338 @@
+"""
+Local HTTP diagnosis API for partner apps (e.g. the field-officer mobile client).
+
+    python -m plant_doctor.server --port 8600 --workers 4 --queue 16
+    python -m plant_doctor.server --fake-provider     # offline, canned answers
+
+Endpoints (all responses are JSON):
+
+    GET  /health
+    POST /v1/diagnose        multipart: image (1–3 files), plant_type=AUTO_DETECT, crop=1
+    POST /v1/identify-plant  multipart: image (1–3 files), crop=1
+    POST /v1/chat            {"question": "...", "diagnosis": {...optional context...}}
+    POST /v1/rotation        {"plant": "Tomato", "region": ..., "soil_type": ..., "market_focus": ...}
+
+Requests run on a bounded worker pool in front of the same provider chain,
+cache, quota ledger and rate limiter as the Streamlit app. When every worker is
+busy and the wait queue is full the server answers 429 with Retry-After
+instead of stacking more provider calls behind the quota.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .quota import is_quota_err
+
+MAX_UPLOAD_BYTES = int(os.environ.get("PLANT_DOCTOR_API_MAX_UPLOAD", 20 * 1024 * 1024))
+MAX_IMAGES = 3
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("PLANT_DOCTOR_API_TIMEOUT", 120))
+
+
+class PoolFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class WorkerPool:
+    """Thread pool with admission control: `workers` running plus at most `queue` waiting."""
+
+    def __init__(self, workers: int, queue: int):
+        self.workers = workers
+        self.capacity = workers + queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._avg_seconds = 5.0   # EWMA of job duration, seeds Retry-After
+
+    @property
+    def admitted(self) -> int:
+        return self._admitted
+
+    def _retry_after(self) -> int:
+        backlog = self._admitted - self.workers + 1
+        return max(1, math.ceil(self._avg_seconds * max(backlog, 1) / self.workers))
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._admitted >= self.capacity:
+                raise PoolFull(self._retry_after())
+            self._admitted += 1
+        return self._executor.submit(self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        t0 = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._admitted -= 1
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - t0)
+
+
+# ─── Jobs (run on pool threads) ─────────────────────────────────────────────
+def _payloads(images: list, crop: bool) -> list:
+    from .imaging import prepare_upload
+
+    try:
+        return [prepare_upload(io.BytesIO(data), crop)[0] for data in images]
+    except Exception as e:
+        raise ApiError(400, f"could not decode image: {e}")
+
+
+def _provider_call(coro):
+    from .providers import run_async
+
+    try:
+        return run_async(coro)
+    except Exception as e:
+        if is_quota_err(e) or isinstance(e, RuntimeError):
+            raise ApiError(503, str(e), {"Retry-After": "60"})
+        raise
+
+
+def diagnose_job(images: list, plant_type: str, crop: bool) -> dict:
+    from .pipeline import diagnose_async
+    from .providers import get_async_openrouter_client
+
+    out = _provider_call(diagnose_async(
+        _payloads(images, crop), plant_type, or_client=get_async_openrouter_client()
+    ))
+    if out["result"] is None:
+        raise ApiError(502, "could not parse the model response")
+    return {
+        "plant_type": out["plant_type"],
+        "plant_identification": out["plant_id"],
+        "diagnosis": out["result"],
+        "model_used": out["model_used"],
+        "near_match_distance": out["near_match_distance"],
+    }
+
+
+def identify_job(images: list, crop: bool) -> dict:
+    from .pipeline import identify_plant_async
+    from .providers import get_async_openrouter_client
+
+    plant_id, plant, model_used, near_distance = _provider_call(identify_plant_async(
+        _payloads(images, crop), or_client=get_async_openrouter_client()
+    ))
+    if plant_id is None:
+        raise ApiError(502, "could not parse the model response")
+    return {
+        "is_plant_image": plant is not None,
+        "plant_type": plant,
+        "plant_identification": plant_id,
+        "model_used": model_used,
+        "near_match_distance": near_distance,
+    }
+
+
+def chat_job(question: str, diagnosis: dict) -> dict:
+    from .assistant import get_farmer_bot_response
+
+    return {"answer": get_farmer_bot_response(question, diagnosis)}
+
+
+def rotation_job(plant: str, region: str, soil_type: str, market_focus: str) -> dict:
+    from .rotation import generate_crop_rotation_plan
+
+    return {"plant": plant, "plan": generate_crop_rotation_plan(plant, region, soil_type, market_focus)}
+
+
+# ─── Request parsing ────────────────────────────────────────────────────────
+def parse_multipart(content_type: str, body: bytes):
+    """Split a multipart/form-data body into ({field: str}, [file bytes])."""
+    msg = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    if not msg.is_multipart():
+        raise ApiError(400, "expected multipart/form-data")
+    fields, files = {}, []
+    for part in msg.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        data = part.get_payload(decode=True) or b""
+        if part.get_filename() is not None:
+            if data:
+                files.append(data)
+        elif name:
+            fields[name] = data.decode("utf-8", "replace").strip()
+    return fields, files
+
+
+def _truthy(value: str, default: bool = True) -> bool:
+    if value is None or value == "":
+        return default
+    return value.lower() not in ("0", "false", "no", "off")
+
+
+class DiagnosisHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "PlantDoctorAPI/1"
+
+    @property
+    def pool(self) -> WorkerPool:
+        return self.server.pool
+
+    def log_message(self, fmt, *args):
+        if not self.server.quiet:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status: int, obj, headers: dict = None):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if status >= 400:
+            # the request body may be unread; don't reuse this connection
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ApiError(400, "Content-Length is not a number")
+        if length < 0:
+            raise ApiError(400, "Content-Length is negative")
+        if length > MAX_UPLOAD_BYTES:
+            raise ApiError(413, f"request body over {MAX_UPLOAD_BYTES} bytes")
+        return self.rfile.read(length) if length else b""
+
+    def _json_body(self) -> dict:
+        try:
+            data = json.loads(self._read_body() or b"{}")
+        except ValueError:
+            raise ApiError(400, "body is not valid JSON")
+        if not isinstance(data, dict):
+            raise ApiError(400, "body must be a JSON object")
+        return data
+
+    def _images(self):
+        ctype = self.headers.get("Content-Type", "")
+        if not ctype.startswith("multipart/form-data"):
+            raise ApiError(415, "upload images as multipart/form-data")
+        fields, files = parse_multipart(ctype, self._read_body())
+        if not files:
+            raise ApiError(400, "no image file in the upload")
+        if len(files) > MAX_IMAGES:
+            raise ApiError(400, f"at most {MAX_IMAGES} images per request")
+        return fields, files
+
+    # ── routes ──
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            from .catalog import catalog_version
+
+            self._send_json(200, {
+                "status": "ok",
+                "catalog_version": catalog_version(),
+                "workers": self.pool.workers,
+                "in_flight": self.pool.admitted,
+                "capacity": self.pool.capacity,
+            })
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        route = self.path.split("?", 1)[0].rstrip("/")
+        try:
+            if route == "/v1/diagnose":
+                fields, files = self._images()
+                job = (diagnose_job, files, fields.get("plant_type") or "AUTO_DETECT",
+                       _truthy(fields.get("crop")))
+            elif route == "/v1/identify-plant":
+                fields, files = self._images()
+                job = (identify_job, files, _truthy(fields.get("crop")))
+            elif route == "/v1/chat":
+                data = self._json_body()
+                question = str(data.get("question") or "").strip()
+                if not question:
+                    raise ApiError(400, "question is required")
+                job = (chat_job, question, data.get("diagnosis") or None)
+            elif route == "/v1/rotation":
+                data = self._json_body()
+                plant = str(data.get("plant") or "").strip()
+                if not plant:
+                    raise ApiError(400, "plant is required")
+                job = (rotation_job, plant, data.get("region", ""), data.get("soil_type", ""),
+                       data.get("market_focus", ""))
+            else:
+                raise ApiError(404, "not found")
+
+            future = self.pool.submit(*job)
+            self._send_json(200, future.result(timeout=REQUEST_TIMEOUT_SECONDS))
+        except PoolFull as e:
+            self._send_json(429, {"error": str(e)}, {"Retry-After": str(e.retry_after)})
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)}, e.headers)
+        except FutureTimeout:
+            self._send_json(504, {"error": f"no result within {REQUEST_TIMEOUT_SECONDS:.0f}s"})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8600, workers: int = 4, queue: int = 16,
+                quiet: bool = False) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), DiagnosisHandler)
+    server.daemon_threads = True
+    server.pool = WorkerPool(workers, queue)
+    server.quiet = quiet
+    return server
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m plant_doctor.server", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=os.environ.get("PLANT_DOCTOR_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PLANT_DOCTOR_API_PORT", 8600)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("PLANT_DOCTOR_API_WORKERS", 4)))
+    parser.add_argument("--queue", type=int, default=int(os.environ.get("PLANT_DOCTOR_API_QUEUE", 16)),
+                        help="requests allowed to wait for a worker before answering 429")
+    parser.add_argument("--fake-provider", action="store_true",
+                        help="answer from canned responses; no keys or quota used")
+    parser.add_argument("--quiet", action="store_true", help="no per-request access log")
+    args = parser.parse_args(argv)
+
+    if args.fake_provider:
+        from .fake_provider import install
+        install()
+    else:
+        from .providers import get_secret
+        if not get_secret("GEMINI_API_KEY"):
+            parser.error("GEMINI_API_KEY is not set (or use --fake-provider)")
+
+    server = make_server(args.host, args.port, args.workers, args.queue, args.quiet)
+    print(f"Plant Doctor API on http://{args.host}:{args.port} "
+          f"({args.workers} workers, queue {args.queue}{', fake provider' if args.fake_provider else ''})",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Cold-start profiler.
+
+The app marks phases of each script run (imports, page setup, sidebar, page
+render) and provider SDKs are imported through import_sdk(), which times the
+first import of each. The first run of a process is the cold start; its
+breakdown is appended to a JSONL log so regressions show up across deploys,
+and the debug sidebar renders both the cold start and the latest rerun.
+"""
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+STARTUP_LOG_PATH = os.environ.get(
+    "PLANT_DOCTOR_STARTUP_LOG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "startup.jsonl"),
+)
+_STARTUP_LOG_KEEP = 200   # most recent cold starts kept on disk
+
+_sdk_import_ms: dict = {}   # { module: ms spent on its first import }
+_sdk_lock = threading.Lock()
+
+COLD_START = None   # RunProfile of this process's first completed script run
+LAST_RUN = None     # most recent completed script run
+
+
+class RunProfile:
+    """Wall-clock phases of one script run, in milliseconds."""
+
+    def __init__(self, t0: float = None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self._last = self.t0
+        self.phases = []   # [(phase, ms)]
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    @property
+    def total_ms(self) -> float:
+        return sum(ms for _, ms in self.phases)
+
+
+def import_sdk(module: str):
+    """Import a provider SDK on first use, recording how long the first import took."""
+    mod = sys.modules.get(module)
+    if mod is not None:
+        return mod
+    with _sdk_lock:
+        t0 = time.perf_counter()
+        mod = importlib.import_module(module)
+        _sdk_import_ms.setdefault(module, (time.perf_counter() - t0) * 1000)
+    return mod
+
+
+def sdk_import_times() -> dict:
+    return dict(_sdk_import_ms)
+
+
+def finish_run(profile: RunProfile):
+    """Close a script run; the first one per process is logged as the cold start."""
+    global COLD_START, LAST_RUN
+    LAST_RUN = profile
+    if COLD_START is not None:
+        return
+    COLD_START = profile
+    _append_log({
+        "ts": time.time(),
+        "total_ms": round(profile.total_ms, 1),
+        "phases": {name: round(ms, 1) for name, ms in profile.phases},
+        "sdk_imports": {name: round(ms, 1) for name, ms in _sdk_import_ms.items()},
+    })
+
+
+def _append_log(record: dict):
+    try:
+        os.makedirs(os.path.dirname(STARTUP_LOG_PATH), exist_ok=True)
+        lines = []
+        if os.path.exists(STARTUP_LOG_PATH):
+            with open(STARTUP_LOG_PATH, encoding="utf-8") as f:
+                lines = f.readlines()[-(_STARTUP_LOG_KEEP - 1):]
+        lines.append(json.dumps(record) + "\n")
+        with open(STARTUP_LOG_PATH, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+    except Exception:
+        pass
+
+
+def recent_cold_starts(n: int = 10) -> list:
+    """Total cold-start milliseconds of the last n processes, oldest first."""
+    try:
+        with open(STARTUP_LOG_PATH, encoding="utf-8") as f:
+            lines = f.readlines()[-n:]
+        return [json.loads(line)["total_ms"] for line in lines]
+    except Exception:
+        return []
@@ -0,0 +1,31 @@
+"""
+Shared on-disk state: one SQLite file (WAL mode) per deployment holding the
+diagnosis cache, the near-duplicate index, the quota ledger and, optionally,
+rate-limit buckets. Safe for several worker processes at once.
+"""
+import os
+import sqlite3
+import threading
+
+CACHE_DB_PATH = os.environ.get(
+    "PLANT_DOCTOR_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "diagnosis_cache.sqlite3"),
+)
+
+_local = threading.local()
+
+
+def connection():
+    """Per-thread SQLite connection (Streamlit sessions run on separate threads), or None."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+    try:
+        os.makedirs(os.path.dirname(CACHE_DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(CACHE_DB_PATH, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    except Exception:
+        conn = None
+    _local.conn = conn
+    return conn
@@ -0,0 +1,160 @@
+"""
+Global CSS theme, served once per browser instead of once per rerun.
+
+The readable source is data/theme.css. `python -m plant_doctor.theme` writes
+the minified copy to static/theme.min.css, which Streamlit serves at
+/app/static/ when server.enableStaticServing is on (.streamlit/config.toml).
+Each rerun then sends only theme_loader_html(): a few hundred bytes of script
+that fetches the stylesheet by versioned URL (cached by the browser for good,
+a new version is a new URL) and adds it to the page once. Streamlit serves
+unknown static types as text/plain with nosniff, so the CSS is fetched and
+injected rather than linked. Without static serving the app falls back to
+inline_theme_html(), the minified CSS inside a <style> tag on every rerun.
+
+    python -m plant_doctor.theme             # rebuild static/theme.min.css
+    python -m plant_doctor.theme --check     # exit 1 if it is out of date
+    python -m plant_doctor.theme --measure   # theme bytes per rerun, before / after
+"""
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+THEME_SOURCE_PATH = os.path.join(_PACKAGE_DIR, "data", "theme.css")
+STATIC_DIR = os.path.join(os.path.dirname(_PACKAGE_DIR), "static")   # next to app.py
+THEME_ASSET_NAME = "theme.min.css"
+THEME_ASSET_PATH = os.path.join(STATIC_DIR, THEME_ASSET_NAME)
+
+_STRING_OR_COMMENT = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/""", re.S)
+_CSS_STRING = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+
+
+def minify_css(css: str) -> str:
+    """Drop comments and redundant whitespace; quoted strings are left untouched."""
+    css = _STRING_OR_COMMENT.sub(lambda m: m.group(1) or "", css)
+    parts = _CSS_STRING.split(css)           # odd indexes are the quoted strings
+    for i in range(0, len(parts), 2):
+        part = re.sub(r"\s+", " ", parts[i])
+        part = re.sub(r"\s*([{};,>])\s*", r"\1", part)
+        parts[i] = re.sub(r":\s+", ":", part).replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def _read_source() -> str:
+    with open(THEME_SOURCE_PATH, encoding="utf-8") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def theme_css() -> str:
+    """The minified stylesheet: the built asset if present, else minified from source."""
+    try:
+        with open(THEME_ASSET_PATH, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return minify_css(_read_source())
+
+
+@functools.lru_cache(maxsize=None)
+def theme_version() -> str:
+    return hashlib.sha256(theme_css().encode()).hexdigest()[:12]
+
+
+def theme_asset_ready() -> bool:
+    return os.path.exists(THEME_ASSET_PATH)
+
+
+def theme_url(base_url_path: str = "") -> str:
+    base = "/".join(p for p in base_url_path.strip("/").split("/") if p)
+    return f"{'/' + base if base else ''}/app/static/{THEME_ASSET_NAME}?v={theme_version()}"
+
+
+_LOADER = """<script>
+(function () {
+  var doc = window.parent.document, version = %(version)s;
+  var style = doc.getElementById("plant-doctor-theme");
+  if (style && style.dataset.version === version) return;
+  fetch(%(url)s).then(function (r) {
+    if (!r.ok) throw new Error(r.status);
+    return r.text();
+  }).then(function (css) {
+    if (!style) { style = doc.createElement("style"); style.id = "plant-doctor-theme"; doc.body.appendChild(style); }
+    style.dataset.version = version;
+    style.textContent = css;
+  });
+})();
+</script>"""
+
+
+@functools.lru_cache(maxsize=8)
+def theme_loader_html(base_url_path: str = "") -> str:
+    """Script for a zero-height component that adds the cached stylesheet to the app page once."""
+    return _LOADER % {"version": json.dumps(theme_version()), "url": json.dumps(theme_url(base_url_path))}
+
+
+@functools.lru_cache(maxsize=None)
+def inline_theme_html() -> str:
+    return f"<style>{theme_css()}</style>"
+
+
+def theme_payload_bytes(base_url_path: str = "") -> dict:
+    """
+    Theme bytes pushed into the delta stream on every rerun, before (the
+    source CSS inline), inline minified, and with the static stylesheet, plus
+    the one-time download of the stylesheet itself.
+    """
+    stylesheet = theme_css().encode()
+    return {
+        "per_rerun_inline_source": len(f"<style>\n{_read_source()}</style>\n".encode()),
+        "per_rerun_inline_minified": len(inline_theme_html().encode()),
+        "per_rerun_static": len(theme_loader_html(base_url_path).encode()),
+        "stylesheet_once": len(stylesheet),
+        "stylesheet_once_gzip": len(gzip.compress(stylesheet)),
+    }
+
+
+def build_theme(check: bool = False) -> bool:
+    """Rewrite static/theme.min.css from the source; True if it was out of date."""
+    minified = minify_css(_read_source())
+    try:
+        with open(THEME_ASSET_PATH, encoding="utf-8") as f:
+            if f.read() == minified:
+                return False
+    except FileNotFoundError:
+        pass
+    if not check:
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        with open(THEME_ASSET_PATH, "w", encoding="utf-8") as f:
+            f.write(minified)
+    return True
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m plant_doctor.theme",
+                                     description="Build or measure the static theme stylesheet.")
+    parser.add_argument("--check", action="store_true", help="only report whether the asset is out of date")
+    parser.add_argument("--measure", action="store_true", help="print theme bytes per rerun, before and after")
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        sizes = theme_payload_bytes()
+        for name, n in sizes.items():
+            print(f"{name:28} {n:>8,} B")
+        saved = sizes["per_rerun_inline_source"] - sizes["per_rerun_static"]
+        print(f"saved per rerun: {saved:,} B ({saved / sizes['per_rerun_inline_source']:.1%})")
+        return 0
+    stale = build_theme(check=args.check)
+    if args.check:
+        print(f"{THEME_ASSET_NAME} is {'out of date' if stale else 'up to date'}")
+        return 1 if stale else 0
+    print(f"{THEME_ASSET_NAME} {'rebuilt' if stale else 'already up to date'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
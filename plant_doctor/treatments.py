@@ -0,0 +1,223 @@
+"""
+Treatment cost/quantity catalogue and the yield-loss model behind the ROI calculator.
+"""
+import collections
+import difflib
+import re
+from collections.abc import Mapping
+
+from .catalog import LiveSection, get_catalog
+
+# ============ TREATMENT COSTS & QUANTITIES DATABASE ============
+# { "organic" | "chemical": { name: {cost, quantity, dilution[, price_note]} } },
+# served from the hot-reloadable catalogue (data/catalog.json).
+TREATMENT_COSTS = LiveSection("treatment_costs")
+
+
+# ============ TREATMENT LOOKUP INDEX ============
+# Built once per catalogue version. Lookups go exact name/alias (dict hit) →
+# token overlap (posting lists), with misspelt tokens first corrected against
+# the catalogue vocabulary by trigram shortlist + edit similarity. A token match
+# must contain every distinctive word of the product's name (or of one of its
+# bracketed aliases) and either cover more than NAME_MIN_COVERAGE of that name
+# or add nothing to it, so "Copper hydroxide" or "Neem Cake" fall back to the
+# default price instead of borrowing another product's dosage. Coverage is
+# scored against the catalogue name, so dosage and filler words in a suggestion
+# line ("Trichoderma viride @ 5g/kg seed") don't count against it. Results are
+# memoised per index (so they go when a catalogue reload replaces it) because
+# the same AI-suggested names come back on every Streamlit rerun. Each match says how it was found.
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PAREN = re.compile(r"\(([^)]*)\)")
+# Never looked at: dosage numbers and units, filler words (and any token starting with a digit: "5g", "75wp")
+_STOP_TOKENS = {"ml", "l", "g", "kg", "gm", "per", "litre", "liter", "liters", "litres", "with", "water",
+                "and", "or", "of", "the", "a", "to", "in", "for", "sl", "ec", "wp", "sc", "wg", "wdg", "dp"}
+# Shared only these? Not a match by itself ("oil", "spray" appear everywhere)
+_GENERIC_TOKENS = {"oil", "spray", "extract", "powder", "dust", "mixture", "fungicide", "organic",
+                   "plus", "gold", "solution", "bio"}
+FUZZY_MIN_SCORE = 0.8
+_MATCH_MEMO_MAX = 2048                        # per treatment type and catalogue version
+NAME_MIN_COVERAGE = 0.5
+
+DEFAULT_TREATMENT_COST = {"organic": 300, "chemical": 250}
+
+TreatmentMatch = collections.namedtuple("TreatmentMatch", "key quality score")
+# quality: "exact" | "alias" | "token" | "fuzzy" | "default"; score in 0–1
+
+
+def _normalize(name: str) -> str:
+    return " ".join(t for t in _TOKEN.findall(name.lower()) if t not in _STOP_TOKENS and not t[0].isdigit())
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TreatmentIndex:
+    """Exact map, alias map, token postings and a trigram index of the token vocabulary for one treatment type."""
+
+    def __init__(self, entries: dict):
+        self.keys = list(entries)                 # catalogue order breaks ties, as before
+        self.exact = {}
+        self.aliases = {}
+        self.tokens = collections.defaultdict(set)        # token → key ranks
+        self.key_tokens = {}
+        self.name_tokens = {}                     # rank → [(all tokens, distinctive tokens)] of the name and each alias
+        self.vocab_trigrams = collections.defaultdict(set)  # trigram → tokens
+        self._memo = {}                           # normalised name → match (or None)
+        for rank, key in enumerate(self.keys):
+            norm = _normalize(key)
+            self.exact.setdefault(norm, rank)
+            # "Mancozeb (Indofil)" is also found as "Mancozeb" and "Indofil"
+            for alias in (_PAREN.sub(" ", key), *_PAREN.findall(key)):
+                alias = _normalize(alias)
+                if alias and alias != norm:
+                    self.aliases.setdefault(alias, rank)
+            toks = set(norm.split())
+            self.key_tokens[rank] = toks
+            names = (set(_normalize(n).split()) for n in (_PAREN.sub(" ", key), *_PAREN.findall(key)))
+            self.name_tokens[rank] = [(n, n - _GENERIC_TOKENS) for n in names if n]
+            for tok in toks:
+                self.tokens[tok].add(rank)
+        for tok in self.tokens:
+            for gram in _trigrams(tok):
+                self.vocab_trigrams[gram].add(tok)
+
+    def _correct(self, tok: str):
+        """Closest vocabulary token to a misspelt one (trigram shortlist, edit-similarity check)."""
+        overlap = collections.Counter()
+        for gram in _trigrams(tok):
+            for cand in self.vocab_trigrams.get(gram, ()):
+                overlap[cand] += 1
+        best, best_score = None, 0.0
+        for cand, _ in overlap.most_common(5):
+            score = difflib.SequenceMatcher(None, tok, cand).ratio()
+            if score > best_score:
+                best, best_score = cand, score
+        return (best, best_score) if best_score >= FUZZY_MIN_SCORE else (None, 0.0)
+
+    def match(self, norm: str):
+        try:
+            return self._memo[norm]
+        except KeyError:
+            pass
+        if len(self._memo) >= _MATCH_MEMO_MAX:
+            self._memo.clear()
+        found = self._memo[norm] = self._match(norm)
+        return found
+
+    def _match(self, norm: str):
+        if not norm:
+            return None
+        if norm in self.exact:
+            return TreatmentMatch(self.keys[self.exact[norm]], "exact", 1.0)
+        if norm in self.aliases:
+            return TreatmentMatch(self.keys[self.aliases[norm]], "alias", 1.0)
+
+        q_tokens, corrected = set(), {}           # corrected: vocabulary token → edit similarity
+        for tok in norm.split():
+            if tok not in self.tokens and len(tok) >= 4:
+                fixed, score = self._correct(tok)
+                if fixed:
+                    tok, corrected[fixed] = fixed, min(score, corrected.get(fixed, 1.0))
+            q_tokens.add(tok)
+        shared = collections.Counter()
+        for tok in q_tokens - _GENERIC_TOKENS:
+            for rank in self.tokens.get(tok, ()):
+                shared[rank] += 1
+        if not shared:
+            return None
+
+        def coverage(rank):
+            """Share of the best-covered catalogue name (or alias) found in the query; 0 if a distinctive word is missing."""
+            return max((len(q_tokens & name) / len(name) for name, distinctive in self.name_tokens[rank]
+                        if distinctive <= q_tokens), default=0.0)
+
+        scores = {r: coverage(r) for r in shared}
+        candidates = [r for r, score in scores.items()
+                      if score > NAME_MIN_COVERAGE or (score and q_tokens <= self.key_tokens[r])]
+        if not candidates:
+            return None
+        rank = max(candidates, key=lambda r: (shared[r], scores[r], -r))
+        # only a correction the match relies on makes it fuzzy ("biofungicide" → "fungicide" doesn't)
+        fuzz = min((corrected[t] for t in corrected if t in self.key_tokens[rank]), default=1.0)
+        if fuzz < 1.0:
+            return TreatmentMatch(self.keys[rank], "fuzzy", round(scores[rank] * fuzz, 2))
+        return TreatmentMatch(self.keys[rank], "token", round(scores[rank], 2))
+
+
+def _treatment_indexes(catalog) -> dict:
+    return {ttype: _TreatmentIndex(entries) for ttype, entries in catalog.treatment_costs.items()}
+
+
+def match_treatment(treatment_type, treatment_name, catalog=None) -> TreatmentMatch:
+    """Best catalogue entry for an AI-suggested treatment name, with how it matched."""
+    index = (catalog or get_catalog()).derived("treatment_index", _treatment_indexes).get(treatment_type)
+    found = index.match(_normalize(treatment_name or "")) if index else None
+    return found or TreatmentMatch(None, "default", 0.0)
+
+
+def get_treatment_cost(treatment_type, treatment_name):
+    return get_treatment_info(treatment_type, treatment_name)["cost"]
+
+
+def get_treatment_info(treatment_type, treatment_name):
+    """
+    Cost / quantity / dilution for a treatment, plus "match" (a TreatmentMatch)
+    so callers can flag estimates. Unmatched names get the default price with
+    match quality "default".
+    """
+    catalog = get_catalog()
+    match = match_treatment(treatment_type, treatment_name, catalog)
+    value = catalog.treatment_costs.get(treatment_type, {}).get(match.key) if match.key else None
+    if isinstance(value, Mapping):
+        info = dict(value)
+    else:
+        info = {
+            "cost": value if value is not None else DEFAULT_TREATMENT_COST.get(treatment_type, 250),
+            "quantity": "As per package",
+            "dilution": "Follow label instructions",
+        }
+    info["match"] = match
+    return info
+
+
+def normalize_treatment_name(raw_name: str) -> str:
+    if not isinstance(raw_name, str):
+        return ""
+    name = raw_name.strip()
+    if " - " in name:
+        name = name.split(" - ", 1)[0].strip()
+    if ":" in name:
+        name = name.split(":", 1)[0].strip()
+    return name
+
+
+# ============ YIELD LOSS MODEL ============
+def calculate_loss_percentage(severity, infected_count, total_plants):
+    """
+    Calculates projected yield loss based on current infection + predicted spread.
+    This shows the farmer the true cost of DOING NOTHING.
+    """
+    if total_plants <= 0: return 0
+    
+    # 1. Base Severity (How much yield a sick plant loses)
+    loss_bands = {"healthy": 0.02, "mild": 0.20, "moderate": 0.45, "severe": 0.75}
+    base_loss = loss_bands.get(severity.lower(), 0.28)
+    
+    # 2. Current Infection Ratio
+    current_ratio = min(infected_count / total_plants, 1.0)
+    
+    # 3. The "Do Nothing" Spread Multiplier 
+    spread_multipliers = {
+        "healthy": 1.0,   
+        "mild": 2.5,      
+        "moderate": 5.0,  
+        "severe": 8.5     
+    }
+    spread_factor = spread_multipliers.get(severity.lower(), 5.0)
+    
+    # Projected ratio of farm infected if no action is taken
+    projected_ratio = min(current_ratio * spread_factor, 1.0)
+    
+    return base_loss * projected_ratio * 100
@@ -0,0 +1,114 @@
+"""
+Optional on-device first pass. Point PLANT_DOCTOR_LOCAL_MODEL at a checkpoint
+saved as torch.save({"arch": ..., "state_dict": ..., "labels": [...],
+"temperature": T}) with PlantVillage-style labels ("Tomato___Early_blight").
+Confident answers skip the Gemini round trip; everything else escalates.
+"""
+import functools
+import os
+
+LOCAL_MODEL_PATH = os.environ.get("PLANT_DOCTOR_LOCAL_MODEL", "")
+LOCAL_MODEL_ARCH = os.environ.get("PLANT_DOCTOR_LOCAL_ARCH", "mobilenetv3_large_100")
+LOCAL_CONFIDENCE_THRESHOLD = float(os.environ.get("PLANT_DOCTOR_LOCAL_THRESHOLD", 0.90))
+LOCAL_TOP_K = 3
+
+
+@functools.lru_cache(maxsize=None)
+def _get_local_classifier():
+    """Load the timm backbone + label map once per process, or None if unavailable."""
+    if not LOCAL_MODEL_PATH or not os.path.exists(LOCAL_MODEL_PATH):
+        return None
+    try:
+        import torch
+        import timm
+        from timm.data import resolve_data_config, create_transform
+
+        ckpt = torch.load(LOCAL_MODEL_PATH, map_location="cpu", weights_only=False)
+        labels = list(ckpt["labels"])
+        model = timm.create_model(
+            ckpt.get("arch", LOCAL_MODEL_ARCH), pretrained=False, num_classes=len(labels)
+        )
+        model.load_state_dict(ckpt["state_dict"])
+        model.eval()
+        transform = create_transform(**resolve_data_config({}, model=model))
+        return {
+            "model": model,
+            "labels": labels,
+            "transform": transform,
+            "temperature": float(ckpt.get("temperature", 1.0)),
+            "arch": ckpt.get("arch", LOCAL_MODEL_ARCH),
+        }
+    except Exception:
+        return None
+
+
+def _split_local_label(label: str):
+    """'Tomato___Early_blight' → ('Tomato', 'Early blight')."""
+    plant, _, disease = label.partition("___")
+    plant = plant.replace("_", " ").replace(",", "").strip().title()
+    disease = disease.replace("_", " ").strip() or "Unknown"
+    return plant, disease
+
+
+def local_triage(images, plant_type):
+    """
+    Classify up to 3 images in one CPU batch; probabilities are temperature-scaled
+    and averaged across images. Returns None when no local model is configured.
+    """
+    clf = _get_local_classifier()
+    if clf is None or not images:
+        return None
+    try:
+        import torch
+
+        batch = torch.stack([clf["transform"](img.convert("RGB")) for img in images[:3]])
+        with torch.inference_mode():
+            logits = clf["model"](batch)
+            probs = torch.softmax(logits / clf["temperature"], dim=-1).mean(dim=0)
+        top_p, top_i = probs.topk(min(LOCAL_TOP_K, len(clf["labels"])))
+        top_k = [(clf["labels"][i], float(p)) for p, i in zip(top_p.tolist(), top_i.tolist())]
+    except Exception:
+        return None
+
+    plant, disease = _split_local_label(top_k[0][0])
+    confidence = top_k[0][1]
+    plant_matches = plant_type == "AUTO_DETECT" or plant.lower() == str(plant_type).lower()
+    return {
+        "top_k": top_k,
+        "plant": plant,
+        "disease": disease,
+        "confidence": confidence,
+        "confident": plant_matches and confidence >= LOCAL_CONFIDENCE_THRESHOLD,
+        "model": f"local/{clf['arch']}",
+    }
+
+
+def local_triage_to_result(triage: dict) -> dict:
+    """Shape a confident local prediction like an EXPERT_PROMPT_TEMPLATE response."""
+    healthy = triage["disease"].lower() == "healthy"
+    alternatives = [
+        f"Possible: {_split_local_label(label)[1]} ({p:.0%})" for label, p in triage["top_k"][1:]
+    ]
+    return {
+        "is_plant_image": True,
+        "is_correct_plant": True,
+        "plant_species": triage["plant"],
+        "disease_name": "Healthy Plant" if healthy else triage["disease"],
+        "disease_type": "healthy" if healthy else "unknown",
+        "severity": "healthy" if healthy else "unknown",
+        "confidence": int(round(triage["confidence"] * 100)),
+        "confidence_reason": f"On-device classifier ({triage['model']}) top-1 probability.",
+        "image_quality": "Good",
+        "symptoms": [],
+        "differential_diagnosis": alternatives,
+        "probable_causes": [],
+        "immediate_action": [],
+        "organic_treatments": [],
+        "chemical_treatments": [],
+        "prevention_long_term": [],
+        "plant_specific_notes": (
+            "Quick local triage result. Turn off 'Local quick triage' in the sidebar "
+            "for a full AI treatment plan."
+        ),
+        "similar_conditions": "",
+    }
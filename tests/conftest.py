@@ -0,0 +1,24 @@
+"""
+Every test runs against the offline fake provider and a throwaway state
+directory. SQLite connections are cached per thread (including the provider
+loop's), so the paths are fixed here, before anything opens one.
+"""
+import os
+import tempfile
+
+import pytest
+
+_STATE_DIR = tempfile.mkdtemp(prefix="plant-doctor-tests-")
+os.environ["PLANT_DOCTOR_CACHE_DB"] = os.path.join(_STATE_DIR, "cache.sqlite3")
+os.environ.setdefault("PLANT_DOCTOR_FAKE_LATENCY", "0.01")
+
+from plant_doctor import fake_provider, quota  # noqa: E402
+
+fake_provider.install()
+
+
+@pytest.fixture(autouse=True)
+def _fast_rate_limits(monkeypatch):
+    """The fake has no real quota; keep the production RPM limits from pacing the suite."""
+    monkeypatch.setattr(quota, "MODEL_RPM_LIMITS", {m: rpm * 100 for m, rpm in quota.MODEL_RPM_LIMITS.items()})
+    quota._BUCKETS.clear()
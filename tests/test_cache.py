@@ -0,0 +1,38 @@
+import os
+
+from PIL import Image
+
+from plant_doctor import cache
+
+
+def _noise_image():
+    return Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3))
+
+
+def _phash_rows(key):
+    return cache._cache_conn().execute("SELECT COUNT(*) FROM phashes WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_evicted_response_drops_its_near_duplicate_entry(monkeypatch):
+    image = _noise_image()
+    cache.cache_set("evict-me", ({"disease_name": "Rust"}, "{}"))
+    cache.phash_index_add([image], "Wheat", "evict-me")
+    assert cache.near_duplicate_lookup([image], "Wheat") is not None
+
+    monkeypatch.setattr(cache, "_CACHE_TTL_SECONDS", -1)     # everything is expired
+    cache.cache_set("newcomer", ({"disease_name": "Smut"}, "{}"))
+
+    assert _phash_rows("evict-me") == 0
+    assert cache.near_duplicate_lookup([image], "Wheat") is None
+    # the lookup's sync saw the new generation and rebuilt the tree without the entry
+    assert not any(key == "evict-me" for _, (_, key, _, _) in cache._phash_tree.search(cache.dhash(image), 0))
+
+
+def test_expired_hit_drops_its_near_duplicate_entry(monkeypatch):
+    image = _noise_image()
+    cache.cache_set("stale", ({"disease_name": "Rust"}, "{}"))
+    cache.phash_index_add([image], "Wheat", "stale")
+
+    monkeypatch.setattr(cache, "_CACHE_TTL_SECONDS", -1)
+    assert cache.cache_get("stale") is None
+    assert _phash_rows("stale") == 0
@@ -0,0 +1,14 @@
+import pytest
+
+from plant_doctor.parsing import check_corpus
+
+_CASES = check_corpus()
+
+
+def test_corpus_is_not_empty():
+    assert _CASES
+
+
+@pytest.mark.parametrize("name, ok, detail", _CASES, ids=[case[0] for case in _CASES])
+def test_malformed_response_corpus(name, ok, detail):
+    assert ok, detail
@@ -0,0 +1,47 @@
+import io
+import os
+
+from PIL import Image
+
+from plant_doctor import pipeline
+from plant_doctor.imaging import prepare_upload
+from plant_doctor.providers import run_async
+
+
+def _noise_payloads():
+    buf = io.BytesIO()
+    Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).save(buf, "PNG")
+    return [prepare_upload(io.BytesIO(buf.getvalue()), False)[0]]
+
+
+def test_low_confidence_single_call_is_cached(monkeypatch):
+    calls = []
+    real = pipeline.gemini_vision_async
+
+    async def counting(*args, **kwargs):
+        calls.append(1)
+        return await real(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "gemini_vision_async", counting)
+    monkeypatch.setattr(pipeline, "SINGLE_CALL_MIN_ID_CONFIDENCE", 101)   # nothing is confident enough
+    payloads = _noise_payloads()
+
+    assert run_async(pipeline.identify_and_diagnose_async(payloads)) is None
+    assert run_async(pipeline.identify_and_diagnose_async(payloads)) is None
+    assert len(calls) == 1
+
+
+def test_diagnose_events_streams_then_matches_diagnose_async():
+    events = list(pipeline.diagnose_events(_noise_payloads(), "Tomato", stream=True))
+    kinds = [event for event, _ in events]
+    assert kinds[0] == "progress" and "fields" in kinds and kinds[-1] == "done"
+    out = events[-1][1]
+    assert set(out) == set(run_async(pipeline.diagnose_async(_noise_payloads(), "Tomato")))
+    assert out["plant_type"] == "Tomato" and out["result"]["disease_name"] == "Early Blight"
+
+
+def test_diagnose_events_auto_detect_single_call():
+    events = list(pipeline.diagnose_events(_noise_payloads()))
+    out = events[-1][1]
+    assert out["plant_type"] == "Tomato" and out["plant_id"]["common_name"] == "Tomato"
+    assert [e for e, _ in events if e != "progress"] == ["done"]
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from plant_doctor import providers
+from plant_doctor.config import GROQ_TEXT_MODELS
+from plant_doctor.providers import gemini_text_stream_async, run_async, run_parallel, stream_sync
+from plant_doctor.prompts import PromptPrefix
+from plant_doctor.quota import breaker_trip, quota_status
+from plant_doctor.schema import DIAGNOSIS_SCHEMA
+from plant_doctor.startup import import_sdk
+
+
+def _open_until(model_id):
+    return next(open_until for m, _, _, open_until in quota_status() if m == model_id)
+
+
+def _used(model_id):
+    return next(used for m, used, _, _ in quota_status() if m == model_id)
+
+
+def test_open_daily_breaker_survives_stream_call():
+    model_id = GROQ_TEXT_MODELS[0]
+    breaker_trip(model_id, "429 You exceeded your requests per day")
+    opened = _open_until(model_id)
+    assert opened is not None
+
+    # a Groq client that fails any real call; the fake Gemini answers instead
+    chunks = list(stream_sync(gemini_text_stream_async("How to stop aphids?", groq_client=object())))
+
+    assert chunks and chunks[0][0].startswith("gemini")
+    assert _open_until(model_id) == opened
+
+
+def test_refused_property_ordering_keeps_the_rest_of_the_schema(monkeypatch):
+    model_cls = import_sdk("google.generativeai").GenerativeModel
+    real = model_cls.generate_content_async
+    sent = []
+
+    async def old_api(self, contents, stream=False, **kwargs):
+        response_schema = kwargs["generation_config"]["response_schema"]
+        sent.append(dict(response_schema))
+        if "property_ordering" in response_schema:
+            raise ValueError("Unknown field for Schema: property_ordering")
+        return await real(self, contents, stream, **kwargs)
+
+    monkeypatch.setattr(model_cls, "generate_content_async", old_api)
+    model_id = "gemini-1.5-flash-8b"
+    used = _used(model_id)
+
+    text = run_async(providers.retry_generate_async(model_id, ["plant pathologist"], schema=DIAGNOSIS_SCHEMA))
+
+    assert "Early Blight" in text
+    assert model_id not in providers._SCHEMA_REJECTED
+    assert [("property_ordering" in s, "properties" in s) for s in sent] == [(True, True), (False, True)]
+    assert _used(model_id) == used + 1          # the refused request is not counted twice
+
+
+def test_run_parallel_overlaps_independent_calls():
+    async def call(value, delay=0.2):
+        await asyncio.sleep(delay)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    t0 = time.monotonic()
+    results = run_parallel(call("plan"), call("translation"), call(ValueError("boom")))
+    assert time.monotonic() - t0 < 0.4
+    assert results[:2] == ["plan", "translation"] and isinstance(results[2], ValueError)
+
+
+class NotFound(Exception):
+    """Stands in for google.api_core.exceptions.NotFound."""
+
+
+@pytest.mark.parametrize("err, dropped", [
+    (NotFound("CachedContent not found (or permission denied)"), True),
+    (ValueError("404 cachedContents/abc123 was not found"), True),
+    (ValueError("403 Permission denied on resource cached_content"), True),
+    (ValueError("429 Quota exceeded for quota metric 'cached_content storage'"), False),
+    (ValueError("502 Bad gateway: proxy rejected Cache-Control header"), False),
+    (ValueError("500 Internal error"), False),
+])
+def test_only_a_missing_context_cache_is_dropped(err, dropped):
+    model_id = "gemini-2.5-flash"
+    prefix = PromptPrefix("test", "x")
+    providers._CONTEXT_CACHES[(model_id, prefix.key)] = (object(), time.time() + 3600)
+
+    assert providers._context_cache_failed(model_id, prefix, err) is dropped
+    assert ((model_id, prefix.key) not in providers._CONTEXT_CACHES) is dropped
+    assert model_id not in providers._CONTEXT_CACHE_REJECTED
+    providers._CONTEXT_CACHES.pop((model_id, prefix.key), None)
@@ -0,0 +1,17 @@
+from plant_doctor import quota
+from plant_doctor.config import VISION_MODEL_CHAIN
+from plant_doctor.providers import gemini_vision_async, run_async
+
+
+def test_back_to_back_calls_wait_for_the_primary_model(monkeypatch):
+    primary = VISION_MODEL_CHAIN[0]
+    # a burst of 2 refilling every 0.2 s, with a queue cap shorter than that refill
+    real_params = quota._bucket_params
+    monkeypatch.setattr(quota, "_bucket_params", lambda m: (5.0, 2) if m == primary else real_params(m))
+    monkeypatch.setattr(quota, "RATE_LIMIT_MAX_QUEUE_SECONDS", 0.05)
+    monkeypatch.setattr(quota, "_SHARED_RATE_LIMIT", False)
+    quota._BUCKETS.pop(primary, None)
+
+    used = [run_async(gemini_vision_async(["plant pathologist"], hedged=False))[1] for _ in range(3)]
+
+    assert used == [primary] * 3
@@ -0,0 +1,11 @@
+from plant_doctor.schema import COMBINED_SCHEMA, DIAGNOSIS_SCHEMA
+
+
+def test_gemini_diagnosis_schema_leads_with_disease_and_severity():
+    ordering = DIAGNOSIS_SCHEMA.gemini_schema["property_ordering"]
+    assert ordering[:2] == ["disease_name", "severity"]
+    assert sorted(ordering) == sorted(DIAGNOSIS_SCHEMA.gemini_schema["properties"])
+
+
+def test_gemini_schema_otherwise_keeps_declaration_order():
+    assert COMBINED_SCHEMA.gemini_schema["property_ordering"] == COMBINED_SCHEMA.names
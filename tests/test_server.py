@@ -0,0 +1,119 @@
+import http.client
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+import uuid
+
+import pytest
+from PIL import Image
+
+from plant_doctor.server import make_server
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(workers=2, queue=4):
+        server = make_server("127.0.0.1", 0, workers, queue, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _post(url, body, content_type):
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status, dict(resp.headers), json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read())
+
+
+def _leaf_jpeg(seed=0) -> bytes:
+    img = Image.new("RGB", (64, 64), (40, 120 + seed, 40))
+    for x in range(0, 64, 8):
+        for y in range(0, 64, 8):
+            img.putpixel((x, y), ((x * 7 + seed) % 256, (y * 5) % 256, 90))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def _multipart(fields: dict, files: list):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for i, data in enumerate(files):
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="leaf{i}.jpg"\r\n'
+                     f'Content-Type: image/jpeg\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def test_diagnose_multipart(serve):
+    _, url = serve()
+    body, ctype = _multipart({"plant_type": "AUTO_DETECT", "crop": "0"}, [_leaf_jpeg()])
+    status, _, out = _post(url + "/v1/diagnose", body, ctype)
+    assert status == 200
+    assert out["plant_type"] == "Tomato"
+    assert out["diagnosis"]["disease_name"] == "Early Blight"
+
+
+def test_diagnose_rejects_non_multipart(serve):
+    _, url = serve()
+    status, _, out = _post(url + "/v1/diagnose", _leaf_jpeg(), "image/jpeg")
+    assert status == 415
+    assert "multipart" in out["error"]
+
+
+def test_diagnose_rejects_undecodable_image(serve):
+    _, url = serve()
+    body, ctype = _multipart({}, [b"not an image"])
+    status, _, out = _post(url + "/v1/diagnose", body, ctype)
+    assert status == 400
+    assert "decode" in out["error"]
+
+
+def test_chat_rejects_malformed_json(serve):
+    _, url = serve()
+    status, _, out = _post(url + "/v1/chat", b"{not json", "application/json")
+    assert status == 400
+    assert "JSON" in out["error"]
+
+
+def test_full_pool_answers_429_with_retry_after(serve):
+    server, url = serve(workers=1, queue=0)
+    release = threading.Event()
+    busy = server.pool.submit(release.wait)          # holds the only slot
+    try:
+        status, headers, out = _post(url + "/v1/chat", json.dumps({"question": "Aphids?"}).encode(),
+                                     "application/json")
+    finally:
+        release.set()
+        busy.result(timeout=5)
+    assert status == 429
+    assert int(headers["Retry-After"]) >= 1
+    assert "busy" in out["error"]
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_bad_content_length_is_rejected(serve, length):
+    server, _ = serve()
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.putrequest("POST", "/v1/chat")
+    conn.putheader("Content-Type", "application/json")
+    conn.putheader("Content-Length", length)
+    conn.endheaders()
+    resp = conn.getresponse()                 # a negative length used to block on rfile.read(-1)
+    assert resp.status == 400
+    assert "Content-Length" in json.loads(resp.read())["error"]
+    conn.close()
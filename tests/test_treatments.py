@@ -0,0 +1,51 @@
+import gc
+import weakref
+
+import pytest
+
+from plant_doctor.catalog import SECTIONS, Catalog
+from plant_doctor.treatments import match_treatment
+
+
+@pytest.mark.parametrize("category, name, key, quality", [
+    ("organic", "Neem Oil Spray", "Neem Oil Spray", "exact"),
+    ("organic", "Neem oil spray every 7 days", "Neem Oil Spray", "token"),
+    ("chemical", "Imidacloprid 17.8 SL", "Imidacloprid (Confidor)", "alias"),
+    ("chemical", "Mancozeb 75% WP (Indofil M-45) - 2g/L", "Mancozeb (Indofil)", "token"),
+    ("chemical", "Mancozab 75WP", "Mancozeb (Indofil)", "fuzzy"),
+    ("chemical", "Ridomil Gold MZ", "Metalaxyl + Mancozeb (Ridomil Gold)", "token"),
+    # full suggestion lines: dosage and filler words around the product name
+    ("organic", "Trichoderma viride @ 5g/kg seed", "Trichoderma", "token"),
+    ("organic", "Apply Trichoderma-enriched compost", "Trichoderma", "token"),
+    ("organic", "Bacillus subtilis based biofungicide spray", "Bacillus subtilis", "token"),
+    ("chemical", "Copper Oxychloride 50% WP @ 3g/L water, repeat after 15 days", "Copper Oxychloride", "token"),
+])
+def test_known_products_match(category, name, key, quality):
+    m = match_treatment(category, name)
+    assert (m.key, m.quality) == (key, quality)
+
+
+def test_dosage_words_do_not_dilute_the_score():
+    m = match_treatment("chemical", "Copper Oxychloride 50% WP @ 3g/L water, repeat after 15 days")
+    assert m.score == 1.0
+
+
+@pytest.mark.parametrize("category, name", [
+    ("chemical", "Copper hydroxide"),     # not Copper Oxychloride
+    ("organic", "Copper hydroxide"),      # not Copper Fungicide (Organic)
+    ("organic", "Neem Cake"),             # not Neem Oil Spray
+    ("organic", "Neem cake powder"),
+])
+def test_near_misses_fall_back_to_default(category, name):
+    m = match_treatment(category, name)
+    assert (m.key, m.quality) == (None, "default")
+
+
+def test_replaced_catalogue_is_not_kept_alive_by_match_memo():
+    data = dict({s: {} for s in SECTIONS}, treatment_costs={"organic": {"Neem Oil Spray": 100}})
+    catalog = Catalog(data, "0" * 64)
+    assert match_treatment("organic", "Neem oil spray weekly", catalog).key == "Neem Oil Spray"
+    ref = weakref.ref(catalog)
+    del catalog
+    gc.collect()
+    assert ref() is None